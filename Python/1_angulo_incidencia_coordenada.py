@@ -5,22 +5,29 @@ Script para calcular el ángulo de incidencia asociado a una coordenada (A2, B2)
 elegida en la placa m102 y además generar una imagen 3D que dibuje todas las trayectorias
 desde cada punto (A1, B1) relacionado hacia (A2, B2).
 
-- Lee el TNtuple "matedata" del archivo ROOT.
+- Usa el índice por celda de cell_index.py (data.root.cellidx.npz, se construye
+  la primera vez) en lugar de recorrer todas las entradas del TNtuple "matedata".
 - Pide por terminal al usuario la coordenada (A2, B2) a analizar.
-- Filtra todas las entradas con esa (A2, B2) y extrae sus correspondientes (A1, B1).
+- Obtiene del índice todas las entradas con esa (A2, B2) y sus correspondientes (A1, B1).
 - Convierte los índices A, B en posiciones físicas usando:
       a = 0.36 m   (ancho total dividido en 12 strips → pitch = a/12)
       h = 0.61 m   (distancia entre placa m101 y m102)
 - Para cada evento individual:
       • Calcula Δx = (A2 - A1) · pitch,    Δy = (B2 - B1) · pitch,    Δz = h
       • Ángulo_i = arctan( √(Δx² + Δy²) / h )
-- Dibuja en 3D todas las líneas que conectan cada (A1, B1, 0) con (A2, B2, h).
+- Dibuja en 3D todas las líneas que conectan cada (A1, B1, 0) con (A2, B2, h),
+  juntando las repetidas en una sola línea más gruesa (track_render.py;
+  --per-event dibuja una por evento).
 - Además, si hay al menos 2 puntos, realiza un ajuste lineal (mínimos cuadrados)
   en el plano de m101 y calcula el ángulo promedio.
 
+Modo por lotes (sin preguntas ni gráfico), para las 144 celdas de una vez:
+    python 1_angulo_incidencia_coordenada.py --all angulos_celdas.csv
+Las estadísticas salen de la matriz de conteos (A1, B1) del índice; el ajuste
+es el mismo de mínimos cuadrados, con cada (A1, B1) pesado por su número de eventos.
+
 Requiere:
-    • ROOT con PyROOT instalado.
-    • numpy (para el ajuste lineal).
+    • uproot y numpy (índice, ajuste lineal).
     • math (funciones trigonométricas).
     • matplotlib (para generar la imagen 3D).
 
@@ -28,33 +35,121 @@ Autor: [Tu Nombre]
 Fecha: [Fecha actual]
 """
 
+import argparse
+import csv
 import sys
 import math
 import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 
-# Importar las clases de ROOT
-from ROOT import TFile, TNtuple
+from cell_index import NCH, N_CELLS, load_cell_index, query_cell
+from track_render import draw_paths
+
+# Parámetros físicos en metros
+a_m = 0.36    # [m], ancho total de la placa (12 strips)
+h_m = 0.61    # [m], separación vertical entre m101 y m102
+pitch = a_m / 12.0  # Cada índice entero A o B se convierte a metros
+
+# Columnas del CSV del modo por lotes
+BATCH_COLUMNS = ("A2", "B2", "n_eventos", "n_puntos_A1B1", "ang_medio_deg", "ang_std_deg",
+                 "ang_min_deg", "ang_max_deg", "m", "c_m", "ang_fit_deg")
+
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description="Ángulo de incidencia asociado a una celda (A2, B2) de m102"
+    )
+    p.add_argument("-i", "--input", default="data.root", help="Archivo ROOT con matedata")
+    p.add_argument("--all", metavar="CSV", dest="batch",
+                   help="Modo por lotes: escribe las estadísticas de las 144 celdas en CSV")
+    p.add_argument("--per-event", action="store_true",
+                   help="Dibuja una línea por evento en vez de juntar las trayectorias repetidas")
+    return p.parse_args()
+
+
+def angle_deg(A2, B2, A1, B1):
+    """Ángulo (grados) de la recta (A1, B1, 0) → (A2, B2, h) respecto de la vertical."""
+    dx = (np.asarray(A2) - A1) * pitch
+    dy = (np.asarray(B2) - B1) * pitch
+    return np.degrees(np.arctan2(np.hypot(dx, dy), h_m))
+
+
+def cell_summary(counts):
+    """
+    Estadísticas de ángulo y ajuste lineal de cada celda (A2, B2) a partir
+    de la matriz de conteos (144, 144) del índice. Devuelve un dict de
+    arreglos de largo 144 con las columnas de BATCH_COLUMNS.
+    """
+    cell = np.arange(N_CELLS)
+    A2, B2 = cell // NCH, cell % NCH
+    A1, B1 = cell // NCH, cell % NCH
+    ang = angle_deg(A2[:, None], B2[:, None], A1[None, :], B1[None, :])
+
+    w = counts.astype(float)
+    n = w.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (w * ang).sum(axis=1) / n
+        std = np.sqrt((w * (ang - mean[:, None]) ** 2).sum(axis=1) / n)
+
+        # Mínimos cuadrados y = m·x + c con x = A1·pitch, y = B1·pitch, pesos = conteos
+        # (equivale a np.polyfit sobre los puntos de cada evento)
+        x = A1 * pitch
+        y = B1 * pitch
+        Sx, Sy = w @ x, w @ y
+        Sxx, Sxy = w @ (x * x), w @ (x * y)
+        den = n * Sxx - Sx ** 2
+        m = np.where(den > 0, (n * Sxy - Sx * Sy) / den, np.nan)
+        c = (Sy - m * Sx) / n
+    m[n < 2] = np.nan
+    c[n < 2] = np.nan
+
+    seen = w > 0
+    return {
+        "A2": A2,
+        "B2": B2,
+        "n_eventos": n.astype(np.int64),
+        "n_puntos_A1B1": seen.sum(axis=1),
+        "ang_medio_deg": mean,
+        "ang_std_deg": std,
+        "ang_min_deg": np.where(seen, ang, np.inf).min(axis=1),
+        "ang_max_deg": np.where(seen, ang, -np.inf).max(axis=1),
+        "m": m,
+        "c_m": c,
+        "ang_fit_deg": np.degrees(np.arctan2(pitch * np.sqrt(1 + m * m), h_m)),
+    }
+
+
+def run_batch(index, out_csv):
+    """Escribe en out_csv las estadísticas de las 144 celdas."""
+    summary = cell_summary(index["counts"])
+    empty = summary["n_eventos"] == 0
+    for k in ("ang_min_deg", "ang_max_deg"):
+        summary[k] = np.where(empty, np.nan, summary[k])
+    with open(out_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(BATCH_COLUMNS)
+        for row in zip(*(summary[k] for k in BATCH_COLUMNS)):
+            writer.writerow([f"{v:.6g}" if isinstance(v, float) else v for v in row])
+    print(f"Celdas con eventos: {int((~empty).sum())} de {N_CELLS}")
+    print(f"Resultados guardados en {out_csv}")
+
 
 def main():
-    # 1) Definir parámetros físicos en metros
-    a_m = 0.36    # [m], ancho total de la placa (12 strips)
-    h_m = 0.61    # [m], separación vertical entre m101 y m102
-    pitch = a_m / 12.0  # Cada índice entero A o B se convierte a metros
-
-    # 2) Abrir data.root y obtener el TNtuple
-    archivo = TFile.Open("data.root", "READ")
-    if not archivo or archivo.IsZombie():
-        print("Error: no se pudo abrir 'data.root'. Verifica que exista.")
-        sys.exit(1)
+    args = parse_args()
 
-    ntuple = archivo.Get("matedata")
-    if not ntuple:
-        print("Error: no se encontró el TNtuple 'matedata' en data.root.")
+    # 1) Abrir (o construir) el índice por celda de data.root
+    try:
+        index = load_cell_index(args.input)
+    except (OSError, KeyError) as e:
+        print(f"Error: no se pudo leer el TNtuple 'matedata' de '{args.input}': {e}")
         sys.exit(1)
 
-    # 3) Leer (A2, B2) desde la terminal
+    if args.batch:
+        run_batch(index, args.batch)
+        return
+
+    # 2) Leer (A2, B2) desde la terminal
     try:
         A2_sel = int(input("Ingresa A2 (entero entre 0 y 11): ").strip())
         B2_sel = int(input("Ingresa B2 (entero entre 0 y 11): ").strip())
@@ -66,42 +161,19 @@ def main():
         print("Error: A2 y B2 deben estar en el rango [0, 11].")
         sys.exit(1)
 
-    # 4) Recorrer todas las entradas y recopilar (A1, B1) válidos
-    lista_A1 = []
-    lista_B1 = []
-    angulos_evento = []
-
-    n_entries = ntuple.GetEntries()
-    for i in range(n_entries):
-        ntuple.GetEntry(i)
-        A2 = int(ntuple.A2)
-        B2 = int(ntuple.B2)
-        A1 = int(ntuple.A1)
-        B1 = int(ntuple.B1)
-
-        # Descartar si (A2,B2) o (A1,B1) no están en [0,11]
-        if not (0 <= A2 <= 11 and 0 <= B2 <= 11 and 0 <= A1 <= 11 and 0 <= B1 <= 11):
-            continue
-
-        # Si coincide con la coordenada seleccionada, lo guardamos
-        if A2 == A2_sel and B2 == B2_sel:
-            lista_A1.append(A1)
-            lista_B1.append(B1)
-            dx = (A2 - A1) * pitch
-            dy = (B2 - B1) * pitch
-            dz = h_m
-            dist_horiz = math.sqrt(dx*dx + dy*dy)
-            ang_i = math.degrees(math.atan2(dist_horiz, dz))
-            angulos_evento.append((i, A1, B1, ang_i))
-
-    archivo.Close()
+    # 3) Entradas con esa (A2, B2) y sus (A1, B1), ya filtradas a [0,11] en el índice
+    entries, arr_A1, arr_B1 = query_cell(index, A2_sel, B2_sel)
+    lista_A1 = arr_A1.tolist()
+    lista_B1 = arr_B1.tolist()
+    angulos_evento = zip(entries.tolist(), lista_A1, lista_B1,
+                         angle_deg(A2_sel, B2_sel, arr_A1, arr_B1).tolist())
 
     # Si no hay eventos, salir
     if len(lista_A1) == 0:
         print(f"No se encontró ningún evento con (A2, B2) = ({A2_sel}, {B2_sel}).")
         sys.exit(0)
 
-    # 5) Mostrar en consola todos los puntos (A1,B1) relacionados
+    # 4) Mostrar en consola todos los puntos (A1,B1) relacionados
     print(f"\n--- Puntos (A1, B1) relacionados con (A2, B2) = ({A2_sel}, {B2_sel}) ---")
     for a1, b1 in zip(lista_A1, lista_B1):
         print(f"({a1}, {b1})")
@@ -112,7 +184,7 @@ def main():
     for idx, A1_ev, B1_ev, ang_ev in angulos_evento:
         print(f"{idx:12d} \t {A1_ev:2d} \t {B1_ev:2d} \t {ang_ev:8.3f}")
 
-    # 6) Ajuste lineal por mínimos cuadrados en m101 (antes de plot 3D)
+    # 5) Ajuste lineal por mínimos cuadrados en m101 (antes de plot 3D)
     x1_arr = np.array(lista_A1, dtype=float) * pitch
     y1_arr = np.array(lista_B1, dtype=float) * pitch
 
@@ -129,7 +201,7 @@ def main():
     else:
         print("\nNo hay suficientes puntos (mínimo 2) para realizar ajuste lineal.\n")
 
-    # 7) Preparar datos físicos en metros para el gráfico 3D
+    # 6) Preparar datos físicos en metros para el gráfico 3D
     x2 = A2_sel * pitch
     y2 = B2_sel * pitch
     z2 = h_m
@@ -138,13 +210,17 @@ def main():
     y1_coords = [b1 * pitch for b1 in lista_B1]
     z1_coords = [0.0] * len(lista_A1)  # Todos los A1,B1 están en z=0
 
-    # 8) Dibujar en 3D con Matplotlib
+    # 7) Dibujar en 3D con Matplotlib
     fig = plt.figure(figsize=(8, 6))
     ax = fig.add_subplot(111, projection='3d')
 
-    # Dibujar cada trayectoria como línea desde (x1, y1, 0) a (x2, y2, h)
-    for x1, y1, z1 in zip(x1_coords, y1_coords, z1_coords):
-        ax.plot([x1, x2], [y1, y2], [z1, z2], color='blue', linewidth=1)
+    # Dibujar las trayectorias (x1, y1, 0) → (x2, y2, h) en una sola colección;
+    # las repetidas se juntan, con ancho y opacidad según su número de eventos
+    paths = np.zeros((len(x1_coords), 2, 3))
+    paths[:, 0, 0], paths[:, 0, 1], paths[:, 0, 2] = x1_coords, y1_coords, z1_coords
+    paths[:, 1] = (x2, y2, z2)
+    _, n_paths = draw_paths(ax, paths, color='blue', aggregate=not args.per_event)
+    print(f"Trayectorias dibujadas: {n_paths} (de {len(x1_coords)} eventos)")
 
     # Marcar puntos de origen en z=0 y punto objetivo en z=h
     ax.scatter(x1_coords, y1_coords, z1_coords, c='red', s=30, label='(A1, B1) en z=0')
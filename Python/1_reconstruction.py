@@ -8,13 +8,23 @@ Reconstrucción 3D de trayectorias evento a evento con placas:
 - Placa 1 (inferior) en z = 0.0   cm, coordenadas (A1,B1)
 
 Conecta (A3,B3)→(A2,B2)→(A1,B1) en 3D y dibuja las placas de 36×36 cm².
+Las trayectorias idénticas se dibujan una sola vez, más gruesas según su
+multiplicidad (track_render.py).
+
+Uso sin pantalla (ver batch_plot.py):
+    python 1_reconstruction.py -i dia1.root dia2.root -o figs/{stem}.png -j 4
 """
 
-import uproot
+import argparse
+
 import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D  # noqa: F401
 
+from batch_plot import add_batch_args, run_figures, stem
+from matedata_io import num_entries, take_entries
+from track_render import draw_paths
+
 # --- Parámetros de geometría ---
 width_cm = 36.0            # ancho total de cada placa (cm)
 Nch = 12                   # número de canales por eje
@@ -28,55 +38,80 @@ z_inf = 0.0    # placa inferior(1)
 # Cuántos eventos muestrear para graficar
 N_show = 50
 
-# --- Abrir ROOT y extraer ramas ---
-f = uproot.open("data.root")
-tree = f["matedata"]
-arrays = tree.arrays(["A1","B1","A2","B2","A3","B3"], library="np")
-
 # Offset para centrar canales en el medio de la placa
 offset = (Nch - 1) / 2 * ch_width
 
-# Mapear canales a coordenadas X,Y para cada placa
-X_sup = arrays["A3"] * ch_width - offset
-Y_sup = arrays["B3"] * ch_width - offset
-X_med = arrays["A2"] * ch_width - offset
-Y_med = arrays["B2"] * ch_width - offset
-X_inf = arrays["A1"] * ch_width - offset
-Y_inf = arrays["B1"] * ch_width - offset
-
-# Muestrear índices aleatorios
-np.random.seed(0)
-idx = np.random.choice(len(X_sup), size=min(N_show, len(X_sup)), replace=False)
-
-# --- Crear figura 3D ---
-fig = plt.figure(figsize=(8,6))
-ax = fig.add_subplot(111, projection="3d")
-
-# Dibujar placas como superficies semitransparentes
-xx, yy = np.meshgrid(
-    np.linspace(-width_cm/2, width_cm/2, 2),
-    np.linspace(-width_cm/2, width_cm/2, 2)
-)
-for z0 in (z_sup, z_med, z_inf):
-    zz = np.full_like(xx, z0)
-    ax.plot_surface(xx, yy, zz, color='gray', alpha=0.3, edgecolor='k')
-
-# Dibujar trayectorias conectando superior→media→inferior
-for i in idx:
-    xs = [X_sup[i], X_med[i], X_inf[i]]
-    ys = [Y_sup[i], Y_med[i], Y_inf[i]]
-    zs = [z_sup, z_med, z_inf]
-    ax.plot(xs, ys, zs, linewidth=0.8)
-
-# Ajustes finales
-ax.set_xlabel("X (cm)")
-ax.set_ylabel("Y (cm)")
-ax.set_zlabel("Z (cm)")
-ax.set_xlim(-width_cm/2, width_cm/2)
-ax.set_ylim(-width_cm/2, width_cm/2)
-ax.set_zlim(z_inf, z_sup)
-ax.set_title("Reconstrucción 3D de trayectorias de muones\n"
-             "Placa superior (3) → media (2) → inferior (1)")
-ax.view_init(elev=25, azim=45)
-plt.tight_layout()
-plt.show()
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Reconstrucción 3D de trayectorias con placas")
+    p.add_argument("-i", "--input", nargs="+", default=["data.root"],
+                   help="Archivos ROOT con matedata (una figura por archivo)")
+    p.add_argument("-n", "--n-show", type=int, default=N_show, help="Eventos a muestrear")
+    p.add_argument("--seed", type=int, default=0, help="Semilla del muestreo")
+    p.add_argument("--per-event", action="store_true",
+                   help="Una línea por evento en vez de juntar trayectorias idénticas")
+    return add_batch_args(p).parse_args()
+
+
+def render(params):
+    """Figura de params: input, n_show, seed y aggregate."""
+    # --- Muestrear índices aleatorios y leer sólo esas entradas ---
+    n_entries = num_entries(params["input"])
+    np.random.seed(params["seed"])
+    idx = np.random.choice(n_entries, size=min(params["n_show"], n_entries), replace=False)
+    arrays = take_entries(params["input"], ["A1","B1","A2","B2","A3","B3"], idx)
+
+    # Mapear canales a coordenadas X,Y para cada placa
+    X_sup = arrays["A3"] * ch_width - offset
+    Y_sup = arrays["B3"] * ch_width - offset
+    X_med = arrays["A2"] * ch_width - offset
+    Y_med = arrays["B2"] * ch_width - offset
+    X_inf = arrays["A1"] * ch_width - offset
+    Y_inf = arrays["B1"] * ch_width - offset
+
+    # --- Crear figura 3D ---
+    fig = plt.figure(figsize=(8,6))
+    ax = fig.add_subplot(111, projection="3d")
+
+    # Dibujar placas como superficies semitransparentes
+    xx, yy = np.meshgrid(
+        np.linspace(-width_cm/2, width_cm/2, 2),
+        np.linspace(-width_cm/2, width_cm/2, 2)
+    )
+    for z0 in (z_sup, z_med, z_inf):
+        zz = np.full_like(xx, z0)
+        ax.plot_surface(xx, yy, zz, color='gray', alpha=0.3, edgecolor='k')
+
+    # Dibujar trayectorias conectando superior→media→inferior, en una sola
+    # colección (las trayectorias idénticas se juntan si aggregate)
+    paths = np.stack([
+        np.stack([X_sup, X_med, X_inf], axis=1),
+        np.stack([Y_sup, Y_med, Y_inf], axis=1),
+        np.broadcast_to([z_sup, z_med, z_inf], (len(idx), 3)),
+    ], axis=-1)
+    draw_paths(ax, paths, color="tab:blue", aggregate=params["aggregate"])
+
+    # Ajustes finales
+    ax.set_xlabel("X (cm)")
+    ax.set_ylabel("Y (cm)")
+    ax.set_zlabel("Z (cm)")
+    ax.set_xlim(-width_cm/2, width_cm/2)
+    ax.set_ylim(-width_cm/2, width_cm/2)
+    ax.set_zlim(z_inf, z_sup)
+    ax.set_title("Reconstrucción 3D de trayectorias de muones\n"
+                 "Placa superior (3) → media (2) → inferior (1)")
+    ax.view_init(elev=25, azim=45)
+    fig.tight_layout()
+    return fig
+
+
+def main():
+    args = parse_args()
+    jobs = [{"input": path, "stem": stem(path), "n_show": args.n_show,
+             "seed": args.seed, "aggregate": not args.per_event}
+            for path in args.input]
+    run_figures(render, jobs, args, lambda params: [params["input"]])
+
+
+if __name__ == "__main__":
+    main()
@@ -9,127 +9,134 @@ Reconstrucción 3D de trayectorias suavizadas y filtradas, con placas:
 
 Se añade graduación de 3 cm en los ejes X e Y, y las placas muestran
 líneas de cuadrícula cada 3 cm, trazadas perpendicularmente.
+
+Uso sin pantalla (ver batch_plot.py):
+    python 2_recon_suavizada.py -i dia1.root dia2.root -o figs/suav_{stem}.pdf -j 4
 """
 
-import uproot
+import argparse
+
 import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D  # noqa: F401
 
+from batch_plot import add_batch_args, run_figures, stem
+from fit_cache import load_fit_cache, make_geometry, apply_cuts
+
 # Parámetros de geometría
 width_cm = 36.0            # ancho total de cada placa (cm)
 Nch = 12                   # número de canales por eje
 ch_width = width_cm / Nch  # ancho de canal (cm)
 z_sup, z_med, z_inf = 124.7, 62.2, 0.0  # posiciones de placas en cm
+GEOMETRY = make_geometry(z_sup, z_med, z_inf, ch_width, Nch)
 
 # Límites de filtrado
 R_tol = 1.0                 # residuo máximo permitido (cm)
-theta_tol = np.deg2rad(5)   # ángulo máximo permitido (rad)
+theta_tol = 5.0             # ángulo máximo permitido (grados)
 
 # Cuántos eventos muestrear
 N_show = 100
 
-# Abrir ROOT y extraer datos
-f = uproot.open("data.root")
-tree = f["matedata"]
-arr = tree.arrays(["A1","B1","A2","B2","A3","B3"], library="np")
-
-# Convertir canales a coordenadas centradas
-offset = (Nch-1)/2 * ch_width
-X = {
-    'sup': arr["A3"]*ch_width - offset,
-    'med': arr["A2"]*ch_width - offset,
-    'inf': arr["A1"]*ch_width - offset
-}
-Y = {
-    'sup': arr["B3"]*ch_width - offset,
-    'med': arr["B2"]*ch_width - offset,
-    'inf': arr["B1"]*ch_width - offset
-}
-Z_vals = np.array([z_sup, z_med, z_inf])
-
-# Muestreo de índices
-np.random.seed(0)
-indices = np.random.choice(len(X['sup']), size=min(N_show, len(X['sup'])), replace=False)
-
-# Preparar figura
-fig = plt.figure(figsize=(8,8))
-ax = fig.add_subplot(111, projection="3d")
-
-# Crear malla para placas con paso de 3 cm
-grid = np.arange(-width_cm/2, width_cm/2 + 1e-6, 3)
-xx, yy = np.meshgrid(grid, grid)
-
-# Dibujar placas con superficie + dos juegos de líneas perpendiculares
-for z0 in (z_sup, z_med, z_inf):
-    zz = np.full_like(xx, z0)
-    # 1) Superficie semitransparente SIN líneas
-    ax.plot_surface(
-        xx, yy, zz,
-        color='lightgray',
-        alpha=0.3,
-        linewidth=0,
-        rstride=1, cstride=1,
-        antialiased=True
-    )
-    # 2) Líneas paralelas al eje X
-    ax.plot_wireframe(
-        xx, yy, zz,
-        rcount=xx.shape[0],   # tantas “filas” como puntos en Y
-        ccount=1,             # sólo 1 “columna” → líneas paralelas a X
-        color="#6ED3C2FF",
-        linewidth=0.3,
-        alpha=0.6
-    )
-    # 3) Líneas paralelas al eje Y
-    ax.plot_wireframe(
-        xx, yy, zz,
-        rcount=1,             # sólo 1 “fila” → líneas paralelas a Y
-        ccount=yy.shape[1],   # tantas “columnas” como puntos en X
-        color="#6ED3C2FF",
-        linewidth=0.3,
-        alpha=0.6
-    )
-
-# Suavizar y filtrar tracks
-for i in indices:
-    xs = np.array([X['sup'][i], X['med'][i], X['inf'][i]])
-    ys = np.array([Y['sup'][i], Y['med'][i], Y['inf'][i]])
-    # Ajuste lineal
-    px = np.polyfit(Z_vals, xs, 1)  # [slope, intercept]
-    py = np.polyfit(Z_vals, ys, 1)
-    # Valores ajustados
-    xs_fit = px[0]*Z_vals + px[1]
-    ys_fit = py[0]*Z_vals + py[1]
-    # Residuos
-    resid = np.sqrt((xs - xs_fit)**2 + (ys - ys_fit)**2)
-    if resid.max() > R_tol:
-        continue
-    # Ángulo entre segmentos originales
-    v = np.array([xs[1]-xs[0], ys[1]-ys[0], Z_vals[1]-Z_vals[0]])
-    w = np.array([xs[2]-xs[1], ys[2]-ys[1], Z_vals[2]-Z_vals[1]])
-    cosang = np.dot(v, w) / (np.linalg.norm(v)*np.linalg.norm(w))
-    theta = np.arccos(np.clip(cosang, -1, 1))
-    if theta > theta_tol:
-        continue
-    # Dibujar curva suave
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Trayectorias suavizadas y filtradas con placas")
+    p.add_argument("-i", "--input", nargs="+", default=["data.root"],
+                   help="Archivos ROOT con matedata (una figura por archivo)")
+    p.add_argument("-n", "--n-show", type=int, default=N_show, help="Eventos a muestrear")
+    p.add_argument("--seed", type=int, default=0, help="Semilla del muestreo")
+    p.add_argument("--R", type=float, default=R_tol, help="Residuo máximo (cm)")
+    p.add_argument("--theta", type=float, default=theta_tol, help="Ángulo máximo (grados)")
+    return add_batch_args(p).parse_args()
+
+
+def render(params):
+    """Figura de params: input, n_show, seed, R_tol y theta_tol (grados)."""
+    # Ajustes por evento (pendientes, interceptos, residuo máximo y ángulo entre
+    # segmentos) desde la caché; sólo se reajusta si cambian data.root o la geometría
+    fit = load_fit_cache(params["input"], GEOMETRY)
+
+    # Muestreo de índices
+    n_entries = len(fit["evn"])
+    np.random.seed(params["seed"])
+    sample = np.random.choice(n_entries, size=min(params["n_show"], n_entries), replace=False)
+
+    # Preparar figura
+    fig = plt.figure(figsize=(8,8))
+    ax = fig.add_subplot(111, projection="3d")
+
+    # Crear malla para placas con paso de 3 cm
+    grid = np.arange(-width_cm/2, width_cm/2 + 1e-6, 3)
+    xx, yy = np.meshgrid(grid, grid)
+
+    # Dibujar placas con superficie + dos juegos de líneas perpendiculares
+    for z0 in (z_sup, z_med, z_inf):
+        zz = np.full_like(xx, z0)
+        # 1) Superficie semitransparente SIN líneas
+        ax.plot_surface(
+            xx, yy, zz,
+            color='lightgray',
+            alpha=0.3,
+            linewidth=0,
+            rstride=1, cstride=1,
+            antialiased=True
+        )
+        # 2) Líneas paralelas al eje X
+        ax.plot_wireframe(
+            xx, yy, zz,
+            rcount=xx.shape[0],   # tantas “filas” como puntos en Y
+            ccount=1,             # sólo 1 “columna” → líneas paralelas a X
+            color="#6ED3C2FF",
+            linewidth=0.3,
+            alpha=0.6
+        )
+        # 3) Líneas paralelas al eje Y
+        ax.plot_wireframe(
+            xx, yy, zz,
+            rcount=1,             # sólo 1 “fila” → líneas paralelas a Y
+            ccount=yy.shape[1],   # tantas “columnas” como puntos en X
+            color="#6ED3C2FF",
+            linewidth=0.3,
+            alpha=0.6
+        )
+
+    # Suavizar y filtrar tracks: sólo se aplican los cortes sobre los ajustes guardados
+    keep = apply_cuts(fit, params["R_tol"], np.deg2rad(params["theta_tol"]), sample)
+
+    # Dibujar curva suave de los tracks que pasan el filtro
     z_line = np.linspace(z_sup, z_inf, 200)
-    x_line = px[0]*z_line + px[1]
-    y_line = py[0]*z_line + py[1]
-    ax.plot(x_line, y_line, z_line, linewidth=1)
-
-# Ajustes finales
-ticks = grid
-ax.set_xticks(ticks)
-ax.set_yticks(ticks)
-
-ax.set_xlabel("X (cm)")
-ax.set_ylabel("Y (cm)")
-ax.set_zlabel("Z (cm)")
-ax.set_xlim(-width_cm/2, width_cm/2)
-ax.set_ylim(-width_cm/2, width_cm/2)
-ax.set_zlim(z_inf, z_sup)
-ax.set_title("Trayectorias suavizadas y filtradas\nGraduación y retícula XY cada 3 cm")
-ax.view_init(elev=25, azim=45)
-plt.tight_layout()
-plt.show()
+    for j in sample[keep]:
+        x_line = fit["slope_x"][j]*z_line + fit["intercept_x"][j]
+        y_line = fit["slope_y"][j]*z_line + fit["intercept_y"][j]
+        ax.plot(x_line, y_line, z_line, linewidth=1)
+
+    # Ajustes finales
+    ticks = grid
+    ax.set_xticks(ticks)
+    ax.set_yticks(ticks)
+
+    ax.set_xlabel("X (cm)")
+    ax.set_ylabel("Y (cm)")
+    ax.set_zlabel("Z (cm)")
+    ax.set_xlim(-width_cm/2, width_cm/2)
+    ax.set_ylim(-width_cm/2, width_cm/2)
+    ax.set_zlim(z_inf, z_sup)
+    ax.set_title("Trayectorias suavizadas y filtradas\nGraduación y retícula XY cada 3 cm")
+    ax.view_init(elev=25, azim=45)
+    fig.tight_layout()
+    return fig
+
+
+def main():
+    args = parse_args()
+    if args.output and args.jobs > 0:
+        # La caché de ajustes se construye antes de repartir los trabajos
+        for path in dict.fromkeys(args.input):
+            load_fit_cache(path, GEOMETRY)
+    jobs = [{"input": path, "stem": stem(path), "n_show": args.n_show, "seed": args.seed,
+             "R_tol": args.R, "theta_tol": args.theta}
+            for path in args.input]
+    run_figures(render, jobs, args, lambda params: [params["input"]])
+
+
+if __name__ == "__main__":
+    main()
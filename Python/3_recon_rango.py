@@ -3,99 +3,138 @@
 plot_muon_reconstruction_smoothed_ticks_grid.py
 
 Reconstrucción 3D de trayectorias suavizadas y filtradas, con placas.
-Permite seleccionar interactívamente el rango de filas (Row) a analizar.
+Permite seleccionar interactívamente el rango de filas (Row) a analizar,
+o bien ventanas de tiempo (--time) que se traducen a filas con time_index.py.
+
+Uso sin pantalla (ver batch_plot.py), varios rangos en paralelo:
+    python 3_recon_rango.py --range 0 99999 --range 100000 199999 -o figs/rango_{start}_{end}.png -j 4
 """
 
-import uproot
+import argparse
+
 import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D  # noqa: F401
 
+from batch_plot import add_batch_args, run_figures, stem
+from fit_cache import load_fit_range, make_geometry, apply_cuts
+from time_index import TimeIndex, parse_time
+from track_render import draw_paths, line_paths
+
 # Parámetros de geometría
 width_cm = 36.0          # ancho total de cada placa (cm)
 Nch = 12                 # número de canales por eje
 ch_width = width_cm / Nch
 z_sup, z_med, z_inf = 124.7, 62.2, 0.0
+GEOMETRY = make_geometry(z_sup, z_med, z_inf, ch_width, Nch)
 
 # Límites de filtrado
 R_tol = 1.0                 # residuo máximo permitido (cm)
-theta_tol = np.deg2rad(5)   # ángulo máximo permitido (rad)
-
-# --- Entrada interactiva de filas a analizar ---
-start_idx = int(input("Ingresa la Row de inicio (incial=0): "))
-end_idx   = int(input("Ingresa la Row final  (final=3692189): "))
-
-# Abre el fichero y extrae también el número de evento (evn)
-f = uproot.open("data.root")
-tree = f["matedata"]
-arr = tree.arrays(["A1","B1","A2","B2","A3","B3","evn"], library="np")
-
-# Muestra al usuario qué eventos corresponden a esas filas
-evn_start = int(arr["evn"][start_idx])
-evn_end   = int(arr["evn"][end_idx])
-print(f"\nEstás analizando entre el evento {evn_start} (Row {start_idx}) "
-      f"y el evento {evn_end} (Row {end_idx})\n")
-
-# Conversión de canales a coordenadas centradas
-offset = (Nch-1)/2 * ch_width
-X = {
-    'sup': arr["A3"]*ch_width - offset,
-    'med': arr["A2"]*ch_width - offset,
-    'inf': arr["A1"]*ch_width - offset
-}
-Y = {
-    'sup': arr["B3"]*ch_width - offset,
-    'med': arr["B2"]*ch_width - offset,
-    'inf': arr["B1"]*ch_width - offset
-}
-Z_vals = np.array([z_sup, z_med, z_inf])
-
-# Prepara lista de índices a iterar
-indices = np.arange(start_idx, end_idx+1)
-
-# Configura figura 3D
-fig = plt.figure(figsize=(8,8))
-ax = fig.add_subplot(111, projection="3d")
-
-# Dibuja placas con retícula cada 3 cm
-grid = np.arange(-width_cm/2, width_cm/2 + 1e-6, 3)
-xx, yy = np.meshgrid(grid, grid)
-for z0 in (z_sup, z_med, z_inf):
-    zz = np.full_like(xx, z0)
-    ax.plot_surface(xx, yy, zz, color='lightgray', alpha=0.3, linewidth=0)
-    ax.plot_wireframe(xx, yy, zz, rcount=xx.shape[0], ccount=1, linewidth=0.3, alpha=0.6)
-    ax.plot_wireframe(xx, yy, zz, rcount=1, ccount=yy.shape[1], linewidth=0.3, alpha=0.6)
-
-# Suaviza y filtra trayectorias dentro del rango
-for i in indices:
-    xs = np.array([X['sup'][i], X['med'][i], X['inf'][i]])
-    ys = np.array([Y['sup'][i], Y['med'][i], Y['inf'][i]])
-    # ajuste lineal
-    px = np.polyfit(Z_vals, xs, 1)
-    py = np.polyfit(Z_vals, ys, 1)
-    xs_fit = px[0]*Z_vals + px[1]
-    ys_fit = py[0]*Z_vals + py[1]
-    # filtrado por residuo
-    if np.sqrt(((xs - xs_fit)**2 + (ys - ys_fit)**2).max()) > R_tol:
-        continue
-    # filtrado por ángulo
-    v = np.array([xs[1]-xs[0], ys[1]-ys[0], Z_vals[1]-Z_vals[0]])
-    w = np.array([xs[2]-xs[1], ys[2]-ys[1], Z_vals[2]-Z_vals[1]])
-    theta = np.arccos(np.clip(np.dot(v,w)/(np.linalg.norm(v)*np.linalg.norm(w)), -1,1))
-    if theta > theta_tol:
-        continue
-    # traza curva suave
-    z_line = np.linspace(z_sup, z_inf, 200)
-    ax.plot(px[0]*z_line+px[1], py[0]*z_line+py[1], z_line, linewidth=1)
-
-# Ajustes finales del gráfico
-ticks = grid
-ax.set_xticks(ticks); ax.set_yticks(ticks)
-ax.set_xlabel("X (cm)"); ax.set_ylabel("Y (cm)"); ax.set_zlabel("Z (cm)")
-ax.set_xlim(-width_cm/2, width_cm/2)
-ax.set_ylim(-width_cm/2, width_cm/2)
-ax.set_zlim(z_inf, z_sup)
-ax.set_title("Trayectorias suavizadas y filtradas\nRetícula XY cada 3 cm")
-ax.view_init(elev=25, azim=45)
-plt.tight_layout()
-plt.show()
\ No newline at end of file
+theta_tol = 5.0             # ángulo máximo permitido (grados)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Trayectorias filtradas en un rango de filas")
+    p.add_argument("-i", "--input", nargs="+", default=["data.root"],
+                   help="Archivos ROOT con matedata")
+    p.add_argument("--range", nargs=2, type=int, action="append", metavar=("INICIO", "FIN"),
+                   dest="ranges", help="Rango de filas (se puede repetir); sin --range se pregunta")
+    p.add_argument("--time", nargs=2, action="append", metavar=("DESDE", "HASTA"), dest="times",
+                   help='Ventana de tiempo, p. ej. "2025-08-19 10:00" "2025-08-19 12:00" '
+                        "(se puede repetir); se traduce a filas con el índice de tp1")
+    p.add_argument("--utc-offset", type=float, default=0.0,
+                   help="Desfase de las fechas de --time respecto de UTC, en horas")
+    p.add_argument("--R", type=float, default=R_tol, help="Residuo máximo (cm)")
+    p.add_argument("--theta", type=float, default=theta_tol, help="Ángulo máximo (grados)")
+    p.add_argument("--per-event", action="store_true",
+                   help="Una línea por evento en vez de juntar trayectorias idénticas")
+    return add_batch_args(p).parse_args()
+
+
+def render(params):
+    """Figura de params: input, start, end, R_tol, theta_tol (grados) y aggregate."""
+    start_idx, end_idx = params["start"], params["end"]
+
+    # Configura figura 3D
+    fig = plt.figure(figsize=(8,8))
+    ax = fig.add_subplot(111, projection="3d")
+
+    # Dibuja placas con retícula cada 3 cm
+    grid = np.arange(-width_cm/2, width_cm/2 + 1e-6, 3)
+    xx, yy = np.meshgrid(grid, grid)
+    for z0 in (z_sup, z_med, z_inf):
+        zz = np.full_like(xx, z0)
+        ax.plot_surface(xx, yy, zz, color='lightgray', alpha=0.3, linewidth=0)
+        ax.plot_wireframe(xx, yy, zz, rcount=xx.shape[0], ccount=1, linewidth=0.3, alpha=0.6)
+        ax.plot_wireframe(xx, yy, zz, rcount=1, ccount=yy.shape[1], linewidth=0.3, alpha=0.6)
+
+    # Ajustes por evento sólo de las entradas del rango: de la caché si ya
+    # existe (mmap) o ajustando sólo esas entradas si no
+    fit = load_fit_range(params["input"], GEOMETRY, start_idx, end_idx + 1)
+    evn_start = int(fit["evn"][0])
+    evn_end   = int(fit["evn"][-1])
+
+    # Filtra las trayectorias del rango aplicando los cortes
+    passed = apply_cuts(fit, params["R_tol"], np.deg2rad(params["theta_tol"]))
+    keep = np.flatnonzero(passed)
+
+    # traza las rectas ajustadas que pasan el filtro en una sola colección;
+    # eventos con el mismo patrón de hits comparten recta y se juntan
+    paths = line_paths(fit["slope_x"][keep], fit["intercept_x"][keep],
+                       fit["slope_y"][keep], fit["intercept_y"][keep], z_sup, z_inf)
+    _, n_paths = draw_paths(ax, paths, color="tab:blue", aggregate=params["aggregate"])
+    print(f"Trayectorias dibujadas: {n_paths} (de {len(keep)} eventos que pasan los cortes)")
+
+    # Muestra al usuario qué eventos corresponden a esas filas
+    print(f"\nEstás analizando entre el evento {evn_start} (Row {start_idx}) "
+          f"y el evento {evn_end} (Row {end_idx})\n")
+
+    # Ajustes finales del gráfico
+    ticks = grid
+    ax.set_xticks(ticks); ax.set_yticks(ticks)
+    ax.set_xlabel("X (cm)"); ax.set_ylabel("Y (cm)"); ax.set_zlabel("Z (cm)")
+    ax.set_xlim(-width_cm/2, width_cm/2)
+    ax.set_ylim(-width_cm/2, width_cm/2)
+    ax.set_zlim(z_inf, z_sup)
+    ax.set_title("Trayectorias suavizadas y filtradas\nRetícula XY cada 3 cm")
+    ax.view_init(elev=25, azim=45)
+    fig.tight_layout()
+    return fig
+
+
+def main():
+    args = parse_args()
+    ranges = args.ranges or []
+    if not ranges and not args.times:
+        if args.output:
+            raise SystemExit("Con -o hay que indicar al menos un --range o --time")
+        # --- Entrada interactiva de filas a analizar ---
+        start_idx = int(input("Ingresa la Row de inicio (incial=0): "))
+        end_idx   = int(input("Ingresa la Row final  (final=3692189): "))
+        ranges = [(start_idx, end_idx)]
+
+    jobs = []
+    for path in args.input:
+        path_ranges = list(ranges)
+        for t_from, t_to in args.times or []:
+            # Ventana de tiempo → filas con dos búsquedas binarias en el índice de tp1
+            index = TimeIndex(path)
+            rows = index.entries(parse_time(t_from, args.utc_offset),
+                                 parse_time(t_to, args.utc_offset))
+            if not len(rows):
+                print(f"{path}: no hay eventos entre {t_from} y {t_to}")
+                continue
+            if not index.monotonic:
+                print(f"{path}: tp1 no es monótono; se usan las filas {rows[0]}–{rows[-1]}, "
+                      "que pueden incluir eventos fuera de la ventana")
+            path_ranges.append((int(rows[0]), int(rows[-1])))
+        jobs += [{"input": path, "stem": stem(path), "start": start, "end": end,
+                  "R_tol": args.R, "theta_tol": args.theta, "aggregate": not args.per_event}
+                 for start, end in path_ranges]
+    if not jobs:
+        return
+    run_figures(render, jobs, args, lambda params: [params["input"]])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+acceptance.py
+
+Aceptancia geométrica del telescopio de tres placas por Monte Carlo, para
+pasar de las distribuciones angulares crudas (run_summary.py,
+reconstruct_muon_tracks.py) a intensidades.
+
+Se lanzan trayectorias rectas por puntos uniformes de la placa superior,
+con dirección según el espectro cenital I(θ) (cos^n θ, n = 2 por defecto,
+o una tabla θ, I dada por el usuario) pesado por cos θ, que es el flujo a
+través de un plano horizontal. Cada trayectoria se digitaliza en las
+tiras (A, B) de las tres placas igual que el detector (tira = piso de la
+coordenada sobre el ancho de canal, -1 fuera de la placa) y es aceptada
+si tiene hit en las tres. Para cada aceptada se acumula:
+
+- su patrón de hits (clave de hit_patterns.pattern_keys, planos en el
+  orden z_sup, z_med, z_inf como en fit_cache.py),
+- θ verdadero y θ, θx, θy reconstruidos desde los centros de las tiras
+  (track_fit.fit_tracks), en los bins de run_summary.py.
+
+Cada trayectoria lleva el peso w = Z / I(θ) (Z = ∫ I cos θ dΩ), así que
+las sumas de pesos dan el factor geométrico G (cm²·sr) de cada patrón o
+bin, independiente del espectro usado para muestrear; el espectro sólo
+decide dónde se concentra la estadística. Con G la intensidad en un bin
+es conteos / (tiempo vivo · G).
+
+Las trayectorias se reparten en tareas de TASK_TRACKS entre procesos
+(cada una con su semilla derivada de la semilla global, así que el
+resultado no depende del número de procesos) y cada tarea avanza por
+bloques de NumPy de CHUNK_SIZE. El resultado se guarda en
+.acceptance_cache/<hash>.npz, con el hash de la geometría, el espectro, el
+número de trayectorias y la semilla: aplicarlo a otra corrida no cuesta
+nada.
+
+Uso:
+    python acceptance.py --tracks 2e8 -j 8 -o aceptancia_theta.csv
+    python acceptance.py --spectrum espectro.csv     # columnas theta_deg,intensity
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from fit_cache import make_geometry
+from hit_patterns import N_VALUES, pattern_keys
+from run_summary import THETA_EDGES, THETA_XY_EDGES
+from track_fit import Nch, ch_width, fit_tracks, z_inf, z_med, z_sup
+
+# Versión del formato de la caché (invalida las anteriores si cambia)
+ACCEPTANCE_VERSION = 1
+
+# Carpeta por defecto de las cachés
+CACHE_DIR = ".acceptance_cache"
+
+# Geometría del telescopio (la misma clave que fit_cache.py)
+GEOMETRY = make_geometry(z_sup, z_med, z_inf, ch_width, Nch)
+
+# Trayectorias por tarea del pool y por bloque de NumPy dentro de cada tarea
+TASK_TRACKS = 10000000
+CHUNK_SIZE = 1000000
+
+# Puntos de la tabla de cos θ para muestrear espectros tabulados
+SPECTRUM_GRID = 4096
+
+# Histogramas angulares: nombre → bordes (grados)
+ANGLE_BINS = {"theta_true": THETA_EDGES, "theta": THETA_EDGES,
+              "theta_x": THETA_XY_EDGES, "theta_y": THETA_XY_EDGES}
+
+
+# ---------------------------------------------------------------------------
+# Espectros
+# ---------------------------------------------------------------------------
+
+def power_spectrum(exponent=2.0):
+    """Espectro I(θ) ∝ cos^n θ."""
+    return {"kind": "power", "exponent": float(exponent)}
+
+
+def read_spectrum(path):
+    """Espectro tabulado desde un CSV con columnas theta_deg, intensity."""
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    theta = np.array([float(r["theta_deg"]) for r in rows])
+    intensity = np.array([float(r["intensity"]) for r in rows])
+    order = np.argsort(theta)
+    if len(theta) < 2 or np.any(intensity < 0) or not np.any(intensity > 0):
+        raise ValueError(f"Espectro inválido en {path}")
+    return {"kind": "table", "theta_deg": theta[order].tolist(),
+            "intensity": intensity[order].tolist()}
+
+
+def spectrum_label(spectrum):
+    if spectrum["kind"] == "power":
+        return f"cos^{spectrum['exponent']:g}"
+    return f"tabla de {len(spectrum['theta_deg'])} puntos"
+
+
+def _intensity(spectrum, cos_t):
+    """I(θ) en cos_t (sin normalizar)."""
+    if spectrum["kind"] == "power":
+        return cos_t ** spectrum["exponent"]
+    theta = np.degrees(np.arccos(np.clip(cos_t, 0.0, 1.0)))
+    return np.interp(theta, spectrum["theta_deg"], spectrum["intensity"], left=0.0, right=0.0)
+
+
+def make_sampler(spectrum):
+    """
+    Función (rng, m) → (cos θ, peso) que muestrea cos θ con densidad
+    ∝ I(θ) cos θ en [0, 1]; el peso es Z / I(θ) con Z = 2π ∫ I(c) c dc.
+    """
+    if spectrum["kind"] == "power":
+        n = spectrum["exponent"]
+        z_norm = 2 * np.pi / (n + 2)
+
+        def sample(rng, m):
+            cos_t = rng.random(m) ** (1.0 / (n + 2))
+            return cos_t, z_norm / cos_t ** n
+        return sample
+
+    c = np.linspace(0.0, 1.0, SPECTRUM_GRID)
+    density = _intensity(spectrum, c) * c
+    cdf = np.concatenate([[0.0], np.cumsum((density[1:] + density[:-1]) / 2 * np.diff(c))])
+    z_norm = 2 * np.pi * cdf[-1]
+    cdf /= cdf[-1]
+
+    def sample(rng, m):
+        cos_t = np.interp(rng.random(m), cdf, c)
+        cos_t = np.clip(cos_t, c[1] / 2, 1.0)
+        return cos_t, z_norm / np.maximum(_intensity(spectrum, cos_t), 1e-300)
+    return sample
+
+
+# ---------------------------------------------------------------------------
+# Simulación
+# ---------------------------------------------------------------------------
+
+def digitize(coord, geometry):
+    """Tira de cada coordenada centrada (cm), como el detector; -1 fuera de la placa."""
+    nch, pitch = geometry["Nch"], geometry["ch_width"]
+    strip = np.floor((coord + nch * pitch / 2) / pitch).astype(np.int64)
+    return np.where((strip >= 0) & (strip < nch), strip, -1)
+
+
+def _new_sums():
+    sums = {"n_thrown": 0, "n_accepted": 0, "thrown_true": np.zeros(len(THETA_EDGES) - 1, dtype=np.int64)}
+    for name, edges in ANGLE_BINS.items():
+        sums[f"{name}_count"] = np.zeros(len(edges) - 1, dtype=np.int64)
+        sums[f"{name}_w"] = np.zeros(len(edges) - 1)
+        sums[f"{name}_w2"] = np.zeros(len(edges) - 1)
+    return sums
+
+
+def simulate_chunk(rng, m, geometry, sampler, sums, patterns):
+    """Lanza m trayectorias y suma sus aportes a sums y patterns (conteo, peso)."""
+    z = np.array(geometry["z"], dtype=float)     # superior, media, inferior
+    half = geometry["Nch"] * geometry["ch_width"] / 2
+    cos_t, w = sampler(rng, m)
+    phi = rng.uniform(0.0, 2 * np.pi, m)
+    x0 = rng.uniform(-half, half, m)
+    y0 = rng.uniform(-half, half, m)
+    tan_t = np.sqrt(1.0 - cos_t ** 2) / cos_t
+    theta_true = np.degrees(np.arccos(cos_t))
+
+    depth = (z.max() - z)[:, None]
+    A = digitize(x0 + depth * tan_t * np.cos(phi), geometry)
+    B = digitize(y0 + depth * tan_t * np.sin(phi), geometry)
+    ok = np.all(A >= 0, axis=0) & np.all(B >= 0, axis=0)
+
+    sums["n_thrown"] += m
+    sums["n_accepted"] += int(ok.sum())
+    sums["thrown_true"] += np.histogram(theta_true, THETA_EDGES)[0]
+
+    A, B, w = A[:, ok], B[:, ok], w[ok]
+    center = (geometry["Nch"] - 1) / 2 * geometry["ch_width"]
+    fit = fit_tracks(A * geometry["ch_width"] - center, B * geometry["ch_width"] - center, z)
+    angles = {"theta_true": theta_true[ok], "theta": np.degrees(fit["theta"]),
+              "theta_x": np.degrees(fit["theta_x"]), "theta_y": np.degrees(fit["theta_y"])}
+    for name, edges in ANGLE_BINS.items():
+        sums[f"{name}_count"] += np.histogram(angles[name], edges)[0]
+        sums[f"{name}_w"] += np.histogram(angles[name], edges, weights=w)[0]
+        sums[f"{name}_w2"] += np.histogram(angles[name], edges, weights=w ** 2)[0]
+
+    keys = pattern_keys(list(A), list(B))
+    patterns[0] += np.bincount(keys, minlength=len(patterns[0]))
+    patterns[1] += np.bincount(keys, weights=w, minlength=len(patterns[1]))
+
+
+def _run_task(task):
+    """Trabajo de un proceso: n trayectorias con su propia semilla."""
+    geometry, spectrum, n, seed_seq, chunk_size = task
+    rng = np.random.default_rng(seed_seq)
+    sampler = make_sampler(spectrum)
+    sums = _new_sums()
+    space = N_VALUES ** (2 * len(geometry["z"]))
+    patterns = [np.zeros(space, dtype=np.int64), np.zeros(space)]
+    for first in range(0, n, chunk_size):
+        simulate_chunk(rng, min(chunk_size, n - first), geometry, sampler, sums, patterns)
+    # Sólo viajan de vuelta los patrones vistos
+    seen = np.flatnonzero(patterns[0])
+    return sums, seen, patterns[0][seen], patterns[1][seen]
+
+
+def run_acceptance(geometry=GEOMETRY, spectrum=None, n_tracks=10 ** 8, seed=0,
+                   jobs=None, chunk_size=CHUNK_SIZE):
+    """
+    Simula n_tracks trayectorias y devuelve el dict de resultados (ver
+    load_acceptance). jobs = 0 corre todo en este proceso.
+    """
+    spectrum = spectrum or power_spectrum()
+    sizes = [TASK_TRACKS] * (n_tracks // TASK_TRACKS)
+    if n_tracks % TASK_TRACKS:
+        sizes.append(n_tracks % TASK_TRACKS)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(geometry, spectrum, n, s, chunk_size) for n, s in zip(sizes, seeds)]
+
+    if jobs == 0 or len(tasks) == 1:
+        parts = map(_run_task, tasks)
+        return _merge(parts, geometry, spectrum, seed)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return _merge(pool.map(_run_task, tasks), geometry, spectrum, seed)
+
+
+def _merge(parts, geometry, spectrum, seed):
+    total = _new_sums()
+    keys, counts, weights = [], [], []
+    for sums, k, c, w in parts:
+        for name, value in sums.items():
+            total[name] += value
+        keys.append(k)
+        counts.append(c)
+        weights.append(w)
+    keys = np.concatenate(keys)
+    uniq, inverse = np.unique(keys, return_inverse=True)
+
+    # G = área de la placa superior · Σ w / N (cm²·sr)
+    half = geometry["Nch"] * geometry["ch_width"] / 2
+    scale = (2 * half) ** 2 / total["n_thrown"]
+    out = {
+        "n_thrown": total["n_thrown"], "n_accepted": total["n_accepted"],
+        "thrown_true": total["thrown_true"],
+        "pattern_keys": uniq,
+        "pattern_count": np.bincount(inverse, weights=np.concatenate(counts),
+                                     minlength=len(uniq)).astype(np.int64),
+        "pattern_G": np.bincount(inverse, weights=np.concatenate(weights), minlength=len(uniq)) * scale,
+        "geometry": geometry, "spectrum": spectrum, "seed": seed,
+    }
+    for name, edges in ANGLE_BINS.items():
+        out[f"{name}_edges"] = edges
+        out[f"{name}_count"] = total[f"{name}_count"]
+        out[f"{name}_G"] = total[f"{name}_w"] * scale
+        out[f"{name}_G_err"] = np.sqrt(total[f"{name}_w2"]) * scale
+    out["G_total"] = float(out["pattern_G"].sum())
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Caché
+# ---------------------------------------------------------------------------
+
+def cache_key(geometry, spectrum, n_tracks, seed):
+    """Hash de la geometría, el espectro, la estadística y la semilla."""
+    h = hashlib.sha1()
+    h.update(json.dumps({"version": ACCEPTANCE_VERSION, "geometry": geometry, "spectrum": spectrum,
+                         "n_tracks": int(n_tracks), "seed": int(seed)}, sort_keys=True).encode())
+    return h.hexdigest()[:16]
+
+
+def save_acceptance(result, path):
+    meta = {k: result[k] for k in ("geometry", "spectrum", "seed", "n_thrown", "n_accepted", "G_total")}
+    arrays = {k: v for k, v in result.items() if isinstance(v, np.ndarray)}
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, meta=json.dumps(meta), **arrays)
+    os.replace(tmp, path)
+
+
+def read_acceptance(path):
+    with np.load(path) as data:
+        out = {k: data[k] for k in data.files if k != "meta"}
+        out.update(json.loads(str(data["meta"])))
+    return out
+
+
+def load_acceptance(geometry=GEOMETRY, spectrum=None, n_tracks=10 ** 8, seed=0,
+                    jobs=None, cache_dir=CACHE_DIR):
+    """
+    Resultado de run_acceptance para estos parámetros, desde la caché si
+    existe. Dict con n_thrown, n_accepted, G_total, pattern_keys /
+    pattern_count / pattern_G y, para theta_true, theta, theta_x y
+    theta_y, <nombre>_edges, _count, _G y _G_err (cm²·sr por bin).
+    """
+    spectrum = spectrum or power_spectrum()
+    path = os.path.join(cache_dir, cache_key(geometry, spectrum, n_tracks, seed) + ".npz")
+    if os.path.exists(path):
+        return read_acceptance(path)
+    print(f"Calculando aceptancia ({n_tracks:.3g} trayectorias, {spectrum_label(spectrum)}) ...")
+    result = run_acceptance(geometry, spectrum, n_tracks, seed, jobs)
+    os.makedirs(cache_dir, exist_ok=True)
+    save_acceptance(result, path)
+    print(f"Aceptancia guardada en {path}")
+    return read_acceptance(path)
+
+
+# ---------------------------------------------------------------------------
+# Aplicación
+# ---------------------------------------------------------------------------
+
+def intensity(counts, live_time_s, acc, name="theta"):
+    """
+    Intensidad (cm⁻² sr⁻¹ s⁻¹) por bin a partir de un histograma de conteos
+    con los bordes de acc[name + "_edges"]; NaN donde G = 0.
+    """
+    G = acc[f"{name}_G"]
+    counts = np.asarray(counts, dtype=float)
+    if counts.shape != G.shape:
+        raise ValueError(f"El histograma tiene {counts.shape[0]} bins y la aceptancia {G.shape[0]}")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(G > 0, counts / (live_time_s * G), np.nan)
+
+
+def pattern_acceptance(acc, keys):
+    """G (cm²·sr) de cada clave de patrón de keys; 0 si el patrón no se vio."""
+    keys = np.asarray(keys, dtype=np.int64)
+    pos = np.searchsorted(acc["pattern_keys"], keys)
+    pos = np.minimum(pos, len(acc["pattern_keys"]) - 1)
+    found = acc["pattern_keys"][pos] == keys
+    return np.where(found, acc["pattern_G"][pos], 0.0)
+
+
+def write_acceptance_csv(path, acc, name="theta"):
+    edges = acc[f"{name}_edges"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([f"{name}_lo_deg", f"{name}_hi_deg", "accepted", "G_cm2_sr", "G_err_cm2_sr"])
+        for lo, hi, c, g, e in zip(edges[:-1], edges[1:], acc[f"{name}_count"],
+                                   acc[f"{name}_G"], acc[f"{name}_G_err"]):
+            writer.writerow([f"{lo:g}", f"{hi:g}", int(c), f"{g:.6g}", f"{e:.3g}"])
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Aceptancia geométrica por Monte Carlo")
+    p.add_argument("--tracks", type=float, default=1e8, help="Trayectorias a lanzar (acepta 2e8)")
+    p.add_argument("--exponent", type=float, default=2.0, help="Espectro I ∝ cos^n θ")
+    p.add_argument("--spectrum", help="CSV theta_deg,intensity con el espectro (reemplaza --exponent)")
+    p.add_argument("--seed", type=int, default=0, help="Semilla global")
+    p.add_argument("-j", "--jobs", type=int, default=None, help="Procesos (0 = sin pool)")
+    p.add_argument("--cache-dir", default=CACHE_DIR, help="Carpeta de las cachés")
+    p.add_argument("--angle", choices=tuple(ANGLE_BINS), default="theta",
+                   help="Ángulo de la tabla de salida")
+    p.add_argument("-o", "--output", default="aceptancia_theta.csv", help="CSV con G por bin")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    spectrum = read_spectrum(args.spectrum) if args.spectrum else power_spectrum(args.exponent)
+    acc = load_acceptance(GEOMETRY, spectrum, int(args.tracks), args.seed, args.jobs, args.cache_dir)
+    print(f"Aceptadas {int(acc['n_accepted'])} de {int(acc['n_thrown'])} trayectorias; "
+          f"G total = {acc['G_total']:.3f} cm²·sr en {len(acc['pattern_keys'])} patrones")
+    write_acceptance_csv(args.output, acc, args.angle)
+    print(f"G por bin de {args.angle} guardado en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+batch_plot.py
+
+Modo por lotes (sin pantalla) de los scripts de gráficos 3D.
+
+Cada script define render(params) -> figura y una lista de trabajos
+(dicts de parámetros). Sin -o se dibuja el primer trabajo y se muestra
+con plt.show(), como siempre. Con -o se usa el backend Agg, la figura se
+guarda en PNG o PDF (según la extensión) y los trabajos se reparten entre
+procesos (-j). El nombre de salida admite campos de los parámetros, por
+ejemplo -o figs/rango_{start}_{end}.png o -o figs/{stem}.pdf.
+
+Una figura no se vuelve a generar si el archivo existe y no cambiaron ni
+sus parámetros, ni el contenido de sus archivos de entrada, ni el código
+del script y de los módulos de esta carpeta de los que depende
+(track_render, fit_cache, ...): la clave es un SHA-1 de todo eso y se
+guarda en un manifiesto JSON (figures_manifest.json). El hash de cada
+entrada sólo se recalcula si cambian su tamaño o mtime.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import matplotlib
+
+from mate_ingest import file_hash, load_manifest, save_manifest
+
+# Manifiesto por defecto de las figuras generadas
+MANIFEST = "figures_manifest.json"
+
+# Carpeta de los scripts y módulos cuyo código entra en la clave de las figuras
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def add_batch_args(p):
+    """Agrega al parser las opciones comunes del modo por lotes."""
+    p.add_argument("-o", "--output",
+                   help="Figura de salida (.png/.pdf), con campos {param} opcionales; "
+                        "sin -o se muestra en pantalla")
+    p.add_argument("-j", "--jobs", type=int, default=0,
+                   help="Procesos para generar las figuras (0 = en serie)")
+    p.add_argument("--dpi", type=int, default=150, help="Resolución de los PNG")
+    p.add_argument("--manifest", default=MANIFEST, help="Manifiesto de figuras generadas")
+    p.add_argument("--force", action="store_true",
+                   help="Regenera aunque la figura esté al día")
+    return p
+
+
+def input_hashes(paths, manifest):
+    """SHA-1 de cada entrada, reutilizando el del manifiesto si no cambió."""
+    known = manifest.setdefault("files", {})
+    out = []
+    for path in paths:
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        old = known.get(path)
+        if not old or old["size"] != st.st_size or old["mtime_ns"] != st.st_mtime_ns:
+            old = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": file_hash(path)}
+            known[path] = old
+        out.append(old["sha1"])
+    return out
+
+
+def local_modules(module):
+    """
+    module y los módulos de esta carpeta de los que depende, siguiendo lo
+    que importan (módulos y funciones o clases traídas con from ... import).
+    """
+    found = {}
+    stack = [module]
+    while stack:
+        mod = stack.pop()
+        path = getattr(mod, "__file__", None)
+        if not path or mod.__name__ in found or os.path.dirname(os.path.abspath(path)) != _HERE:
+            continue
+        found[mod.__name__] = mod
+        for value in vars(mod).values():
+            name = value.__name__ if inspect.ismodule(value) else getattr(value, "__module__", None)
+            if isinstance(name, str) and name in sys.modules:
+                stack.append(sys.modules[name])
+    return [found[name] for name in sorted(found)]
+
+
+@lru_cache(maxsize=None)
+def code_hash(module):
+    """SHA-1 del código de module y de sus módulos locales (local_modules)."""
+    h = hashlib.sha1()
+    for mod in local_modules(module):
+        h.update(mod.__name__.encode())
+        h.update(inspect.getsource(mod).encode())
+    return h.hexdigest()
+
+
+def figure_key(render, params, hashes):
+    """Clave de una figura: código del script y sus módulos, parámetros y entradas."""
+    h = hashlib.sha1()
+    h.update(code_hash(inspect.getmodule(render)).encode())
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+    for s in hashes:
+        h.update(s.encode())
+    return h.hexdigest()
+
+
+def _render_job(task):
+    render, params, output, dpi = task
+    import matplotlib.pyplot as plt
+
+    fig = render(params)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    fig.savefig(output, dpi=dpi)
+    plt.close(fig)
+    return output
+
+
+def run_figures(render, jobs, args, inputs_of):
+    """
+    Genera las figuras de jobs (lista de dicts de parámetros).
+
+    inputs_of(params) devuelve la lista de archivos de entrada de un
+    trabajo. Sin args.output se muestra el primero en pantalla. Si dos
+    trabajos dan el mismo nombre de salida se aborta antes de dibujar.
+    """
+    if not jobs:
+        print("No hay figuras que generar")
+        return
+    if not args.output:
+        import matplotlib.pyplot as plt
+
+        render(jobs[0])
+        plt.show()
+        return
+
+    outputs = [args.output.format(**params) for params in jobs]
+    seen, repeated = set(), []
+    for output in outputs:
+        path = os.path.abspath(output)
+        if path in seen and output not in repeated:
+            repeated.append(output)
+        seen.add(path)
+    if repeated:
+        raise SystemExit(f"-o {args.output} da el mismo archivo a varios trabajos "
+                         f"({', '.join(repeated)}); agrega un campo como {{stem}}")
+
+    matplotlib.use("Agg")
+    manifest = load_manifest(args.manifest)
+    figures = manifest.setdefault("figures", {})
+
+    pending = []
+    for params, output in zip(jobs, outputs):
+        key = figure_key(render, params, input_hashes(inputs_of(params), manifest))
+        if not args.force and figures.get(os.path.abspath(output)) == key and os.path.exists(output):
+            print(f"Al día: {output}")
+            continue
+        pending.append(((render, params, output, args.dpi), key))
+
+    t0 = time.time()
+    tasks = [t for t, _ in pending]
+    if args.jobs > 0 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            done = list(pool.map(_render_job, tasks))
+    else:
+        done = [_render_job(t) for t in tasks]
+
+    for output, (_, key) in zip(done, pending):
+        figures[os.path.abspath(output)] = key
+        print(f"Guardada: {output}")
+    save_manifest(manifest, args.manifest)
+    print(f"{len(done)} figuras generadas, {len(jobs) - len(done)} al día, "
+          f"en {time.time() - t0:.1f} s")
+
+
+def stem(path):
+    """Nombre de un archivo sin carpeta ni extensión (campo {stem} de -o)."""
+    return os.path.splitext(os.path.basename(path))[0]
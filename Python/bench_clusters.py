@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+bench_clusters.py
+
+Compara el camino de hit único (decode_words + track_fit.fit_tracks) con
+la decodificación por clusters y búsqueda combinatoria de mate_clusters.py
+sobre un triplete sintético de mate_synth.py con la verdad guardada.
+
+Para cada probabilidad de multi-hit pedida se genera un triplete, se leen
+sus palabras una vez (read_triplet_words, fuera del tiempo medido) y se
+informa, para cada camino:
+
+- eventos por segundo de decodificación + ajuste (mejor de --repeat) y
+  contando también la lectura del triplete (read_triplet_words, común a
+  los dos caminos y casi siempre la parte más cara),
+- fracción de eventos con trayectoria,
+- fracción de esas trayectorias cuyas tiras elegidas coinciden (±0.5
+  tira) con las verdaderas en las tres placas.
+
+En el camino de hit único se aplica además el mismo corte de residuo que
+usa find_tracks, para que las eficiencias sean comparables.
+
+Uso:
+    python bench_clusters.py -n 1000000 --multi-hit 0.05 0.2 0.4
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from mate_clusters import (MAX_CLUSTERS, MAX_SIZE, PLATES, RESID_MAX, SLOPE_MAX, Z_PLATES,
+                           find_tracks, read_triplet_words)
+from mate_decode import decode_words
+from mate_synth import write_triplet
+from track_fit import ch_width, fit_tracks, offset
+
+MULTI_HIT = (0.05, 0.2, 0.4)
+
+# Índice de cada placa de PLATES en la verdad de mate_synth (orden m101, m102, m103)
+TRUTH_ROW = {1: 0, 2: 1, 3: 2}
+
+
+def single_hit(words, resid_max=RESID_MAX, slope_max=SLOPE_MAX):
+    """
+    Camino de hit único: strips por placa (-1 si no hay hit único) y
+    máscara de eventos con trayectoria.
+    """
+    pos = {plate: decode_words(words[f"word{plate}"]) for plate in PLATES}
+    strips_B = np.stack([pos[p][0] for p in PLATES])
+    strips_A = np.stack([pos[p][1] for p in PLATES])
+    complete = np.all(strips_A >= 0, axis=0)
+    fit = fit_tracks(strips_A[:, complete] * ch_width - offset,
+                     strips_B[:, complete] * ch_width - offset, Z_PLATES)
+    found = np.zeros(len(complete), dtype=bool)
+    found[complete] = ((fit["max_resid"] <= resid_max)
+                       & (np.abs(fit["slope_x"]) <= slope_max)
+                       & (np.abs(fit["slope_y"]) <= slope_max))
+    return {"A": strips_A, "B": strips_B, "found": found}
+
+
+def clustered(words, max_clusters=MAX_CLUSTERS, resid_max=RESID_MAX, slope_max=SLOPE_MAX,
+              max_size=MAX_SIZE):
+    """Camino de clusters: salida de find_tracks en el orden de PLATES."""
+    tracks = find_tracks([words[f"word{plate}"] for plate in PLATES], Z_PLATES,
+                         slope_max, resid_max, max_clusters, max_size)
+    tracks["A"] = np.stack([tracks[f"A{p}"] for p in PLATES])
+    tracks["B"] = np.stack([tracks[f"B{p}"] for p in PLATES])
+    return tracks
+
+
+def truth_match(result, truth, evn):
+    """Eventos cuyas tiras elegidas coinciden con las verdaderas en todas las placas."""
+    idx = np.searchsorted(truth["evn"], evn)
+    rows = [TRUTH_ROW[p] for p in PLATES]
+    ok = np.ones(len(evn), dtype=bool)
+    for axis in ("A", "B"):
+        true = truth[f"strip_{axis}"][rows][:, idx]
+        with np.errstate(invalid="ignore"):
+            ok &= np.all(np.abs(result[axis] - true) <= 0.5, axis=0)
+    return ok & result["found"]
+
+
+def timed(func, words, repeat):
+    """(resultado, mejor tiempo en s) de repeat llamadas."""
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func(words)
+        best = min(best, time.perf_counter() - t0)
+    return result, best
+
+
+def run_benchmark(n_events, multi_hits=MULTI_HIT, seed=0, repeat=3, workdir=None):
+    """Mide los dos caminos para cada multi_hit; devuelve una lista de dicts."""
+    results = []
+    for multi_hit in multi_hits:
+        work = tempfile.mkdtemp(prefix="bench_clusters_", dir=workdir)
+        try:
+            prefix = os.path.join(work, "synthetic")
+            truth_path = os.path.join(work, "truth.npz")
+            write_triplet(prefix, n_events, seed, truth_path=truth_path, multi_hit=multi_hit)
+            truth = np.load(truth_path)
+            t0 = time.perf_counter()
+            words = read_triplet_words(prefix)
+            read_s = time.perf_counter() - t0
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+
+        n = len(words["evn"])
+        for name, func in (("single", single_hit), ("clusters", clustered)):
+            result, seconds = timed(func, words, repeat)
+            found = result["found"]
+            match = truth_match(result, truth, words["evn"])
+            res = {
+                "multi_hit": multi_hit, "path": name, "events": n, "seconds": seconds,
+                "events_per_s": n / seconds if seconds > 0 else None,
+                "read_seconds": read_s, "end_to_end_per_s": n / (read_s + seconds),
+                "found": float(found.mean()),
+                "match": float(match.sum() / max(found.sum(), 1)),
+            }
+            if "multi" in result:
+                res["multi"] = float(result["multi"].mean())
+                res["mean_combos"] = float(result["n_combos"].mean())
+            print_result(res)
+            results.append(res)
+    return results
+
+
+def print_result(res):
+    extra = ""
+    if "multi" in res:
+        extra = f"  (multi {res['multi']:.3f}, {res['mean_combos']:.2f} comb./evento)"
+    print(f"{res['multi_hit']:>9.2f} {res['path']:<9} {res['seconds']:8.3f} s "
+          f"{res['events_per_s'] / 1e6:8.2f} M/s {res['end_to_end_per_s'] / 1e6:8.2f} M/s "
+          f"{res['found']:9.3f} {res['match']:9.4f}{extra}")
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Hit único vs. clusters con búsqueda combinatoria")
+    p.add_argument("-n", "--events", type=float, default=1e6, help="Eventos del triplete sintético")
+    p.add_argument("--multi-hit", nargs="+", type=float, default=list(MULTI_HIT),
+                   help="Probabilidades de tira extra por placa y eje")
+    p.add_argument("--seed", type=int, default=0, help="Semilla de los datos sintéticos")
+    p.add_argument("--repeat", type=int, default=3, help="Repeticiones por medición (se toma la mejor)")
+    p.add_argument("--workdir", default=None, help="Carpeta para los archivos temporales")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    print(f"{'multi-hit':>9} {'camino':<9} {'tiempo':>10} {'ritmo':>10} {'con lectura':>12} "
+          f"{'con traza':>9} {'verdad':>9}")
+    run_benchmark(int(args.events), args.multi_hit, args.seed, args.repeat, args.workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+bench_decode.py
+
+Compara la decodificación línea por línea (get_coordinates_single) con la
+vectorizada (get_coordinates_batch) sobre un triplete m101/m102/m103.
+
+- Con --prefix usa archivos reales: <prefix>_06h00_mate-m10{1,2,3}.txt
+- Sin --prefix genera un triplete sintético de --events líneas.
+
+Verifica que ambas salidas sean idénticas y muestra los tiempos.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from mate_decode import (
+    check_evn, get_coordinates_single,
+    read_mate_file, check_evn_batch, get_coordinates_batch, legacy_spans,
+)
+
+SUFFIXES = ("_06h00_mate-m101.txt", "_06h00_mate-m102.txt", "_06h00_mate-m103.txt")
+
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description="Benchmark de decodificación de archivos mate"
+    )
+    p.add_argument(
+        "--prefix", default=None,
+        help="Prefijo del triplete real (sin _06h00_mate-m10X.txt)"
+    )
+    p.add_argument(
+        "-n", "--events", type=int, default=200000,
+        help="Número de eventos del triplete sintético"
+    )
+    p.add_argument(
+        "--seed", type=int, default=0,
+        help="Semilla para los datos sintéticos"
+    )
+    return p.parse_args()
+
+
+# Variantes de los campos hex (h1, h2, h3) que int(h1 + h2 + h3, 16) acepta o
+# rechaza sin que la tabla de consulta las reconozca
+SLOPPY_HEX = (
+    lambda h: (" " + h[0], h[1], h[2]),            # espacio inicial: válida
+    lambda h: (h[0], h[1], h[2] + " "),            # espacio final: válida
+    lambda h: ("0x" + h[0], h[1], h[2]),           # prefijo 0x: válida
+    lambda h: ("0X" + h[0], h[1], h[2]),           # prefijo 0X: válida
+    lambda h: ("+" + h[0], h[1], h[2]),            # signo: válida
+    lambda h: (h[0], "_" + h[1], h[2]),            # guion bajo entre dígitos: válida
+    lambda h: ("-" + h[0], h[1], h[2]),            # negativa: format la rechaza
+    lambda h: (h[0], " " + h[1], h[2]),            # espacio interior: inválida
+    lambda h: (h[0], h[1] + "0x", h[2]),           # 0x interior: inválida
+    lambda h: ("zz", h[1], h[2]),                  # basura: inválida
+)
+
+
+def write_synthetic(prefix, n, seed):
+    """
+    Escribe un triplete sintético con hits simples, múltiples y vacíos, y
+    algunos campos hex con espacios, prefijos o basura (SLOPPY_HEX).
+    """
+    rng = np.random.default_rng(seed)
+    evn = np.arange(1000, 1000 + n)
+    # Un salto de EVN a mitad del archivo para ejercitar el descarte
+    evn[n // 2:] += 5
+    tp1 = 1755590400 + np.arange(n) // 20
+    tp2 = rng.integers(0, 1 << 16, n)
+    for suffix in SUFFIXES:
+        B = rng.integers(0, 12, n)
+        A = rng.integers(0, 12, n)
+        word = (1 << (23 - B)) | (1 << (11 - A))
+        noisy = rng.random(n) < 0.1
+        word[noisy] |= rng.integers(0, 1 << 24, int(noisy.sum()))
+        word[rng.random(n) < 0.02] = 0
+        sloppy = np.where(rng.random(n) < 0.001, rng.integers(0, len(SLOPPY_HEX), n), -1)
+        with open(prefix + suffix, "w") as f:
+            for t1, w, t2, e, k in zip(tp1, word, tp2, evn, sloppy):
+                h = (f"{w >> 16:02x}", f"{(w >> 8) & 0xFF:02x}", f"{w & 0xFF:02x}")
+                if k >= 0:
+                    h = SLOPPY_HEX[k](h)
+                f.write(f"{t1},{h[0]},{h[1]},{h[2]},{t2},{e}\n")
+
+
+def run_legacy(prefix):
+    data = [[l.split(",") for l in open(prefix + s).readlines()] for s in SUFFIXES]
+    errors = check_evn(*data, prefix)
+    return [get_coordinates_single(d, *errors) for d in data], errors
+
+
+def run_batch(prefix, errors=None):
+    """
+    Camino vectorizado. Si se pasan los errores de check_evn se usan sus
+    mismos intervalos de descarte para poder comparar las salidas; si no,
+    se usan todos los saltos que detecta check_evn_batch.
+    """
+    data = [read_mate_file(prefix + s) for s in SUFFIXES]
+    bad_spans = check_evn_batch(*data, prefix)
+    if errors is not None:
+        bad_spans = legacy_spans(*errors)
+    return [get_coordinates_batch(d, bad_spans) for d in data]
+
+
+def same_output(legacy, batch):
+    """Compara las salidas convirtiendo la de referencia a enteros."""
+    for ref, new in zip(legacy, batch):
+        pos_B, pos_A, pos_evn, pos_tp1, pos_tp2 = ref
+        expected = (
+            [b[0] for b in pos_B], [a[0] for a in pos_A],
+            [int(e) for e in pos_evn], [int(t) for t in pos_tp1], [int(t) for t in pos_tp2],
+        )
+        for col_ref, col_new in zip(expected, new):
+            if not np.array_equal(np.asarray(col_ref, dtype=np.int64), col_new):
+                return False
+    return True
+
+
+def main():
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        prefix = args.prefix
+        if prefix is None:
+            prefix = os.path.join(tmp, "synthetic")
+            write_synthetic(prefix, args.events, args.seed)
+
+        t0 = time.perf_counter()
+        legacy, errors = run_legacy(prefix)
+        t_legacy = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        batch = run_batch(prefix, errors)
+        t_batch = time.perf_counter() - t0
+
+        n_all_gaps = len(run_batch(prefix)[0][0])
+
+    n = len(batch[0][0])
+    print(f"Eventos decodificados: {n}")
+    print(f"Referencia (línea por línea): {t_legacy:8.3f} s")
+    print(f"Vectorizada:                  {t_batch:8.3f} s  (x{t_legacy / t_batch:.1f})")
+    print("Salidas idénticas" if same_output(legacy, batch) else "ERROR: las salidas difieren")
+    print(f"Eventos conservados descartando todos los saltos de EVN: {n_all_gaps}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+bench_pipeline.py
+
+Mide cómo escala la cadena de análisis de muones con el número de
+eventos, sobre tripletes sintéticos de mate_synth.py (10^4–10^7 eventos
+por defecto). Etapas, en orden (cada una usa la salida de la anterior):
+
+- generate:  escribe el triplete m101/m102/m103 (mate_synth.write_triplet)
+- decode:    read_mate_file + check_evn_batch + get_coordinates_batch
+- ingest:    read_triplet + write_matedata, como 0_muon_csv_root.py
+- fit:       build_fit_cache sobre el data.root (ajuste por patrón de hits)
+- filter:    load_fit_cache + apply_cuts con los cortes de 2_recon_suavizada.py
+- histogram: ocupación, ángulos y tasa por hora (run_summary.fold_chunk)
+
+Cada etapa corre en un proceso nuevo, así que el pico de memoria (RSS) que
+se informa es el de esa etapa sola; base_rss_mb es el del proceso tras
+importar los módulos. Los resultados se imprimen como tabla y se guardan
+en JSON (--output) con los datos de la máquina, para comparar corridas.
+Si una etapa falla (p. ej. por memoria) se anota el error y las que
+dependen de ella no se corren.
+
+Uso:
+    python bench_pipeline.py --sizes 1e4 1e5 1e6 -o bench_pipeline.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+import numpy as np
+import uproot
+
+from fit_cache import apply_cuts, build_fit_cache, cache_key, load_fit_cache, make_geometry
+from mate_decode import check_evn_batch, get_coordinates_batch, read_mate_file
+from mate_ingest import BRANCHES, read_triplet, triplet_paths
+from mate_synth import write_triplet
+from matedata_io import iter_matedata, write_matedata
+from run_summary import fold_chunk, new_partial, new_table
+from track_fit import Nch, ch_width, z_inf, z_med, z_sup
+
+STAGES = ("generate", "decode", "ingest", "fit", "filter", "histogram")
+
+# Etapa de la que depende cada una
+REQUIRES = {"decode": "generate", "ingest": "generate", "fit": "ingest",
+            "filter": "fit", "histogram": "ingest"}
+
+SIZES = (10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7)
+
+# Cortes de 2_recon_suavizada.py: residuo (cm) y ángulo entre segmentos (grados)
+R_TOL, THETA_TOL = 1.0, 5.0
+
+GEOMETRY = make_geometry(z_sup, z_med, z_inf, ch_width, Nch)
+
+
+def peak_rss_mb():
+    """Pico de RSS del proceso actual (MB); ru_maxrss está en bytes en macOS."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2 ** 20 if sys.platform == "darwin" else rss / 2 ** 10
+
+
+# ---------------------------------------------------------------------------
+# Etapas (cada una devuelve el número de eventos que procesó)
+# ---------------------------------------------------------------------------
+
+def stage_generate(work, n, seed):
+    info = write_triplet(os.path.join(work, "synthetic"), n, seed, gaps=max(n // 10 ** 5, 1))
+    return max(info["lines"])
+
+
+def stage_decode(work, n, seed):
+    prefix = os.path.join(work, "synthetic")
+    data = [read_mate_file(path) for path in triplet_paths(prefix)]
+    bad_spans = check_evn_batch(*data, prefix)
+    coords = [get_coordinates_batch(d, bad_spans) for d in data]
+    return max(len(c[0]) for c in coords)
+
+
+def stage_ingest(work, n, seed):
+    chunks = list(read_triplet(os.path.join(work, "synthetic")))
+    write_matedata(os.path.join(work, "data.root"), chunks)
+    return sum(len(c["evn"]) for c in chunks)
+
+
+def stage_fit(work, n, seed):
+    out_dir = os.path.join(work, "fit_cache")
+    shutil.rmtree(out_dir, ignore_errors=True)
+    build_fit_cache(os.path.join(work, "data.root"), GEOMETRY, out_dir)
+    return len(np.load(os.path.join(out_dir, "evn.npy"), mmap_mode="r"))
+
+
+def stage_filter(work, n, seed):
+    root_path = os.path.join(work, "data.root")
+    cache_dir = os.path.join(work, "caches")
+    # Se reutiliza el ajuste de la etapa fit con el nombre que espera load_fit_cache
+    os.makedirs(cache_dir, exist_ok=True)
+    target = os.path.join(cache_dir, cache_key(root_path, GEOMETRY, cache_dir))
+    if not os.path.isdir(target):
+        shutil.copytree(os.path.join(work, "fit_cache"), target)
+    fit = load_fit_cache(root_path, GEOMETRY, cache_dir)
+    keep = apply_cuts(fit, R_TOL, np.deg2rad(THETA_TOL))
+    return len(keep)
+
+
+def stage_histogram(work, n, seed):
+    partial, table = new_partial(), new_table()
+    for _, arr in iter_matedata(os.path.join(work, "data.root"), list(BRANCHES)):
+        fold_chunk(partial, arr, table)
+    return partial["n_events"]
+
+
+def run_stage(stage, work, n, seed):
+    """Corre una etapa en este proceso (sin su salida por pantalla) y la mide."""
+    func = globals()["stage_" + stage]
+    base = peak_rss_mb()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        events = func(work, n, seed)
+    seconds = time.perf_counter() - t0
+    return {"events": int(events), "seconds": seconds, "base_rss_mb": base, "peak_rss_mb": peak_rss_mb()}
+
+
+def measure(stage, work, n, seed):
+    """run_stage en un proceso nuevo; los errores se devuelven como texto."""
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            result = pool.submit(run_stage, stage, work, n, seed).result()
+    except BrokenProcessPool:
+        return {"ok": False, "error": "el proceso terminó de forma anormal (¿memoria?)"}
+    except Exception as e:  # noqa: BLE001 - se informa cualquier falla de la etapa
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    result["ok"] = True
+    result["events_per_s"] = result["events"] / result["seconds"] if result["seconds"] > 0 else None
+    return result
+
+
+def machine_info():
+    return {
+        "python": platform.python_version(), "numpy": np.__version__, "uproot": uproot.__version__,
+        "platform": platform.platform(), "machine": platform.machine(), "cpus": os.cpu_count(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def with_requirements(stages):
+    """stages más las etapas de las que dependen, en el orden de STAGES."""
+    needed = set(stages)
+    for stage in reversed(STAGES):
+        if stage in needed and stage in REQUIRES:
+            needed.add(REQUIRES[stage])
+    return [s for s in STAGES if s in needed]
+
+
+def run_benchmark(sizes, stages=STAGES, seed=0, workdir=None, keep=False):
+    """
+    Corre las etapas para cada tamaño y devuelve la lista de resultados
+    (un dict por tamaño y etapa).
+    """
+    results = []
+    for n in sizes:
+        work = tempfile.mkdtemp(prefix=f"bench_{n}_", dir=workdir)
+        done = set()
+        try:
+            # Las etapas no pedidas igual se corren si otra las necesita
+            for stage in with_requirements(stages):
+                if REQUIRES.get(stage) and REQUIRES[stage] not in done:
+                    res = {"ok": False, "error": f"falta {REQUIRES[stage]}"}
+                else:
+                    res = measure(stage, work, n, seed)
+                if res["ok"]:
+                    done.add(stage)
+                res = {"size": n, "stage": stage, **res}
+                print_result(res)
+                results.append(res)
+        finally:
+            if keep:
+                print(f"Archivos de {n} eventos en {work}")
+            else:
+                shutil.rmtree(work, ignore_errors=True)
+    return results
+
+
+def print_result(res):
+    if not res["ok"]:
+        print(f"{res['size']:>9} {res['stage']:<10}  ERROR: {res['error']}")
+        return
+    print(f"{res['size']:>9} {res['stage']:<10} {res['seconds']:9.3f} s "
+          f"{res['events_per_s'] / 1e6:9.3f} M/s {res['peak_rss_mb']:9.1f} MB "
+          f"(base {res['base_rss_mb']:.1f} MB)")
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Benchmark de escalamiento de la cadena de muones")
+    p.add_argument("--sizes", nargs="+", type=float, default=list(SIZES),
+                   help="Números de eventos a medir (acepta 1e6)")
+    p.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES),
+                   help="Etapas a informar (se corren también las que necesitan)")
+    p.add_argument("--seed", type=int, default=0, help="Semilla de los datos sintéticos")
+    p.add_argument("--workdir", default=None, help="Carpeta para los archivos temporales")
+    p.add_argument("--keep", action="store_true", help="No borra los archivos generados")
+    p.add_argument("-o", "--output", default="bench_pipeline.json", help="Resultados en JSON")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    sizes = [int(s) for s in args.sizes]
+    print(f"{'eventos':>9} {'etapa':<10} {'tiempo':>11} {'ritmo':>11} {'pico RSS':>12}")
+    results = run_benchmark(sizes, args.stages, args.seed, args.workdir, args.keep)
+    results = [r for r in results if r["stage"] in args.stages]
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"machine": machine_info(), "seed": args.seed, "results": results}, f, indent=1)
+    print(f"Resultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+bench_thermo.py
+
+Compara la lectura línea por línea de los registros de temperatura (como
+en las celdas de Termometros/Arduino/1)_ txtConverter.ipynb: LINE_RE y
+un dict por línea) con thermo_log.read_log, sobre los archivos diarios
+de 1440 líneas.
+
+Verifica que ambas den los mismos valores en las líneas con fecha y hora
+(el formato que entiende la celda del cuaderno) y muestra tiempos y
+líneas por segundo.
+"""
+
+import argparse
+import glob
+import os
+import re
+import time
+
+import numpy as np
+
+from thermo_log import DISCONNECTED, N_SENSORS, read_log
+
+# Regex de la celda del cuaderno: YYYY-MM-DD,HH:MM:SS,resto
+LINE_RE = re.compile(
+    r'^(\d{4}-\d{2}-\d{2})\s*,\s*([0-9]{2}:[0-9]{2}:[0-9]{2})\s*,\s*(.*)\s*$'
+)
+
+
+def notebook_to_float(x):
+    """to_float del cuaderno; además -127 y "NA" → NaN como en thermo_log."""
+    x = (x or "").strip().rstrip(".")
+    if x in ("", "?"):
+        return np.nan
+    try:
+        v = float(x)
+    except ValueError:
+        return np.nan
+    return np.nan if v == DISCONNECTED else v
+
+
+def read_log_notebook(path):
+    """Lectura línea por línea con LINE_RE y pares clave:valor."""
+    times, rows = [], []
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        for raw in f:
+            line = raw.strip()
+            m = LINE_RE.match(line)
+            if not m:
+                continue
+            date_str, time_str, rest = m.group(1), m.group(2), m.group(3)
+            row = [np.nan] * N_SENSORS
+            for item in rest.strip(",").split(","):
+                if ":" not in item:
+                    continue
+                k, v = item.split(":", 1)
+                k = k.strip()
+                if k.upper().startswith("S"):
+                    try:
+                        idx = int(k[1:])
+                    except ValueError:
+                        continue
+                    if 1 <= idx <= N_SENSORS:
+                        row[idx - 1] = notebook_to_float(v)
+            times.append(np.datetime64(f"{date_str}T{time_str}", "s"))
+            rows.append(row)
+    return np.array(times, dtype="datetime64[s]"), np.array(rows, dtype=float).reshape(-1, N_SENSORS)
+
+
+def parse_args():
+    default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               "..", "Termometros", "1)_Datos")
+    p = argparse.ArgumentParser(description="Benchmark de lectura de registros de temperatura")
+    p.add_argument("-d", "--data-dir", default=default_dir, help="Carpeta con los *.TXT")
+    p.add_argument("-r", "--repeat", type=int, default=5, help="Repeticiones por archivo")
+    p.add_argument("--all", action="store_true",
+                   help="Usa todos los archivos (por defecto sólo los de 1440 líneas)")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    paths = sorted(glob.glob(os.path.join(args.data_dir, "*.TXT")))
+    if not args.all:
+        full = []
+        for path in paths:
+            with open(path, "rb") as f:
+                if sum(1 for _ in f) == 1441:
+                    full.append(path)
+        paths = full
+    if not paths:
+        raise SystemExit(f"No hay registros en {args.data_dir}")
+
+    t_nb = t_fast = 0.0
+    n_lines = n_checked = n_fallback = 0
+    same = True
+    for path in paths:
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            nb_t, nb_v = read_log_notebook(path)
+            t_nb += time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            out = read_log(path)
+            t_fast += time.perf_counter() - t0
+
+        n_lines += len(out["time"])
+        n_fallback += out["n_fallback"]
+        # Sólo se comparan las líneas con fecha y hora (las que lee el cuaderno)
+        dated = np.isin(out["time"], nb_t)
+        if len(nb_t):
+            n_checked += len(nb_t)
+            same &= (np.array_equal(out["time"][dated], nb_t)
+                     and np.array_equal(out["temps"][dated], nb_v, equal_nan=True))
+
+    n_total = n_lines * args.repeat
+    print(f"Archivos: {len(paths)}  líneas: {n_lines}  (x{args.repeat} repeticiones)")
+    print(f"Cuaderno (línea por línea): {t_nb:8.3f} s  {n_total / t_nb:12.0f} líneas/s")
+    print(f"thermo_log.read_log:        {t_fast:8.3f} s  {n_total / t_fast:12.0f} líneas/s"
+          f"  (x{t_nb / t_fast:.1f})")
+    print(f"Líneas leídas con regex de respaldo: {n_fallback}")
+    print(f"Valores idénticos en {n_checked} líneas con fecha" if same
+          else "ERROR: las salidas difieren")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+bench_writer.py
+
+Compara la escritura de matedata con uproot (ramas enteras, por bloques)
+contra el TNtuple de floats llenado fila por fila con PyROOT.
+
+- Con --input relee un data.root existente y lo vuelve a escribir con
+  ambos métodos (así se compara contra el archivo de hoy).
+- Sin --input usa --events eventos sintéticos.
+
+Muestra tiempo de escritura y tamaño de cada archivo. Si PyROOT no está
+instalado sólo se mide la escritura con uproot.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import uproot
+
+from matedata_io import MATEDATA_TYPES, TREE_NAME, write_matedata, write_matedata_tntuple
+
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description="Benchmark de escritura del árbol matedata"
+    )
+    p.add_argument(
+        "-i", "--input", default=None,
+        help="data.root existente a reescribir"
+    )
+    p.add_argument(
+        "-n", "--events", type=int, default=1000000,
+        help="Número de eventos sintéticos si no se da --input"
+    )
+    return p.parse_args()
+
+
+def synthetic_columns(n, seed=0):
+    rng = np.random.default_rng(seed)
+    cols = {
+        "tp1": 1755590400 + np.arange(n) // 20,
+        "tp2": rng.integers(0, 1 << 16, n),
+        "evn": np.arange(n),
+    }
+    for k in (1, 2, 3):
+        for axis in ("A", "B"):
+            v = rng.integers(0, 12, n)
+            v[rng.random(n) < 0.1] = -1
+            cols[f"{axis}{k}"] = v
+    return cols
+
+
+def timed_write(writer, path, cols):
+    t0 = time.perf_counter()
+    writer(path, [cols])
+    return time.perf_counter() - t0, os.path.getsize(path)
+
+
+def main():
+    args = parse_args()
+
+    if args.input:
+        tree = uproot.open(args.input)[TREE_NAME]
+        cols = tree.arrays(list(MATEDATA_TYPES), library="np")
+        print(f"Archivo de referencia: {args.input} "
+              f"({os.path.getsize(args.input) / 1e6:.1f} MB, {tree.num_entries} eventos)")
+    else:
+        cols = synthetic_columns(args.events)
+    n = len(cols["evn"])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t, size = timed_write(write_matedata, os.path.join(tmp, "uproot.root"), cols)
+        print(f"uproot (ramas enteras): {t:8.2f} s  {size / 1e6:8.1f} MB  "
+              f"({n / t / 1e6:.2f} M eventos/s)")
+
+        try:
+            import ROOT  # noqa: F401
+        except ImportError:
+            print("PyROOT no disponible: no se mide el TNtuple")
+            return
+        t_ref, size_ref = timed_write(write_matedata_tntuple, os.path.join(tmp, "tntuple.root"), cols)
+        print(f"TNtuple (Fill por fila): {t_ref:8.2f} s  {size_ref / 1e6:8.1f} MB  "
+              f"({n / t_ref / 1e6:.2f} M eventos/s)")
+        print(f"Aceleración x{t_ref / t:.1f}, tamaño {size / size_ref:.2f} del TNtuple")
+
+
+if __name__ == "__main__":
+    main()
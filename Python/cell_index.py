@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+cell_index.py
+
+Índice de eventos por celda (A2, B2) de la placa m102.
+
+Se construye una sola vez recorriendo matedata por bloques y se guarda
+junto a data.root (data.root.cellidx.npz). Contiene, para los eventos con
+(A1, B1, A2, B2) dentro de [0, 11]:
+
+- entry, A1, B1: índice de entrada y hit en m101, ordenados por celda (A2, B2).
+- offsets: inicio de cada una de las 144 celdas dentro de esos arreglos.
+- counts: matriz (144, 144) con el número de eventos por celda (A2, B2)
+  y por celda (A1, B1).
+
+Una consulta de cualquier celda es un corte de arreglos (milisegundos).
+El índice se reconstruye solo si cambia el tamaño o mtime de data.root.
+"""
+
+import os
+
+import numpy as np
+
+from matedata_io import STEP_SIZE, iter_matedata
+
+# Canales por eje y número de celdas por placa
+NCH = 12
+N_CELLS = NCH * NCH
+
+
+def index_path(root_path):
+    return root_path + ".cellidx.npz"
+
+
+def _source_stamp(root_path):
+    st = os.stat(root_path)
+    return np.array([st.st_size, st.st_mtime_ns], dtype=np.int64)
+
+
+def build_cell_index(root_path, out_path=None, step_size=STEP_SIZE):
+    """Recorre root_path por bloques y guarda el índice en out_path."""
+    out_path = out_path or index_path(root_path)
+    entries, hits1, cells = [], [], []
+    for first, arr in iter_matedata(root_path, ["A1", "B1", "A2", "B2"], step_size):
+        A1, B1, A2, B2 = (arr[k].astype(np.int64) for k in ("A1", "B1", "A2", "B2"))
+        # Descarta eventos con (A2,B2) o (A1,B1) fuera de [0,11]
+        valid = ((A1 >= 0) & (A1 < NCH) & (B1 >= 0) & (B1 < NCH) &
+                 (A2 >= 0) & (A2 < NCH) & (B2 >= 0) & (B2 < NCH))
+        entries.append(first + np.flatnonzero(valid))
+        hits1.append((A1 * NCH + B1)[valid])
+        cells.append((A2 * NCH + B2)[valid])
+
+    entry = np.concatenate(entries) if entries else np.empty(0, dtype=np.int64)
+    hit1 = np.concatenate(hits1) if hits1 else np.empty(0, dtype=np.int64)
+    cell = np.concatenate(cells) if cells else np.empty(0, dtype=np.int64)
+
+    order = np.argsort(cell, kind="stable")
+    per_cell = np.bincount(cell, minlength=N_CELLS)
+    offsets = np.concatenate([[0], np.cumsum(per_cell)])
+    counts = np.bincount(cell * N_CELLS + hit1, minlength=N_CELLS * N_CELLS).reshape(N_CELLS, N_CELLS)
+
+    tmp = out_path + ".tmp.npz"
+    np.savez(
+        tmp,
+        entry=entry[order],
+        A1=(hit1[order] // NCH).astype(np.int8),
+        B1=(hit1[order] % NCH).astype(np.int8),
+        offsets=offsets,
+        counts=counts,
+        source=_source_stamp(root_path),
+    )
+    os.replace(tmp, out_path)
+
+
+def load_cell_index(root_path, step_size=STEP_SIZE):
+    """Carga el índice de root_path, construyéndolo si falta o está desactualizado."""
+    path = index_path(root_path)
+    if os.path.exists(path):
+        index = dict(np.load(path))
+        if np.array_equal(index["source"], _source_stamp(root_path)):
+            return index
+    print(f"Construyendo índice por celda en {path} ...")
+    build_cell_index(root_path, path, step_size)
+    return dict(np.load(path))
+
+
+def query_cell(index, A2, B2):
+    """Devuelve (entry, A1, B1) de los eventos con la celda (A2, B2) en m102."""
+    c = A2 * NCH + B2
+    lo, hi = index["offsets"][c], index["offsets"][c + 1]
+    return index["entry"][lo:hi], index["A1"][lo:hi], index["B1"][lo:hi]
+
+
+def cell_counts(index, A2, B2):
+    """Matriz (12, 12) con el número de eventos por (A1, B1) para la celda (A2, B2)."""
+    return index["counts"][A2 * NCH + B2].reshape(NCH, NCH)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+fit_cache.py
+
+Caché de los ajustes por evento para aplicar cortes de calidad sin reajustar.
+
+La primera vez se recorre data.root por bloques, se ajusta cada evento
+(con la tabla por patrón de hits de hit_patterns.py) y se guardan en disco
+evn, pendientes, interceptos, residuo máximo y ángulo entre segmentos
+(un .npy por columna). La carpeta de caché se nombra con un hash del
+contenido del ROOT de entrada y de la geometría (z_sup, z_med, z_inf,
+ch_width, Nch), así que cualquier cambio en alguno de ellos genera una
+caché nueva automáticamente. El hash del ROOT se guarda en un manifiesto
+junto con su tamaño y mtime y sólo se recalcula si éstos cambian.
+
+Las corridas siguientes abren las columnas con mmap y sólo aplican los
+cortes R_tol / theta_tol. load_fit_range sirve consultas de un rango de
+entradas: usa la caché si ya existe y si no ajusta sólo ese rango.
+scan_cuts cuenta los eventos que pasan para una grilla completa de
+tolerancias con un histograma 2D acumulado.
+
+Uso como script:
+    python fit_cache.py -i data.root --R 0.5 1 2 --theta 1 2 5 10
+"""
+
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from matedata_io import STEP_SIZE, iter_matedata
+from mate_ingest import file_hash, load_manifest
+from hit_patterns import PatternTable
+
+# Columnas guardadas en la caché
+CACHE_COLUMNS = ("evn", "slope_x", "slope_y", "intercept_x", "intercept_y", "max_resid", "kink")
+
+# Carpeta por defecto de las cachés
+CACHE_DIR = ".fit_cache"
+
+# Manifiesto (dentro de la carpeta de cachés) con tamaño, mtime y hash de cada ROOT
+MANIFEST_NAME = "manifest.json"
+
+
+def make_geometry(z_sup, z_med, z_inf, ch_width, Nch):
+    """Geometría que define el ajuste (y la clave de la caché)."""
+    return {"z": [float(z_sup), float(z_med), float(z_inf)],
+            "ch_width": float(ch_width), "Nch": int(Nch)}
+
+
+def input_hash(root_path, cache_dir=CACHE_DIR):
+    """
+    SHA-1 de root_path, reutilizando el del manifiesto de cache_dir si
+    tamaño y mtime no cambiaron, así que con la firma al día no se lee el
+    archivo.
+    """
+    path = os.path.abspath(root_path)
+    st = os.stat(path)
+    manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    known = manifest.setdefault("files", {})
+    old = known.get(path)
+    if not old or old["size"] != st.st_size or old["mtime_ns"] != st.st_mtime_ns:
+        old = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": file_hash(path)}
+        known[path] = old
+        # Temporal por proceso: varios trabajos pueden actualizarlo a la vez
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, manifest_path)
+    return old["sha1"]
+
+
+def cache_key(root_path, geometry, cache_dir=CACHE_DIR):
+    """Hash del contenido del ROOT de entrada (vía input_hash) y de la geometría."""
+    h = hashlib.sha1()
+    h.update(input_hash(root_path, cache_dir).encode())
+    h.update(json.dumps(geometry, sort_keys=True).encode())
+    return h.hexdigest()[:16]
+
+
+def fit_entries(root_path, geometry, entry_start=None, entry_stop=None, step_size=STEP_SIZE):
+    """
+    Ajusta por bloques las entradas [entry_start, entry_stop) de root_path
+    y devuelve el dict de columnas CACHE_COLUMNS.
+    """
+    z = np.array(geometry["z"])
+    ch_width = geometry["ch_width"]
+    offset = (geometry["Nch"] - 1) / 2 * ch_width
+    table = PatternTable(z, ch_width, offset)
+
+    parts = {c: [] for c in CACHE_COLUMNS}
+    for _, arr in iter_matedata(root_path, ["A1","B1","A2","B2","A3","B3","evn"], step_size,
+                                entry_start, entry_stop):
+        # Placas en el orden de z: superior (3), media (2), inferior (1);
+        # cada patrón de hits distinto se ajusta una sola vez
+        fit = table.lookup([arr["A3"], arr["A2"], arr["A1"]], [arr["B3"], arr["B2"], arr["B1"]])
+        fit["evn"] = arr["evn"]
+        for c in CACHE_COLUMNS:
+            parts[c].append(fit[c])
+    return {c: np.concatenate(parts[c]) if parts[c] else np.empty(0) for c in CACHE_COLUMNS}
+
+
+def build_fit_cache(root_path, geometry, out_dir, step_size=STEP_SIZE):
+    """Ajusta todos los eventos de root_path por bloques y guarda las columnas."""
+    fit = fit_entries(root_path, geometry, step_size=step_size)
+    tmp_dir = out_dir + ".tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+    for c in CACHE_COLUMNS:
+        np.save(os.path.join(tmp_dir, c + ".npy"), fit[c])
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"input": os.path.abspath(root_path), "geometry": geometry}, f, indent=1)
+    os.replace(tmp_dir, out_dir)
+
+
+def load_fit_cache(root_path, geometry, cache_dir=CACHE_DIR, step_size=STEP_SIZE):
+    """
+    Devuelve el dict de columnas CACHE_COLUMNS de root_path (abiertas con
+    mmap), construyendo la caché si no existe para este archivo y geometría.
+    """
+    out_dir = os.path.join(cache_dir, cache_key(root_path, geometry, cache_dir))
+    if not os.path.isdir(out_dir):
+        print(f"Construyendo caché de ajustes en {out_dir} ...")
+        os.makedirs(cache_dir, exist_ok=True)
+        build_fit_cache(root_path, geometry, out_dir, step_size)
+    return {c: np.load(os.path.join(out_dir, c + ".npy"), mmap_mode="r") for c in CACHE_COLUMNS}
+
+
+def load_fit_range(root_path, geometry, entry_start, entry_stop, cache_dir=CACHE_DIR,
+                   step_size=STEP_SIZE):
+    """
+    Columnas CACHE_COLUMNS de las entradas [entry_start, entry_stop). Si la
+    caché completa ya existe se leen de ella (mmap); si no, se ajustan sólo
+    esas entradas sin construirla, así que una consulta estrecha con la
+    caché fría cuesta lo que su rango y no lo que el archivo entero.
+    """
+    out_dir = os.path.join(cache_dir, cache_key(root_path, geometry, cache_dir))
+    if os.path.isdir(out_dir):
+        rows = slice(entry_start, entry_stop)
+        return {c: np.load(os.path.join(out_dir, c + ".npy"), mmap_mode="r")[rows]
+                for c in CACHE_COLUMNS}
+    return fit_entries(root_path, geometry, entry_start, entry_stop, step_size)
+
+
+def apply_cuts(fit, R_tol, theta_tol, entries=slice(None)):
+    """Máscara de los eventos (de entries) que pasan R_tol y theta_tol (rad)."""
+    return (fit["max_resid"][entries] <= R_tol) & (fit["kink"][entries] <= theta_tol)
+
+
+def scan_cuts(fit, R_tols, theta_tols):
+    """
+    Número de eventos que pasan cada par (R_tol, theta_tol), como matriz
+    (len(R_tols), len(theta_tols)), en una sola pasada sobre los eventos.
+    """
+    R_tols = np.asarray(R_tols, dtype=float)
+    theta_tols = np.asarray(theta_tols, dtype=float)
+    r_order = np.argsort(R_tols)
+    t_order = np.argsort(theta_tols)
+    r_sorted = R_tols[r_order]
+    t_sorted = theta_tols[t_order]
+
+    # Primer corte que cada evento pasa; len() si no pasa ninguno
+    r_bin = np.searchsorted(r_sorted, fit["max_resid"], side="left")
+    t_bin = np.searchsorted(t_sorted, fit["kink"], side="left")
+    nr, nt = len(r_sorted), len(t_sorted)
+    hist = np.bincount(r_bin * (nt + 1) + t_bin, minlength=(nr + 1) * (nt + 1))
+    counts = hist.reshape(nr + 1, nt + 1)[:nr, :nt].cumsum(axis=0).cumsum(axis=1)
+
+    out = np.empty_like(counts)
+    out[np.ix_(r_order, t_order)] = counts
+    return out
+
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description="Conteo de eventos que pasan cortes de calidad, usando la caché de ajustes"
+    )
+    p.add_argument("-i", "--input", default="data.root", help="Archivo ROOT con matedata")
+    p.add_argument("--R", nargs="+", type=float, default=[0.5, 1.0, 2.0],
+                   help="Valores de R_tol (cm)")
+    p.add_argument("--theta", nargs="+", type=float, default=[1.0, 2.0, 5.0, 10.0],
+                   help="Valores de theta_tol (grados)")
+    p.add_argument("--cache-dir", default=CACHE_DIR, help="Carpeta de las cachés")
+    return p.parse_args()
+
+
+def main():
+    from track_fit import z_sup, z_med, z_inf, ch_width, Nch
+
+    args = parse_args()
+    fit = load_fit_cache(args.input, make_geometry(z_sup, z_med, z_inf, ch_width, Nch),
+                         args.cache_dir)
+    counts = scan_cuts(fit, args.R, np.deg2rad(args.theta))
+
+    n = len(fit["evn"])
+    print(f"Eventos totales: {n}")
+    print("R_tol [cm] \\ theta_tol [°]" + "".join(f"{t:>12g}" for t in args.theta))
+    for r, row in zip(args.R, counts):
+        print(f"{r:>26g}" + "".join(f"{c:>12d}" for c in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+hit_patterns.py
+
+Tabla de consulta de ajustes por patrón de hits.
+
+Cada placa sólo da 12×12 celdas (A,B) discretas (más -1 = sin hit único),
+así que hay a lo sumo 13^6 combinaciones (A1,B1,A2,B2,A3,B3) y muchos
+eventos comparten el mismo patrón. PatternTable codifica cada evento en
+una clave entera, ajusta una sola vez cada patrón distinto (memoizado
+entre llamadas) y reparte los resultados con un gather sobre un mapa
+denso clave → fila que vive en la tabla (np.unique si el espacio de
+claves es demasiado grande). El costo del ajuste depende del número de
+patrones distintos, no de eventos, y las multiplicidades de cada patrón
+salen como subproducto.
+"""
+
+import numpy as np
+
+from track_fit import select_tracks
+
+# Valores posibles por canal: -1 (sin hit único) y 0..11
+N_VALUES = 13
+
+# Tamaño máximo del espacio de claves para guardar un mapa denso clave → fila
+# (int32, 19 MB para 13^6) en vez de usar np.unique en cada llamada
+DENSE_LIMIT = 1 << 24
+
+# Columnas escalares que se guardan por patrón
+PATTERN_COLUMNS = ("slope_x", "slope_y", "intercept_x", "intercept_y",
+                   "max_resid", "chi2", "kink", "theta_x", "theta_y", "theta")
+
+
+def pattern_keys(x_channels, y_channels):
+    """
+    Clave entera de cada evento a partir de los canales por plano
+    (listas de arreglos, en el orden de z).
+    """
+    key = np.zeros(len(x_channels[0]), dtype=np.int64)
+    for xc, yc in zip(x_channels, y_channels):
+        for ch in (xc, yc):
+            ch = np.asarray(ch, dtype=np.int64)
+            if len(ch) and (ch.min() < -1 or ch.max() > N_VALUES - 2):
+                raise ValueError(f"Canal fuera de rango [-1, {N_VALUES - 2}]")
+            key = key * N_VALUES + (ch + 1)
+    return key
+
+
+def decode_keys(keys, n_planes):
+    """Inversa de pattern_keys: devuelve (x_channels, y_channels)."""
+    keys = np.asarray(keys, dtype=np.int64)
+    xs, ys = [], []
+    for _ in range(n_planes):
+        ys.append(keys % N_VALUES - 1)
+        keys = keys // N_VALUES
+        xs.append(keys % N_VALUES - 1)
+        keys = keys // N_VALUES
+    return xs[::-1], ys[::-1]
+
+
+class PatternTable:
+    """
+    Ajustes memoizados por patrón de hits.
+
+    z: posiciones de los planos, en el orden en que se pasan los canales.
+    scale, offset: conversión canal → coordenada (coord = canal*scale - offset).
+    """
+
+    def __init__(self, z, scale=1.0, offset=0.0):
+        self.z = np.asarray(z, dtype=float)
+        self.scale = scale
+        self.offset = offset
+        self.keys = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.values = {c: np.empty(0) for c in PATTERN_COLUMNS}
+        # Fila de cada clave en la tabla (-1 = patrón no visto), se mantiene en _add
+        space = N_VALUES ** (2 * len(self.z))
+        self._row_of_key = np.full(space, -1, dtype=np.int32) if space <= DENSE_LIMIT else None
+
+    def _add(self, new_keys):
+        """Ajusta los patrones nuevos y los agrega a la tabla ordenada."""
+        x_ch, y_ch = decode_keys(new_keys, len(self.z))
+        X = [c * self.scale - self.offset for c in x_ch]
+        Y = [c * self.scale - self.offset for c in y_ch]
+        _, fit = select_tracks(X, Y, self.z, np.inf, np.inf)
+
+        keys = np.concatenate([self.keys, new_keys])
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.counts = np.concatenate([self.counts, np.zeros(len(new_keys), dtype=np.int64)])[order]
+        for c in PATTERN_COLUMNS:
+            self.values[c] = np.concatenate([self.values[c], fit[c]])[order]
+        if self._row_of_key is not None:
+            self._row_of_key[self.keys] = np.arange(len(self.keys), dtype=np.int32)
+
+    def lookup(self, x_channels, y_channels):
+        """
+        Ajustes de todos los eventos: dict con PATTERN_COLUMNS por evento.
+
+        Sólo se ajustan los patrones que no estaban en la tabla; además se
+        acumula cuántas veces se vio cada patrón (ver multiplicities).
+        """
+        keys = pattern_keys(x_channels, y_channels)
+        if self._row_of_key is not None:
+            # Espacio de claves chico: un gather en el mapa denso, en O(eventos)
+            # y sin memoria proporcional al espacio por llamada; sólo se
+            # ordenan las claves que todavía no estaban en la tabla
+            rows = self._row_of_key[keys]
+            new = rows < 0
+            if new.any():
+                self._add(np.unique(keys[new]))
+                rows = self._row_of_key[keys]
+            self.counts += np.bincount(rows, minlength=len(self.keys))
+        else:
+            uniq, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+            pos = np.searchsorted(self.keys, uniq)
+            known = pos < len(self.keys)
+            known[known] = self.keys[pos[known]] == uniq[known]
+            if not known.all():
+                self._add(uniq[~known])
+                pos = np.searchsorted(self.keys, uniq)
+            self.counts[pos] += counts
+            rows = pos[inverse]
+        return {c: self.values[c][rows] for c in PATTERN_COLUMNS}
+
+    def select(self, x_channels, y_channels, R_tol, theta_tol):
+        """Igual que track_fit.select_tracks pero usando la tabla: (mask, fit)."""
+        fit = self.lookup(x_channels, y_channels)
+        mask = (fit["max_resid"] <= R_tol) & (fit["kink"] <= theta_tol)
+        return mask, fit
+
+    def multiplicities(self):
+        """
+        Patrones vistos y su número de eventos, de mayor a menor: dict con
+        los canales por plano (x0.., y0..), count y las columnas del ajuste.
+        """
+        seen = self.counts > 0
+        order = np.argsort(-self.counts[seen], kind="stable")
+        keys = self.keys[seen][order]
+        x_ch, y_ch = decode_keys(keys, len(self.z))
+        out = {}
+        for k in range(len(self.z)):
+            out[f"x{k}"] = x_ch[k]
+            out[f"y{k}"] = y_ch[k]
+        out["count"] = self.counts[seen][order]
+        for c in PATTERN_COLUMNS:
+            out[c] = self.values[c][seen][order]
+        return out
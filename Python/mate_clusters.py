@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+mate_clusters.py
+
+Decodificación de palabras con varias tiras activas y búsqueda
+combinatoria de trayectorias.
+
+get_coordinates_single / decode_words descartan (-1) toda palabra con más
+de una tira activa por eje, así que un hit repartido en dos tiras vecinas
+o una tira ruidosa inutilizan el evento. Aquí cada mitad de 12 bits de la
+palabra se separa en clusters de tiras adyacentes, con su centroide (en
+unidades de tira, 5.5 para las tiras 5 y 6) y su tamaño, mediante una
+tabla de consulta de 4096 entradas, igual que SINGLE_STRIP.
+
+Para acotar el trabajo por evento se guardan a lo sumo max_clusters
+candidatos por placa y eje (los más grandes; a igual tamaño, los de menor
+tira). find_tracks ajusta cada proyección (A en x–z, B en y–z) por
+separado, como track_fit.fit_tracks, y cuando alguna placa tiene varios
+candidatos prueba las hasta max_clusters³ combinaciones con dos cortes:
+
+- ventana de pendiente: |pendiente| <= slope_max,
+- cota de residuo: |residuo| <= resid_max (cm) en cada plano,
+
+quedándose con la de menor chi² entre las que pasan. Los clusters de más
+de max_size tiras (una lluvia que satura la placa) no cuentan como
+candidatos. Como los centroides caen en medias tiras, el ajuste de cada
+combinación de posiciones se calcula una vez por llamada (_track_table)
+y por evento sólo quedan consultas a tablas. Las proyecciones con un solo
+cluster por placa no pasan por las combinaciones y las demás se agrupan
+por el número de candidatos de cada placa. Aun así el camino es varias
+veces más lento que el de hit único, que sólo ajusta los eventos con una
+tira por placa y eje (ver bench_clusters.py).
+
+Uso:
+    python mate_clusters.py datos/2025_08_19 -o tracks_multihit.csv
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from mate_decode import N_STRIPS, check_evn_batch, in_intervals, read_mate_file
+from mate_ingest import triplet_paths
+from track_fit import ch_width, fit_weights, offset, z_inf, z_med, z_sup
+
+# Candidatos por placa y eje que se conservan (max_clusters³ combinaciones por proyección)
+MAX_CLUSTERS = 3
+
+# Ventana de pendiente (cm/cm) y cota de residuo por plano (cm) del buscador. Con
+# tiras de 3 cm los residuos de una traza limpia ya llegan a ~2 cm.
+SLOPE_MAX = 0.5
+RESID_MAX = 2.5
+
+# Tamaño máximo de un cluster (tiras). Los más anchos (una lluvia que satura
+# la placa, 0xFFF) no son un cruce de muón y no cuentan como candidato.
+MAX_SIZE = 3
+
+# Posiciones de un centroide por plano: medias tiras de 0 a N_STRIPS - 1 y
+# una vacía al final (índice de _track_table)
+N_POS = 2 * N_STRIPS
+
+# Eventos por bloque en la búsqueda combinatoria (acota los temporales a
+# COMBO_BLOCK · max_clusters³ valores)
+COMBO_BLOCK = 1 << 17
+
+# Placas en el orden de z del ajuste: superior (3), media (2), inferior (1)
+PLATES = (3, 2, 1)
+Z_PLATES = np.array([z_sup, z_med, z_inf])
+
+# Columnas de salida de find_tracks
+TRACK_COLUMNS = ("found", "n_combos", "slope_x", "slope_y", "intercept_x", "intercept_y",
+                 "chi2", "max_resid", "theta")
+
+
+def _cluster_table(max_clusters, max_size):
+    """
+    Para cada máscara de 12 bits (bit más significativo = tira 0): número de
+    clusters de a lo sumo max_size tiras y, ordenados por tamaño
+    descendente, centroide y tamaño de los max_clusters primeros. Se agrega
+    una columna final vacía (NaN / 0), a la que apuntan los candidatos que
+    faltan y el índice -1.
+    """
+    size_mask = 1 << N_STRIPS
+    count = np.zeros(size_mask, dtype=np.int8)
+    centroid = np.full((size_mask, max_clusters + 1), np.nan)
+    size = np.zeros((size_mask, max_clusters + 1), dtype=np.int8)
+    for mask in range(size_mask):
+        strips = [k for k in range(N_STRIPS) if mask >> (N_STRIPS - 1 - k) & 1]
+        runs = []
+        for k in strips:
+            if runs and runs[-1][-1] == k - 1:
+                runs[-1].append(k)
+            else:
+                runs.append([k])
+        runs = [r for r in runs if len(r) <= max_size]
+        runs.sort(key=lambda r: (-len(r), r[0]))
+        count[mask] = len(runs)
+        for j, run in enumerate(runs[:max_clusters]):
+            centroid[mask, j] = sum(run) / len(run)
+            size[mask, j] = len(run)
+    return count, centroid, size
+
+
+_TABLES = {}
+
+
+def cluster_table(max_clusters=MAX_CLUSTERS, max_size=MAX_SIZE):
+    """_cluster_table memoizada por (max_clusters, max_size)."""
+    if (max_clusters, max_size) not in _TABLES:
+        _TABLES[max_clusters, max_size] = _cluster_table(max_clusters, max_size)
+    return _TABLES[max_clusters, max_size]
+
+
+def split_word(word):
+    """Mitades de 12 bits de cada palabra: {"B": bits altos, "A": bits bajos}."""
+    word = np.asarray(word, dtype=np.uint32)
+    return {"B": (word >> N_STRIPS) & 0xFFF, "A": word & 0xFFF}
+
+
+def decode_clusters(word, max_clusters=MAX_CLUSTERS, max_size=MAX_SIZE):
+    """
+    Clusters de cada palabra de 24 bits: dict con, para "A" y "B",
+    n (clusters de a lo sumo max_size tiras), centroid (eventos,
+    max_clusters; NaN si falta) y size (eventos, max_clusters).
+    """
+    count, centroid, size = cluster_table(max_clusters, max_size)
+    out = {}
+    for axis, half in split_word(word).items():
+        out[axis] = {"n": count[half], "centroid": centroid[half, :max_clusters],
+                     "size": size[half, :max_clusters]}
+    return out
+
+
+def fit_matrices(z):
+    """
+    Pesos w de la pendiente (pendiente = w · hits, como en fit_weights) y
+    matriz R de los residuos (residuos = R @ hits) para los planos z.
+    """
+    w, z_mean = fit_weights(z)
+    dz = np.asarray(z, dtype=float) - z_mean
+    return w, np.eye(len(dz)) - (1.0 / len(dz) + np.outer(dz, w))
+
+
+def _track_table(z, slope_max, resid_max, pitch, center):
+    """
+    Ajuste de una proyección para cada combinación posible de posiciones.
+
+    Los centroides caen en medias tiras, así que cada plano tiene N_POS
+    posiciones (2 · N_STRIPS - 1 más una vacía, NaN, al final) y la
+    combinación se codifica como Σ_p pos_p · N_POS^(planos-1-p). Devuelve
+    un dict con slope, intercept, resid (planos, códigos) y score (chi², inf
+    si no pasa los cortes o le falta algún plano).
+    """
+    n_planes = len(z)
+    x = np.append(np.arange(N_POS - 1) / 2 * pitch - center, np.nan)
+    hits = x[np.indices([N_POS] * n_planes).reshape(n_planes, -1)]
+    w, resid_matrix = fit_matrices(z)
+    slope = sum(w_p * h_p for w_p, h_p in zip(w, hits))
+    intercept = hits.mean(axis=0) - slope * np.mean(z)
+    resid = np.stack([sum(r_p * h_p for r_p, h_p in zip(row, hits)) for row in resid_matrix])
+    with np.errstate(invalid="ignore"):
+        ok = (np.abs(slope) <= slope_max) & np.all(np.abs(resid) <= resid_max, axis=0)
+    score = np.where(ok, np.sum(resid ** 2, axis=0), np.inf)
+    return {"slope": slope, "intercept": intercept, "resid": resid, "score": score}
+
+
+def _outer_sum(coef, cands):
+    """Σ_p coef[p] · cands[p] para todas las combinaciones: (eventos, Π K_p)."""
+    m = len(cands[0])
+    total = 0
+    for p, (c_p, x) in enumerate(zip(coef, cands)):
+        shape = [m] + [1] * len(cands)
+        shape[p + 1] = x.shape[1]
+        total = total + (c_p * x).reshape(shape)
+    return total.reshape(m, -1)
+
+
+def _best_combination(cands, score, base):
+    """
+    Mejor combinación de una proyección. cands: lista por plano (orden de
+    z) de arreglos (eventos, K_p) con la posición de los K_p candidatos de
+    cada plano; score y base: de _track_table y N_POS^(planos-1-p).
+    Devuelve el candidato elegido en cada plano (planos, eventos), -1 si
+    ninguna combinación pasa los cortes. A igual chi² gana la primera, que
+    usa los clusters más grandes.
+    """
+    m = len(cands[0])
+    combos = score[_outer_sum(base, cands)]
+    best = np.argmin(combos, axis=1)
+    found = np.isfinite(combos[np.arange(m), best])
+    pick = np.stack(np.unravel_index(best, [c.shape[1] for c in cands]))
+    return np.where(found, pick, -1)
+
+
+def find_tracks(words, z=Z_PLATES, slope_max=SLOPE_MAX, resid_max=RESID_MAX,
+                max_clusters=MAX_CLUSTERS, max_size=MAX_SIZE, pitch=ch_width, center=offset):
+    """
+    Trayectoria de cada evento a partir de las palabras de 24 bits de cada
+    plano (lista en el orden de z).
+
+    Cada proyección se resuelve por separado: si todas las placas tienen un
+    solo cluster se usa ése, si alguna tiene varios se prueban las
+    combinaciones y si alguna no tiene ninguno (o sólo clusters de más de
+    max_size tiras) no hay trayectoria. El ajuste de cada combinación de
+    posiciones sale de _track_table, así que por evento sólo quedan
+    consultas. Los eventos con varios clusters se agrupan por el número de
+    candidatos de cada placa (uno con (2, 1, 1) prueba 2 combinaciones y
+    no max_clusters³) y cada grupo se procesa por bloques de COMBO_BLOCK
+    eventos.
+
+    Devuelve un dict con TRACK_COLUMNS, el centroide y tamaño elegidos por
+    plano (A<placa>, B<placa>, sizeA<placa>, sizeB<placa>, en el orden de
+    PLATES; NaN / 0 sin trayectoria) y "multi" (eventos con varios
+    clusters en alguna placa y eje).
+    """
+    count, centroid, size = cluster_table(max_clusters, max_size)
+    centroid_flat, size_flat = centroid.ravel(), size.ravel()
+    # Posición de cada candidato en medias tiras (N_POS - 1 si falta)
+    position = np.where(np.isnan(centroid), N_POS - 1, 2 * centroid).astype(np.intp)
+    position_flat = position.ravel()
+    halves = [split_word(w) for w in words]
+    n = len(halves[0]["A"])
+    n_planes = len(z)
+    table = _track_table(z, slope_max, resid_max, pitch, center)
+    base = N_POS ** np.arange(n_planes - 1, -1, -1)
+    masks = {axis: np.stack([h[axis] for h in halves]) for axis in ("A", "B")}
+    counts = {axis: count[m] for axis, m in masks.items()}
+    # Sólo los eventos con algún cluster en cada placa y eje pueden tener trayectoria
+    complete = np.flatnonzero(np.all(counts["A"] >= 1, axis=0) & np.all(counts["B"] >= 1, axis=0))
+    out = {"found": np.zeros(n, dtype=bool), "n_combos": np.ones(n, dtype=np.int64),
+           "multi": np.zeros(n, dtype=bool)}
+    found = np.ones(len(complete), dtype=bool)
+    combos, chosen = {}, {}
+    for axis in ("A", "B"):
+        width = np.minimum(counts[axis], max_clusters)
+        out["n_combos"] *= np.prod(width, axis=0)
+        out["multi"] |= np.any(counts[axis] > 1, axis=0)
+        mask = masks[axis][:, complete]
+        pick = np.zeros(mask.shape, dtype=np.intp)
+        # Grupos de eventos con el mismo número de candidatos por placa; el
+        # grupo (1, ..., 1), código 0, no necesita búsqueda
+        shape = [max_clusters] * n_planes
+        shape_code = sum((w_p[complete] - 1).astype(np.int16) * max_clusters ** (n_planes - 1 - p)
+                         for p, w_p in enumerate(width))
+        multi = np.flatnonzero(shape_code)
+        shape_code = shape_code[multi]
+        for code in np.flatnonzero(np.bincount(shape_code)[1:]) + 1:
+            group = multi[shape_code == code]
+            widths = np.array(np.unravel_index(code, shape)) + 1
+            for start in range(0, len(group), COMBO_BLOCK):
+                rows = group[start:start + COMBO_BLOCK]
+                cands = [position[m[rows], :k_p] for m, k_p in zip(mask, widths)]
+                pick[:, rows] = _best_combination(cands, table["score"], base)
+
+        # Índice plano en la tabla; pick = -1 cae en la columna vacía (NaN)
+        pick[pick < 0] = max_clusters
+        chosen[axis] = mask * (max_clusters + 1) + pick
+        combos[axis] = sum(b * position_flat[f] for b, f in zip(base, chosen[axis]))
+        found &= np.isfinite(table["score"][combos[axis]])
+
+    good = complete[found]
+    out["found"][good] = True
+    fits = {}
+    resid2 = [0.0] * n_planes
+    for axis, proj in (("A", "x"), ("B", "y")):
+        combo = combos[axis][found]
+        fits[f"slope_{proj}"] = table["slope"][combo]
+        fits[f"intercept_{proj}"] = table["intercept"][combo]
+        resid2 = [r2 + r_p[combo] ** 2 for r2, r_p in zip(resid2, table["resid"])]
+        for p, plate in enumerate(PLATES[:n_planes]):
+            flat = chosen[axis][p][found]
+            fits[f"{axis}{plate}"] = centroid_flat[flat]
+            out[f"size{axis}{plate}"] = np.zeros(n, dtype=size.dtype)
+            out[f"size{axis}{plate}"][good] = size_flat[flat]
+    fits["chi2"] = sum(resid2)
+    fits["max_resid"] = np.sqrt(np.maximum.reduce(resid2))
+    fits["theta"] = np.arctan(np.hypot(fits["slope_x"], fits["slope_y"]))
+    # Sin trayectoria: NaN
+    for col, v in fits.items():
+        out[col] = np.full(n, np.nan)
+        out[col][good] = v
+    return out
+
+
+def read_triplet_words(file_prefix):
+    """
+    Palabras crudas de un triplete, alineadas como en read_triplet (se
+    descartan las líneas inválidas y los saltos de EVN): dict con tp1, tp2,
+    evn y word<placa> para las placas 1..3.
+    """
+    data = [read_mate_file(path) for path in triplet_paths(file_prefix)]
+    bad_spans = check_evn_batch(*data, file_prefix)
+    kept = []
+    for d in data:
+        keep = d["valid"] & ~in_intervals(d["evn"], bad_spans)
+        kept.append({c: d[c][keep] for c in ("tp1", "tp2", "evn", "word")})
+    n = min(len(d["evn"]) for d in kept)
+    out = {c: kept[0][c][:n] for c in ("tp1", "tp2", "evn")}
+    for plate, d in zip((1, 2, 3), kept):
+        out[f"word{plate}"] = d["word"][:n]
+    return out
+
+
+def triplet_tracks(file_prefix, max_clusters=MAX_CLUSTERS, slope_max=SLOPE_MAX,
+                   resid_max=RESID_MAX, max_size=MAX_SIZE):
+    """Lee un triplete y busca sus trayectorias con clusters."""
+    words = read_triplet_words(file_prefix)
+    tracks = find_tracks([words[f"word{plate}"] for plate in PLATES], Z_PLATES,
+                         slope_max, resid_max, max_clusters, max_size)
+    tracks.update({c: words[c] for c in ("tp1", "tp2", "evn")})
+    return tracks
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Trayectorias con clusters de varias tiras")
+    p.add_argument("prefix", help="Prefijo del triplete (sin _06h00_mate-m10X.txt)")
+    p.add_argument("--max-clusters", type=int, default=MAX_CLUSTERS,
+                   help="Candidatos por placa y eje que se prueban")
+    p.add_argument("--max-size", type=int, default=MAX_SIZE,
+                   help="Tiras máximas de un cluster; los más anchos no son candidatos")
+    p.add_argument("--slope-max", type=float, default=SLOPE_MAX, help="Ventana de pendiente (cm/cm)")
+    p.add_argument("--resid-max", type=float, default=RESID_MAX, help="Residuo máximo por plano (cm)")
+    p.add_argument("-o", "--output", default="tracks_multihit.csv", help="CSV de salida")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    tracks = triplet_tracks(args.prefix, args.max_clusters, args.slope_max, args.resid_max,
+                            args.max_size)
+    found, multi = tracks["found"], tracks["multi"]
+    columns = ["evn", "tp1", "tp2"] + list(TRACK_COLUMNS[1:])
+    columns += [f"{a}{p}" for p in PLATES for a in ("A", "B")]
+    columns += [f"size{a}{p}" for p in PLATES for a in ("A", "B")]
+    df = pd.DataFrame({c: tracks[c][found] for c in columns})
+    df["theta"] = np.degrees(df["theta"])
+    df = df.rename(columns={"theta": "theta_deg"})
+    df.to_csv(args.output, index=False)
+    print(f"{int(found.sum())} trayectorias de {len(found)} eventos "
+          f"({int((found & multi).sum())} de {int(multi.sum())} con varios clusters) "
+          f"guardadas en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+mate_decode.py
+
+Lectura y decodificación de los archivos *_06h00_mate-m101/102/103.txt.
+
+Cada línea de un archivo mate tiene el formato
+
+    tp1,h1,h2,h3,tp2,evn
+
+donde h1 h2 h3 son bytes en hexadecimal que, concatenados, forman una
+palabra de 24 bits: los 12 bits más significativos son las tiras B y los
+12 menos significativos las tiras A de la placa.
+
+Contiene dos implementaciones:
+- La de referencia, línea por línea (check_evn, get_coordinates_single),
+  que es la que usaba originalmente 0_muon_csv_root.py.
+- La vectorizada (read_mate_file, decode_words, check_evn_batch,
+  get_coordinates_batch), que lee el archivo completo en arreglos de NumPy
+  y obtiene los índices B y A con operaciones de bits y una tabla de
+  consulta. Con los mismos intervalos de descarte (legacy_spans) da
+  exactamente la misma salida que la de referencia (ver bench_decode.py).
+"""
+
+import numpy as np
+import pandas as pd
+
+# Nombres de las columnas de un archivo mate
+MATE_COLUMNS = ("tp1", "h1", "h2", "h3", "tp2", "evn")
+
+# Tipos del camino rápido de read_mate_file
+_FAST_DTYPES = {"tp1": np.int64, "h1": str, "h2": str, "h3": str, "tp2": np.int64, "evn": np.int64}
+
+# Número de tiras por eje y ancho de la palabra de posición
+N_STRIPS = 12
+WORD_BITS = 2 * N_STRIPS
+
+# Tabla de consulta de 12 bits: índice de la tira si hay exactamente un bit
+# activo, -1 en otro caso. El bit más significativo es la tira 0.
+SINGLE_STRIP = np.full(1 << N_STRIPS, -1, dtype=np.int8)
+for _k in range(N_STRIPS):
+    SINGLE_STRIP[1 << _k] = N_STRIPS - 1 - _k
+del _k
+
+# Valor de cada carácter ASCII como dígito hexadecimal (-1 si no lo es)
+_HEX_VALUE = np.full(256, -1, dtype=np.int8)
+for _c in "0123456789":
+    _HEX_VALUE[ord(_c)] = ord(_c) - ord("0")
+for _c in "abcdef":
+    _HEX_VALUE[ord(_c)] = ord(_c) - ord("a") + 10
+    _HEX_VALUE[ord(_c.upper())] = ord(_c) - ord("a") + 10
+del _c
+
+
+# ---------------------------------------------------------------------------
+# Implementación de referencia (línea por línea)
+# ---------------------------------------------------------------------------
+
+# Función para verificar la consistencia de eventos (EVN) entre los tres archivos correspondientes a un conjunto de datos
+def check_evn(data1, data2, data3, fname):
+    """
+    Verifica consistencia de los eventos (EVN) entre líneas consecutivas y entre archivos.
+    """
+
+    # Inicializa listas para almacenar errores detectados por cada archivo
+    error1, error2, error3 = [], [], []
+
+    # Función interna para verificar que los EVN sean consecutivos (sin saltos)
+    def check_data(data, fname, suffix):
+        errors = []
+        for i in range(len(data) - 1):
+            if (int(data[i][5]) + 1) != int(data[i + 1][5]):
+                print(f"Error en el archivo {fname}_{suffix} en la línea {i + 1}")
+                errors.extend([data[i][5], data[i + 1][5]])
+        return errors
+
+    # Verifica cada uno de los tres archivos
+    error1 = check_data(data1, fname, "1")
+    error2 = check_data(data2, fname, "2")
+    error3 = check_data(data3, fname, "3")
+
+    # Compara los primeros y últimos EVN entre los tres archivos
+    if not (int(data1[0][5]) == int(data2[0][5]) == int(data3[0][5])):
+        print(f"Diferencia en el EVN inicial entre archivos: {fname}")
+    if not (int(data1[-1][5]) == int(data2[-1][5]) == int(data3[-1][5])):
+        print(f"Diferencia en el EVN final entre archivos: {fname}")
+
+    return error1, error2, error3
+
+# Función para obtener coordenadas B y A de un archivo y descartar eventos con errores
+def get_coordinates_single(data, error1, error2, error3):
+    """
+    Procesa datos de un solo archivo y calcula posiciones (A y B) a partir de los bits de datos.
+    """
+
+    # Inicializa listas de posiciones y variables asociadas
+    pos_B, pos_A, pos_evn, pos_tp1, pos_tp2 = [], [], [], [], []
+
+    for i in range(len(data)):
+        try:
+            evn = int(data[i][5])
+            # Ignora eventos dentro del rango con errores
+            if evn in range(int(error1[0]), int(error1[1]) + 1) or \
+               evn in range(int(error2[0]), int(error2[1]) + 1) or \
+               evn in range(int(error3[0]), int(error3[1]) + 1):
+                continue
+        except IndexError:
+            pass  # Si no hay errores para ese archivo
+
+        try:
+            # Concatena los valores hexadecimales de los bytes de posición
+            pos_hex = data[i][1] + data[i][2] + data[i][3]
+            pos_int = int(pos_hex, 16)               # Convierte el hex a entero
+            pos_bin = format(pos_int, '0>24b')       # Convierte a binario de 24 bits
+            pos_bit = [int(bit) for bit in pos_bin]  # Convierte a lista de bits
+
+            # Determina la posición activa en los primeros 12 bits (B) y en los últimos 12 bits (A)
+            pos_Bt = [j for j in range(12) if pos_bit[j] != 0]
+                        #Es importante la resta porque despues en el arreglo saldrán números fuera del rango
+            pos_At = [j - 12 for j in range(12, 24) if pos_bit[j] != 0]
+
+            # Solo si hay una posición activa por parte (B y A), se almacena; si no, se asigna -1
+            if len(pos_Bt) == len(pos_At) == 1:
+                pos_B.append(pos_Bt)
+                pos_A.append(pos_At)
+            else:
+                pos_B.append([-1])
+                pos_A.append([-1])
+
+            # Guarda EVN y tiempos tp1, tp2
+            pos_evn.append(data[i][5])
+            pos_tp1.append(data[i][0])
+            pos_tp2.append(data[i][4])
+        except (ValueError, IndexError):
+            print(f"Error procesando la línea: {data[i]}")
+
+    return pos_B, pos_A, pos_evn, pos_tp1, pos_tp2
+
+
+# ---------------------------------------------------------------------------
+# Implementación vectorizada
+# ---------------------------------------------------------------------------
+
+def hex_to_word(hex_str):
+    """
+    Convierte un arreglo de cadenas hexadecimales en la ventana de 24 bits
+    que usa format(int(s, 16), '0>24b')[:24].
+
+    Devuelve (word, valid): word es uint32 y valid marca las cadenas que
+    int(s, 16) hubiera aceptado (con un valor no negativo, que es lo que
+    acepta format). La tabla de consulta sólo reconoce dígitos; las cadenas
+    que rechaza (espacios alrededor, prefijo 0x, signo, guiones bajos o
+    basura) se reintentan una a una con int(s, 16), que en datos reales son
+    muy pocas.
+    """
+    raw = np.asarray(hex_str, dtype=np.bytes_)
+    n = raw.shape[0]
+    width = raw.dtype.itemsize
+    word = np.zeros(n, dtype=np.uint32)
+    valid = np.zeros(n, dtype=bool)
+    if n == 0 or width == 0:
+        return word, valid
+
+    chars = raw.view(np.uint8).reshape(n, width)
+    digits = _HEX_VALUE[chars]
+    length = np.count_nonzero(chars, axis=1)
+    present = np.arange(width) < length[:, None]
+    valid = (length > 0) & ~np.any(present & (digits < 0), axis=1)
+
+    # Las cadenas de hasta 16 dígitos caben en uint64; las más largas
+    # (no aparecen en datos reales) se resuelven con enteros de Python.
+    fits = valid & (length <= 16)
+    value = np.zeros(n, dtype=np.uint64)
+    for k in range(min(width, 16)):
+        col = present[:, k] & fits
+        value[col] = (value[col] << np.uint64(4)) | digits[col, k].astype(np.uint64)
+
+    # Si el valor tiene más de 24 bits, format() conserva los 24 más significativos
+    shift = np.zeros(n, dtype=np.uint64)
+    top = value >> np.uint64(WORD_BITS)
+    while top.any():
+        shift[top > 0] += np.uint64(1)
+        top >>= np.uint64(1)
+    word[:] = value >> shift
+
+    for i in np.flatnonzero(~fits):
+        try:
+            big = int(raw[i].decode("latin-1"), 16)
+        except ValueError:
+            continue
+        if big >= 0:
+            word[i] = big >> max(big.bit_length() - WORD_BITS, 0)
+            valid[i] = True
+
+    return word, valid
+
+
+def read_mate_file(path):
+    """
+    Lee un archivo mate completo en arreglos de NumPy.
+
+    Devuelve un dict con tp1, tp2, evn (int64), word (uint32, palabra de
+    24 bits) y valid (líneas que la versión de referencia habría procesado).
+    """
+    with open(path, "r", encoding="latin-1") as f:
+        return read_mate_text(f)
+
+
+def read_mate_text(f):
+    """Igual que read_mate_file pero sobre un objeto archivo ya abierto."""
+    options = dict(
+        header=None, names=MATE_COLUMNS, usecols=range(len(MATE_COLUMNS)),
+        keep_default_na=False, skip_blank_lines=True,
+    )
+    start = f.tell()
+    try:
+        # Camino rápido: las columnas numéricas las convierte el lector de C
+        df = pd.read_csv(f, dtype=_FAST_DTYPES, **options)
+    except pd.errors.EmptyDataError:
+        df = pd.DataFrame({col: pd.Series(dtype=str) for col in MATE_COLUMNS})
+    except (ValueError, OverflowError):
+        # Hay líneas mal formadas: se leen como texto y se validan una a una
+        f.seek(start)
+        df = pd.read_csv(f, dtype=str, on_bad_lines="warn", **options)
+    return parse_mate_frame(df)
+
+
+def parse_mate_frame(df):
+    """Convierte un DataFrame de columnas MATE_COLUMNS en arreglos."""
+    word, valid = hex_to_word((df["h1"] + df["h2"] + df["h3"]).to_numpy(dtype=str))
+
+    out = {"word": word}
+    for col in ("tp1", "tp2", "evn"):
+        if df[col].dtype == np.int64:
+            out[col] = df[col].to_numpy()
+            continue
+        num = pd.to_numeric(df[col].str.strip(), errors="coerce")
+        ok = num.notna().to_numpy()
+        valid &= ok
+        out[col] = np.where(ok, num.fillna(0).to_numpy(), 0).astype(np.int64)
+    out["valid"] = valid
+    return out
+
+
+def decode_words(word):
+    """
+    Obtiene los índices B y A de cada palabra de 24 bits.
+
+    Si B y A tienen exactamente una tira activa cada uno se devuelven sus
+    índices (0–11); en otro caso ambos valen -1.
+    """
+    word = np.asarray(word, dtype=np.uint32)
+    pos_B = SINGLE_STRIP[(word >> N_STRIPS) & 0xFFF].astype(np.int64)
+    pos_A = SINGLE_STRIP[word & 0xFFF].astype(np.int64)
+    single = (pos_B >= 0) & (pos_A >= 0)
+    pos_B[~single] = -1
+    pos_A[~single] = -1
+    return pos_B, pos_A
+
+
+def check_evn_batch(mate1, mate2, mate3, fname):
+    """
+    Versión vectorizada de check_evn sobre la salida de read_mate_file.
+
+    Imprime los mismos mensajes que check_evn, pero en lugar de listas
+    planas devuelve el conjunto ordenado de intervalos [inicio, fin] de EVN
+    con errores de las tres placas (ver merge_intervals), con todos los
+    saltos de cada archivo y no sólo el primero.
+    """
+    def check_data(evn, fname, suffix):
+        jumps = np.flatnonzero(evn[:-1] + 1 != evn[1:])
+        for i in jumps:
+            print(f"Error en el archivo {fname}_{suffix} en la línea {i + 1}")
+        return np.column_stack([evn[jumps], evn[jumps + 1]])
+
+    evn1, evn2, evn3 = mate1["evn"], mate2["evn"], mate3["evn"]
+    spans = np.concatenate([
+        check_data(evn1, fname, "1"),
+        check_data(evn2, fname, "2"),
+        check_data(evn3, fname, "3"),
+    ])
+
+    if not (evn1[0] == evn2[0] == evn3[0]):
+        print(f"Diferencia en el EVN inicial entre archivos: {fname}")
+    if not (evn1[-1] == evn2[-1] == evn3[-1]):
+        print(f"Diferencia en el EVN final entre archivos: {fname}")
+
+    return merge_intervals(spans)
+
+
+def merge_intervals(spans):
+    """
+    Ordena y fusiona intervalos cerrados [inicio, fin] de EVN.
+
+    Los intervalos invertidos (un EVN que retrocede) se ignoran, igual que
+    range() vacío en get_coordinates_single. Devuelve un arreglo (n, 2)
+    ordenado y sin solapamientos.
+    """
+    spans = np.asarray(spans, dtype=np.int64).reshape(-1, 2)
+    spans = spans[spans[:, 0] <= spans[:, 1]]
+    if len(spans) == 0:
+        return spans
+    spans = spans[np.argsort(spans[:, 0], kind="stable")]
+
+    # Empieza un grupo nuevo cuando el inicio supera todos los fines anteriores
+    reach = np.maximum.accumulate(spans[:, 1])
+    new_group = np.concatenate([[True], spans[1:, 0] > reach[:-1]])
+    group = np.cumsum(new_group) - 1
+    starts = spans[new_group, 0]
+    ends = np.zeros(len(starts), dtype=np.int64)
+    np.maximum.at(ends, group, spans[:, 1])
+    ends = np.maximum(ends, starts)
+    return np.column_stack([starts, ends])
+
+
+def in_intervals(evn, spans):
+    """Máscara de los EVN que caen dentro de algún intervalo de merge_intervals."""
+    evn = np.asarray(evn)
+    if len(spans) == 0:
+        return np.zeros(evn.shape, dtype=bool)
+    i = np.searchsorted(spans[:, 0], evn, side="right") - 1
+    return (i >= 0) & (evn <= spans[np.maximum(i, 0), 1])
+
+
+def legacy_spans(error1, error2, error3):
+    """
+    Intervalos equivalentes al descarte de get_coordinates_single: sólo el
+    primer salto de cada archivo y, por la evaluación en cortocircuito, un
+    archivo sin errores detiene la comprobación de los siguientes.
+    """
+    spans = []
+    for errors in (error1, error2, error3):
+        if len(errors) < 2:
+            break
+        spans.append([int(errors[0]), int(errors[1])])
+    return merge_intervals(spans)
+
+
+def get_coordinates_batch(mate, bad_spans):
+    """
+    Versión vectorizada de get_coordinates_single sobre la salida de
+    read_mate_file. Descarta los EVN dentro de bad_spans (ver
+    check_evn_batch) y devuelve arreglos (pos_B, pos_A, pos_evn, pos_tp1, pos_tp2).
+    """
+    keep = mate["valid"] & ~in_intervals(mate["evn"], bad_spans)
+    n_bad = int(np.count_nonzero(~mate["valid"]))
+    if n_bad:
+        print(f"Error procesando {n_bad} líneas mal formadas")
+
+    pos_B, pos_A = decode_words(mate["word"][keep])
+    return pos_B, pos_A, mate["evn"][keep], mate["tp1"][keep], mate["tp2"][keep]
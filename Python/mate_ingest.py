@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+mate_ingest.py
+
+Ingesta de varios días de archivos mate para 0_muon_csv_root.py.
+
+- find_triplets busca los tripletes *_06h00_mate-m101/102/103.txt.
+- read_triplet produce las columnas de matedata (tp1, tp2, evn, B1..B3,
+  A1..A3) de un triplete, completo o por bloques unidos por EVN.
+- ingest_parallel reparte los días entre procesos; cada uno escribe una
+  salida parcial .npz por día. Un manifiesto JSON guarda tamaño, mtime y
+  hash de los archivos fuente, de modo que al volver a correr sólo se
+  procesan los días nuevos o modificados.
+- iter_partials lee las salidas parciales en orden fijo para unirlas en
+  el matedata final.
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from mate_decode import read_mate_file, check_evn_batch, get_coordinates_batch
+from mate_stream import CHUNK_SIZE, merge_mate_streams, new_report, print_report
+
+# Sufijos de los tres archivos de un conjunto de datos
+MATE_SUFFIXES = ("_06h00_mate-m101.txt", "_06h00_mate-m102.txt", "_06h00_mate-m103.txt")
+
+# Columnas de matedata, en el orden del TNtuple original
+BRANCHES = ("tp1", "tp2", "evn", "B1", "B2", "B3", "A1", "A2", "A3")
+
+# Versión del formato de las salidas parciales (invalida el manifiesto si cambia)
+PARTIAL_VERSION = 1
+
+
+def find_triplets(top="./"):
+    """Devuelve, ordenados, los prefijos de los tripletes bajo top."""
+    prefixes = []
+    for root, _, files in os.walk(top):
+        for mate_file in files:
+            if mate_file.endswith(MATE_SUFFIXES[0]):
+                prefixes.append(os.path.join(root, mate_file[:-len(MATE_SUFFIXES[0])]))
+    return sorted(prefixes)
+
+
+def triplet_paths(file_prefix):
+    return [file_prefix + suffix for suffix in MATE_SUFFIXES]
+
+
+def read_triplet(file_prefix, stream=False, chunk_size=CHUNK_SIZE):
+    """
+    Genera dicts con las columnas BRANCHES de un triplete.
+
+    Sin stream se leen los tres archivos completos y se emparejan por
+    posición tras descartar los saltos de EVN (un único dict). Con stream
+    se leen por bloques y se unen por EVN (ver mate_stream.py).
+    """
+    print(f"Leyendo archivo para {file_prefix}")
+    if stream:
+        report = new_report()
+        yield from merge_mate_streams(triplet_paths(file_prefix), chunk_size, report)
+        print_report(report, file_prefix)
+        return
+
+    data = [read_mate_file(path) for path in triplet_paths(file_prefix)]
+
+    # Verifica consistencia de eventos entre los tres archivos
+    bad_spans = check_evn_batch(*data, file_prefix)
+
+    # Procesa cada archivo individualmente para obtener coordenadas y tiempos
+    coords = [get_coordinates_batch(d, bad_spans) for d in data]
+    n = min(len(c[0]) for c in coords)
+    if any(len(c[0]) != n for c in coords):
+        print(f"Los tres archivos de {file_prefix} no tienen el mismo número de eventos; "
+              f"se usan los primeros {n}")
+
+    pos_B, pos_A, pos_evn, pos_tp1, pos_tp2 = coords[0]
+    out = {"tp1": pos_tp1[:n], "tp2": pos_tp2[:n], "evn": pos_evn[:n]}
+    for k, c in enumerate(coords):
+        out[f"B{k + 1}"] = c[0][:n]
+        out[f"A{k + 1}"] = c[1][:n]
+    yield out
+
+
+# ---------------------------------------------------------------------------
+# Manifiesto de archivos fuente
+# ---------------------------------------------------------------------------
+
+def file_hash(path, block_size=1 << 20):
+    """SHA-1 del contenido de un archivo."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def source_signature(file_prefix, previous=None):
+    """
+    Tamaño, mtime y hash de los tres archivos de un triplete.
+
+    El hash sólo se recalcula si tamaño o mtime cambiaron respecto de
+    previous (la firma guardada en el manifiesto).
+    """
+    previous = {f["path"]: f for f in (previous or {}).get("files", [])}
+    files = []
+    for path in triplet_paths(file_prefix):
+        st = os.stat(path)
+        entry = {"path": path, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        old = previous.get(path)
+        if old and old["size"] == entry["size"] and old["mtime_ns"] == entry["mtime_ns"]:
+            entry["sha1"] = old["sha1"]
+        else:
+            entry["sha1"] = file_hash(path)
+        files.append(entry)
+    return {"version": PARTIAL_VERSION, "files": files}
+
+
+def same_sources(a, b):
+    """Compara dos firmas por versión, modo de lectura y hash de cada archivo."""
+    if not a or not b or a.get("version") != b.get("version"):
+        return False
+    if a.get("stream") != b.get("stream"):
+        return False
+    return [f["sha1"] for f in a["files"]] == [f["sha1"] for f in b["files"]]
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+# ---------------------------------------------------------------------------
+# Ingesta en paralelo
+# ---------------------------------------------------------------------------
+
+def partial_path(partial_dir, file_prefix):
+    """Nombre de la salida parcial .npz de un triplete."""
+    name = os.path.normpath(file_prefix).strip(os.sep).replace(os.sep, "__")
+    return os.path.join(partial_dir, name + ".npz")
+
+
+def _process_day(task):
+    """Trabajo de un proceso: lee un triplete y escribe su salida parcial."""
+    file_prefix, out_path, stream, chunk_size = task
+    chunks = list(read_triplet(file_prefix, stream, chunk_size))
+    columns = {
+        b: np.concatenate([c[b] for c in chunks]) if chunks else np.empty(0, dtype=np.int64)
+        for b in BRANCHES
+    }
+    tmp = out_path + ".tmp.npz"
+    np.savez(tmp, **columns)
+    os.replace(tmp, out_path)
+    return file_prefix, len(columns["evn"])
+
+
+def ingest_parallel(prefixes, partial_dir, manifest_path, jobs=None,
+                    stream=False, chunk_size=CHUNK_SIZE):
+    """
+    Procesa cada triplete de prefixes en un proceso y devuelve, en el
+    mismo orden, las rutas de sus salidas parciales.
+
+    Los días cuya firma coincide con la del manifiesto y cuya salida
+    parcial existe no se vuelven a procesar.
+    """
+    os.makedirs(partial_dir, exist_ok=True)
+    manifest = load_manifest(manifest_path)
+
+    outputs, signatures, tasks = [], {}, []
+    for file_prefix in prefixes:
+        out_path = partial_path(partial_dir, file_prefix)
+        outputs.append(out_path)
+        old = manifest.get(file_prefix)
+        sig = source_signature(file_prefix, old)
+        sig["stream"] = bool(stream)
+        signatures[file_prefix] = sig
+        if same_sources(sig, old) and os.path.exists(out_path):
+            print(f"Sin cambios, se reutiliza {out_path}")
+            continue
+        tasks.append((file_prefix, out_path, stream, chunk_size))
+
+    if tasks:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for file_prefix, n in pool.map(_process_day, tasks):
+                print(f"Procesado {file_prefix}: {n} eventos")
+                manifest[file_prefix] = signatures[file_prefix]
+                save_manifest(manifest, manifest_path)
+
+    # Los días sin cambios también actualizan su mtime en el manifiesto
+    for file_prefix in prefixes:
+        if same_sources(signatures[file_prefix], manifest.get(file_prefix)):
+            manifest[file_prefix] = signatures[file_prefix]
+    save_manifest(manifest, manifest_path)
+    return outputs
+
+
+def iter_partials(paths):
+    """Genera los dicts de columnas de las salidas parciales, en orden."""
+    for path in paths:
+        with np.load(path) as data:
+            yield {b: data[b] for b in BRANCHES}
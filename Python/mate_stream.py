@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+mate_stream.py
+
+Lectura por bloques de un triplete m101/m102/m103 con unión por EVN.
+
+En lugar de cargar los tres archivos completos y emparejar las filas por
+posición, cada archivo se lee en bloques de chunk_size líneas y los tres
+flujos se combinan con un merge k-vías sobre la columna EVN:
+
+- Sólo se escriben los eventos presentes en las tres placas.
+- Los EVN que faltan (o sobran) en alguna placa se cuentan y se informan
+  como rangos, sin desalinear el resto de los eventos.
+- Los EVN repetidos o que retroceden dentro de un archivo se descartan
+  y también se informan.
+
+La memoria queda acotada por el tamaño de bloque, sin importar la
+duración del run.
+"""
+
+import io
+from itertools import islice
+
+import numpy as np
+
+from mate_decode import read_mate_text, decode_words
+
+# Líneas por bloque por defecto
+CHUNK_SIZE = 200000
+
+# Cantidad máxima de rangos de EVN faltantes que se guardan por placa
+MAX_SPANS = 1000
+
+
+def iter_mate_file(path, chunk_size=CHUNK_SIZE):
+    """
+    Recorre un archivo mate en bloques de chunk_size líneas.
+
+    Cada bloque es un dict como el de read_mate_file, ya filtrado a las
+    líneas válidas y con las columnas B y A decodificadas.
+    """
+    with open(path, "r", encoding="latin-1") as f:
+        while True:
+            lines = list(islice(f, chunk_size))
+            if not lines:
+                break
+            mate = read_mate_text(io.StringIO("".join(lines)))
+            keep = mate["valid"]
+            n_bad = int(np.count_nonzero(~keep))
+            if n_bad:
+                print(f"Error procesando {n_bad} líneas mal formadas en {path}")
+            pos_B, pos_A = decode_words(mate["word"][keep])
+            yield {
+                "evn": mate["evn"][keep], "tp1": mate["tp1"][keep], "tp2": mate["tp2"][keep],
+                "B": pos_B, "A": pos_A,
+            }
+
+
+def new_report(n_plates=3):
+    """Crea el registro de inconsistencias que llena merge_mate_streams."""
+    return {
+        "matched": 0,
+        "missing": [0] * n_plates,     # EVN que están en otra placa pero no en ésta
+        "spans": [[] for _ in range(n_plates)],
+        "unordered": [0] * n_plates,   # EVN repetidos o que retroceden
+    }
+
+
+def print_report(report, fname):
+    """Imprime el registro de merge_mate_streams."""
+    print(f"Eventos unidos por EVN en {fname}: {report['matched']}")
+    for k in range(len(report["missing"])):
+        suffix = k + 1
+        if report["missing"][k]:
+            spans = report["spans"][k]
+            shown = ", ".join(f"{a}–{b}" if a != b else f"{a}" for a, b in spans[:10])
+            more = " ..." if len(spans) > 10 else ""
+            print(f"Faltan {report['missing'][k]} EVN en {fname}_{suffix}: {shown}{more}")
+        if report["unordered"][k]:
+            print(f"EVN repetidos o fuera de orden descartados en {fname}_{suffix}: "
+                  f"{report['unordered'][k]}")
+
+
+def _spans(evn):
+    """Comprime un arreglo ordenado de EVN en rangos [inicio, fin] consecutivos."""
+    if len(evn) == 0:
+        return []
+    cuts = np.flatnonzero(np.diff(evn) != 1)
+    starts = np.concatenate([evn[:1], evn[cuts + 1]])
+    ends = np.concatenate([evn[cuts], evn[-1:]])
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def _empty():
+    return {k: np.empty(0, dtype=np.int64) for k in ("evn", "tp1", "tp2", "B", "A")}
+
+
+def _concat(a, b):
+    return {k: np.concatenate([a[k], b[k]]) for k in a}
+
+
+def _take(block, mask):
+    return {k: v[mask] for k, v in block.items()}
+
+
+def merge_mate_streams(paths, chunk_size=CHUNK_SIZE, report=None):
+    """
+    Une por EVN los archivos de paths (m101, m102, m103) leídos por bloques.
+
+    Genera dicts con tp1, tp2, evn (de la primera placa) y B1..Bk, A1..Ak.
+    Si se pasa report (ver new_report) se acumulan en él los eventos
+    faltantes y descartados de cada placa.
+    """
+    n = len(paths)
+    if report is None:
+        report = new_report(n)
+    streams = [iter_mate_file(p, chunk_size) for p in paths]
+    buffers = [_empty() for _ in range(n)]
+    exhausted = [False] * n
+    last_evn = [np.iinfo(np.int64).min] * n
+
+    while True:
+        # Rellena los buffers vacíos de los archivos que no se han terminado
+        for k in range(n):
+            while not exhausted[k] and len(buffers[k]["evn"]) == 0:
+                block = next(streams[k], None)
+                if block is None:
+                    exhausted[k] = True
+                    break
+                # Descarta EVN repetidos o que retroceden respecto de lo ya leído
+                evn = block["evn"]
+                running = np.maximum.accumulate(np.concatenate([[last_evn[k]], evn]))
+                ordered = evn > running[:-1]
+                report["unordered"][k] += int(np.count_nonzero(~ordered))
+                block = _take(block, ordered)
+                if len(block["evn"]):
+                    last_evn[k] = block["evn"][-1]
+                buffers[k] = _concat(buffers[k], block)
+
+        if all(exhausted) and all(len(b["evn"]) == 0 for b in buffers):
+            break
+
+        # Hasta este EVN ya se conocen todos los eventos de las tres placas
+        pending = [int(buffers[k]["evn"][-1]) for k in range(n) if not exhausted[k]]
+        watermark = min(pending) if pending else None
+
+        ready = []
+        for k in range(n):
+            cut = len(buffers[k]["evn"]) if watermark is None else \
+                int(np.searchsorted(buffers[k]["evn"], watermark, side="right"))
+            ready.append(_take(buffers[k], slice(0, cut)))
+            buffers[k] = _take(buffers[k], slice(cut, None))
+
+        # Eventos comunes a las placas y faltantes en cada una
+        union = ready[0]["evn"]
+        common = ready[0]["evn"]
+        for block in ready[1:]:
+            union = np.union1d(union, block["evn"])
+            common = np.intersect1d(common, block["evn"], assume_unique=True)
+        for k, block in enumerate(ready):
+            missing = np.setdiff1d(union, block["evn"], assume_unique=True)
+            if len(missing):
+                report["missing"][k] += len(missing)
+                room = MAX_SPANS - len(report["spans"][k])
+                if room > 0:
+                    report["spans"][k].extend(_spans(missing)[:room])
+
+        if len(common) == 0:
+            continue
+        report["matched"] += len(common)
+
+        out = {}
+        for k, block in enumerate(ready):
+            idx = np.searchsorted(block["evn"], common)
+            if k == 0:
+                out["tp1"] = block["tp1"][idx]
+                out["tp2"] = block["tp2"][idx]
+                out["evn"] = common
+            out[f"B{k + 1}"] = block["B"][idx]
+            out[f"A{k + 1}"] = block["A"][idx]
+        yield out
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+mate_synth.py
+
+Genera tripletes sintéticos *_06h00_mate-m101/102/103.txt con el mismo
+formato que los reales (tp1,h1,h2,h3,tp2,evn, ver mate_decode.py), para
+probar y medir 0_muon_csv_root.py y el análisis sin datos del telescopio.
+
+Cada evento es un muón recto con dirección de flujo ∝ cos^n θ (n = 2 por
+defecto) que entra por un punto uniforme de la placa superior y se
+propaga a z_med y z_inf (geometría de track_fit.py). Como el disparo es
+por coincidencia, sólo se guardan los muones que cruzan al menos
+trigger_plates placas (3 por defecto). En cada placa y eje se enciende
+la tira cruzada, salvo:
+
+- ineficiencia: la tira no se enciende (eje vacío),
+- multi-hit: se enciende además una tira vecina (o una al azar),
+- palabra vacía: la línea de la placa queda en 000000,
+- el muón sale de la placa: ese eje queda vacío.
+
+tp1 avanza con llegadas de Poisson a rate_hz; tp2 es la fracción del
+segundo en unidades de 2^-16. Con gaps se pierden, en una placa al azar,
+gap_length EVN consecutivos (las líneas no se escriben), que es lo que
+detecta check_evn.
+
+Los eventos se generan y escriben por bloques, así que 10^7 eventos no
+necesitan más memoria que 10^6. Con --truth se guardan además en un .npz
+la dirección, el punto de entrada y las tiras verdaderas de cada evento.
+
+Uso:
+    python mate_synth.py -o synth/2025_08_19 -n 1000000 --gaps 3
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+from mate_decode import N_STRIPS
+from mate_ingest import MATE_SUFFIXES
+from track_fit import ch_width, width_cm, z_inf, z_med, z_sup
+
+# Placas en el orden de los archivos m101, m102, m103 (inferior, media, superior)
+PLATE_Z = (z_inf, z_med, z_sup)
+
+# Eventos por bloque de generación y escritura
+BLOCK_SIZE = 1000000
+
+# Muones candidatos por vuelta del muestreo por rechazo
+MAX_CANDIDATES = 1 << 21
+
+# Parámetros por defecto del generador
+DEFAULTS = {
+    "rate_hz": 20.0,          # tasa de eventos
+    "t0": 1755590400,         # 2025-08-19 08:00 UTC
+    "evn0": 1000,             # primer EVN
+    "exponent": 2.0,          # flujo ∝ cos^n θ
+    "trigger_plates": 3,      # placas que debe cruzar el muón
+    "efficiency": 0.97,       # probabilidad de que se encienda la tira cruzada
+    "multi_hit": 0.05,        # probabilidad de una tira extra por placa y eje
+    "neighbor": 0.7,          # fracción de las tiras extra que son vecinas
+    "empty": 0.01,            # probabilidad de palabra vacía por placa
+    "gaps": 0,                # saltos de EVN
+    "gap_length": 10,         # EVN perdidos por salto
+}
+
+# Dígitos hexadecimales de cada byte (minúsculas, dos caracteres)
+_HEX_PAIRS = np.array([list(f"{i:02x}".encode()) for i in range(256)], dtype=np.uint8)
+
+COMMA, NEWLINE = ord(","), ord("\n")
+
+
+def _digits(values, width):
+    """
+    Matriz (n, width) de bytes ASCII de enteros >= 0 alineados a la
+    derecha, con 0 (que luego se elimina) en lugar de ceros a la izquierda.
+    """
+    values = np.asarray(values, dtype=np.int64)[:, None]
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    out = ((values // powers) % 10 + ord("0")).astype(np.uint8)
+    out[(values < powers) & (powers > 1)] = 0
+    return out
+
+
+def format_lines(tp1, word, tp2, evn):
+    """Texto (bytes) de las líneas tp1,h1,h2,h3,tp2,evn, sin bucle por línea."""
+    n = len(evn)
+    if n == 0:
+        return b""
+    word = np.asarray(word, dtype=np.int64)
+    sep = np.full((n, 1), COMMA, dtype=np.uint8)
+    fields = [
+        _digits(tp1, len(str(int(np.max(tp1))))), sep,
+        _HEX_PAIRS[(word >> 16) & 0xFF], sep,
+        _HEX_PAIRS[(word >> 8) & 0xFF], sep,
+        _HEX_PAIRS[word & 0xFF], sep,
+        _digits(tp2, len(str(int(np.max(tp2))))), sep,
+        _digits(evn, len(str(int(np.max(evn))))),
+        np.full((n, 1), NEWLINE, dtype=np.uint8),
+    ]
+    flat = np.hstack(fields).ravel()
+    return flat[flat != 0].tobytes()
+
+
+def sample_directions(rng, n, exponent=DEFAULTS["exponent"]):
+    """
+    (θ, φ) de n muones con intensidad ∝ cos^n θ a través de un plano
+    horizontal: la densidad de cos θ es ∝ cos^(n+1) θ.
+    """
+    cos_t = rng.random(n) ** (1.0 / (exponent + 2.0))
+    return np.arccos(cos_t), rng.uniform(0.0, 2 * np.pi, n)
+
+
+def strip_of(coord):
+    """Tira cruzada en la coordenada centrada coord (cm); -1 fuera de la placa."""
+    strip = np.floor((coord + width_cm / 2) / ch_width).astype(np.int64)
+    return np.where((strip >= 0) & (strip < N_STRIPS), strip, -1)
+
+
+def _axis_bits(rng, strip, params):
+    """Máscara de 12 bits de un eje: tira cruzada, ineficiencia y multi-hit."""
+    n = len(strip)
+    hit = (strip >= 0) & (rng.random(n) < params["efficiency"])
+    bits = np.where(hit, 1 << (N_STRIPS - 1 - np.maximum(strip, 0)), 0)
+
+    extra = hit & (rng.random(n) < params["multi_hit"])
+    neighbor = rng.random(n) < params["neighbor"]
+    side = np.where(rng.random(n) < 0.5, -1, 1)
+    other = np.where(neighbor, strip + side, rng.integers(0, N_STRIPS, n))
+    # Una vecina fuera de la placa se refleja hacia adentro
+    other = np.where(other < 0, 1, np.where(other >= N_STRIPS, N_STRIPS - 2, other))
+    bits |= np.where(extra, 1 << (N_STRIPS - 1 - other), 0)
+    return bits
+
+
+def _candidates(rng, m, exponent, through):
+    """
+    m muones candidatos: theta, phi y punto de entrada x0, y0 en la placa
+    superior. Con through se eligen entrada y salida uniformes en las
+    placas extremas y se aceptan con probabilidad cos^(n+4) θ (cos^n θ del
+    flujo, cos θ de cada placa y 1/r² del ángulo sólido), que da el mismo
+    flujo que entrar por arriba y exigir la salida por abajo pero sin
+    rechazar casi todo.
+    """
+    x0 = rng.uniform(-width_cm / 2, width_cm / 2, m)
+    y0 = rng.uniform(-width_cm / 2, width_cm / 2, m)
+    if not through:
+        theta, phi = sample_directions(rng, m, exponent)
+        return theta, phi, x0, y0
+    dx = rng.uniform(-width_cm / 2, width_cm / 2, m) - x0
+    dy = rng.uniform(-width_cm / 2, width_cm / 2, m) - y0
+    height = max(PLATE_Z) - min(PLATE_Z)
+    cos_t = height / np.sqrt(dx ** 2 + dy ** 2 + height ** 2)
+    ok = rng.random(m) < cos_t ** (exponent + 4.0)
+    return np.arccos(cos_t[ok]), np.arctan2(dy[ok], dx[ok]), x0[ok], y0[ok]
+
+
+def sample_tracks(rng, n, exponent=DEFAULTS["exponent"], trigger_plates=3):
+    """
+    n muones que cruzan al menos trigger_plates placas (por rechazo):
+    theta, phi, x0, y0 (punto de entrada en la placa superior) y las
+    tiras cruzadas strip_A, strip_B (placas de PLATE_Z, eventos).
+    """
+    through = trigger_plates >= len(PLATE_Z)
+    depth = z_sup - np.asarray(PLATE_Z)[:, None]
+    parts, have, accept = [], 0, 1.0
+    while have < n:
+        # Candidatos por vuelta, acotados para no depender de la aceptación
+        m = min(int((n - have) / accept * 1.2) + 100, MAX_CANDIDATES)
+        theta, phi, x0, y0 = _candidates(rng, m, exponent, through)
+        sA = strip_of(x0 + depth * np.tan(theta) * np.cos(phi))
+        sB = strip_of(y0 + depth * np.tan(theta) * np.sin(phi))
+        ok = ((sA >= 0) & (sB >= 0)).sum(axis=0) >= trigger_plates
+        accept = max(ok.sum() / m, 1e-3)
+        parts.append((theta[ok], phi[ok], x0[ok], y0[ok], sA[:, ok], sB[:, ok]))
+        have += int(ok.sum())
+    cols = [np.concatenate(c, axis=-1)[..., :n] for c in zip(*parts)]
+    return dict(zip(("theta", "phi", "x0", "y0", "strip_A", "strip_B"), cols))
+
+
+def simulate_block(rng, evn, t_prev, params):
+    """
+    Eventos con los EVN dados: dict con tp1, tp2, evn, word (3, n) por
+    placa y la verdad (theta, phi, x0, y0, strip_A/strip_B (3, n)).
+    t_prev es el tiempo (s, float) del evento anterior.
+    """
+    n = len(evn)
+    truth = sample_tracks(rng, n, params["exponent"], int(params["trigger_plates"]))
+
+    words = []
+    for k in range(len(PLATE_Z)):
+        word = ((_axis_bits(rng, truth["strip_B"][k], params) << N_STRIPS)
+                | _axis_bits(rng, truth["strip_A"][k], params))
+        word[rng.random(n) < params["empty"]] = 0
+        words.append(word)
+
+    t = t_prev + np.cumsum(rng.exponential(1.0 / params["rate_hz"], n))
+    tp1 = np.floor(t).astype(np.int64)
+    return {
+        "tp1": tp1,
+        "tp2": ((t - tp1) * (1 << 16)).astype(np.int64),
+        "evn": evn,
+        "word": np.stack(words),
+        "t_last": float(t[-1]) if n else t_prev,
+        **truth,
+    }
+
+
+def gap_spans(rng, n, n_gaps, gap_length, evn0):
+    """
+    Saltos de EVN como arreglo (gaps, 3): placa (0..2), primer EVN y
+    último EVN perdidos. No tocan el primer ni el último evento.
+    """
+    if n_gaps <= 0 or n <= 2 * gap_length + 2:
+        return np.empty((0, 3), dtype=np.int64)
+    starts = np.sort(rng.choice(np.arange(1, n - gap_length - 1), n_gaps, replace=False))
+    plates = rng.integers(0, len(PLATE_Z), n_gaps)
+    return np.column_stack([plates, starts + evn0, starts + evn0 + gap_length - 1])
+
+
+def write_triplet(prefix, n_events, seed=0, block_size=BLOCK_SIZE, truth_path=None, **params):
+    """
+    Escribe el triplete <prefix>_06h00_mate-m10{1,2,3}.txt con n_events
+    eventos (antes de los saltos) y devuelve un resumen: eventos y líneas
+    por archivo, saltos y parámetros usados.
+    """
+    params = {**DEFAULTS, **params}
+    unknown = set(params) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Parámetros desconocidos: {', '.join(sorted(unknown))}")
+    rng = np.random.default_rng(seed)
+    gaps = gap_spans(rng, n_events, int(params["gaps"]), int(params["gap_length"]), params["evn0"])
+
+    if os.path.dirname(prefix):
+        os.makedirs(os.path.dirname(prefix), exist_ok=True)
+    files = [open(prefix + suffix, "wb") for suffix in MATE_SUFFIXES]
+    truth = {k: [] for k in ("evn", "theta", "phi", "x0", "y0", "strip_A", "strip_B")}
+    lines = [0, 0, 0]
+    t_prev = float(params["t0"])
+    try:
+        for first in range(0, n_events, block_size):
+            evn = params["evn0"] + np.arange(first, min(first + block_size, n_events), dtype=np.int64)
+            block = simulate_block(rng, evn, t_prev, params)
+            t_prev = block["t_last"]
+            for k, f in enumerate(files):
+                keep = np.ones(len(evn), dtype=bool)
+                for _, lo, hi in gaps[gaps[:, 0] == k]:
+                    keep &= (evn < lo) | (evn > hi)
+                f.write(format_lines(block["tp1"][keep], block["word"][k][keep],
+                                     block["tp2"][keep], evn[keep]))
+                lines[k] += int(keep.sum())
+            if truth_path:
+                for key in truth:
+                    truth[key].append(block[key])
+    finally:
+        for f in files:
+            f.close()
+
+    if truth_path:
+        axis = {"strip_A": 1, "strip_B": 1}
+        np.savez(truth_path, gaps=gaps,
+                 **{k: np.concatenate(v, axis=axis.get(k, 0)) for k, v in truth.items()})
+    return {"prefix": prefix, "n_events": n_events, "lines": lines,
+            "gaps": gaps.tolist(), "seed": seed, "params": params}
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Genera un triplete mate sintético")
+    p.add_argument("-o", "--prefix", default="synthetic/2025_08_19",
+                   help="Prefijo de salida (sin _06h00_mate-m10X.txt)")
+    p.add_argument("-n", "--events", type=int, default=100000, help="Número de eventos")
+    p.add_argument("--seed", type=int, default=0, help="Semilla")
+    p.add_argument("--rate", type=float, default=DEFAULTS["rate_hz"], help="Tasa de eventos (Hz)")
+    p.add_argument("--t0", type=int, default=DEFAULTS["t0"], help="tp1 inicial (s Unix)")
+    p.add_argument("--exponent", type=float, default=DEFAULTS["exponent"], help="Flujo ∝ cos^n θ")
+    p.add_argument("--trigger-plates", type=int, default=DEFAULTS["trigger_plates"],
+                   help="Placas que debe cruzar cada muón (1 = sin coincidencia)")
+    p.add_argument("--efficiency", type=float, default=DEFAULTS["efficiency"],
+                   help="Eficiencia por tira cruzada")
+    p.add_argument("--multi-hit", type=float, default=DEFAULTS["multi_hit"],
+                   help="Probabilidad de una tira extra por placa y eje")
+    p.add_argument("--empty", type=float, default=DEFAULTS["empty"],
+                   help="Probabilidad de palabra vacía por placa")
+    p.add_argument("--gaps", type=int, default=DEFAULTS["gaps"], help="Saltos de EVN a inyectar")
+    p.add_argument("--gap-length", type=int, default=DEFAULTS["gap_length"],
+                   help="EVN perdidos por salto")
+    p.add_argument("--truth", help="Guarda la verdad de cada evento en este .npz")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    info = write_triplet(
+        args.prefix, args.events, args.seed, truth_path=args.truth,
+        rate_hz=args.rate, t0=args.t0, exponent=args.exponent,
+        trigger_plates=args.trigger_plates, efficiency=args.efficiency,
+        multi_hit=args.multi_hit, empty=args.empty, gaps=args.gaps, gap_length=args.gap_length,
+    )
+    print(f"{info['n_events']} eventos escritos en {args.prefix}_06h00_mate-m10{{1,2,3}}.txt "
+          f"(líneas: {', '.join(map(str, info['lines']))})")
+    for plate, lo, hi in info["gaps"]:
+        print(f"  salto en {MATE_SUFFIXES[plate][1:]}: EVN {lo}..{hi} perdidos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+matedata_io.py
+
+Escritura y lectura por bloques del árbol "matedata" de data.root.
+
+write_matedata escribe las columnas de forma columnar con uproot: cada
+bloque de eventos se agrega al TTree de una sola vez (una canasta por
+bloque), con ramas enteras tipadas en lugar del TNtuple de floats.
+
+    tp1, tp2, evn      int64
+    B1..B3, A1..A3     int16   (-1 = sin hit único)
+
+Los lectores existentes siguen funcionando: uproot entrega arreglos
+enteros, PyROOT accede a las ramas igual (ntuple.A2) y las macros de
+C++ leen las ramas con Long64_t / Short_t, o con Float_t si el archivo es
+un TNtuple (escrito antes de este formato o con --tntuple). Los data.root
+viejos conviene re-ingestarlos: en float32 tp1 pierde los segundos.
+
+write_matedata_tntuple conserva la escritura original fila por fila con
+PyROOT, para comparar (ver bench_writer.py).
+
+iter_matedata recorre el árbol en bloques de entradas de tamaño fijo
+(tree.arrays con entry_start/entry_stop), de modo que los lectores
+procesan runs de cualquier longitud con memoria acotada y sólo leen el
+rango de entradas que necesitan. take_entries extrae un conjunto
+disperso de entradas (por ejemplo una muestra aleatoria) bloque a bloque.
+"""
+
+import numpy as np
+import uproot
+
+# Nombre y título del árbol
+TREE_NAME = "matedata"
+TREE_TITLE = "mate data"
+
+# Tipos de las ramas, en el orden del TNtuple original
+MATEDATA_TYPES = {
+    "tp1": np.int64, "tp2": np.int64, "evn": np.int64,
+    "B1": np.int16, "B2": np.int16, "B3": np.int16,
+    "A1": np.int16, "A2": np.int16, "A3": np.int16,
+}
+
+# Eventos por canasta: los bloques más grandes se parten
+BASKET_SIZE = 500000
+
+# Entradas por bloque al leer
+STEP_SIZE = 1000000
+
+
+def write_matedata(path, chunks, basket_size=BASKET_SIZE):
+    """
+    Escribe en path un TTree matedata con los dicts de columnas de chunks.
+
+    Devuelve el número de eventos escritos.
+    """
+    n_total = 0
+    with uproot.recreate(path) as fout:
+        tree = fout.mktree(TREE_NAME, MATEDATA_TYPES, title=TREE_TITLE)
+        for chunk in chunks:
+            n = len(chunk["evn"])
+            for start in range(0, n, basket_size):
+                stop = min(start + basket_size, n)
+                tree.extend({
+                    name: np.asarray(chunk[name][start:stop], dtype=dtype)
+                    for name, dtype in MATEDATA_TYPES.items()
+                })
+            n_total += n
+    return n_total
+
+
+def write_matedata_tntuple(path, chunks):
+    """
+    Escritura original: un TNtuple de floats llenado evento por evento
+    con PyROOT. Devuelve el número de eventos escritos.
+    """
+    from ROOT import TNtuple, TFile, TObject
+
+    # Crea un archivo ROOT nuevo para guardar los datos procesados
+    fout = TFile(path, "recreate")
+
+    # Crea un TNtuple para guardar datos con las variables: tiempo1, tiempo2, evento y posiciones (B1-B3, A1-A3)
+    tuple_data = TNtuple(TREE_NAME, TREE_TITLE, ":".join(MATEDATA_TYPES))
+
+    n_total = 0
+    for chunk in chunks:
+        for j in range(len(chunk["evn"])):
+            tuple_data.Fill(
+                int(chunk["tp1"][j]), int(chunk["tp2"][j]), int(chunk["evn"][j]),
+                int(chunk["B1"][j]), int(chunk["B2"][j]), int(chunk["B3"][j]),
+                int(chunk["A1"][j]), int(chunk["A2"][j]), int(chunk["A3"][j])
+            )
+        n_total += len(chunk["evn"])
+
+    fout.Write("", TObject.kOverwrite)
+    fout.Close()
+    return n_total
+
+
+def iter_matedata(path, branches, step_size=STEP_SIZE, entry_start=None,
+                  entry_stop=None, tree_name=TREE_NAME):
+    """
+    Recorre las ramas branches del árbol en bloques de step_size entradas.
+
+    Genera (inicio, arrays) con el índice de la primera entrada del bloque
+    y un dict de arreglos de NumPy. Sólo se leen las entradas de
+    [entry_start, entry_stop).
+    """
+    with uproot.open(path) as f:
+        tree = f[tree_name]
+        start, stop, _ = slice(entry_start, entry_stop).indices(tree.num_entries)
+        for first in range(start, stop, step_size):
+            last = min(first + step_size, stop)
+            yield first, tree.arrays(branches, entry_start=first, entry_stop=last, library="np")
+
+
+def num_entries(path, tree_name=TREE_NAME):
+    """Número de entradas del árbol, sin leer ninguna rama."""
+    with uproot.open(path) as f:
+        return f[tree_name].num_entries
+
+
+def take_entries(path, branches, entries, step_size=STEP_SIZE, tree_name=TREE_NAME):
+    """
+    Lee sólo las entradas de índices entries (en el orden dado) recorriendo
+    el árbol por bloques; la memoria usada es la de un bloque más la salida.
+    """
+    entries = np.asarray(entries, dtype=np.int64)
+    order = np.argsort(entries, kind="stable")
+    wanted = entries[order]
+    parts = {b: [] for b in branches}
+    if len(wanted):
+        for first, arrays in iter_matedata(path, branches, step_size, int(wanted[0]),
+                                           int(wanted[-1]) + 1, tree_name):
+            lo, hi = np.searchsorted(wanted, [first, first + len(arrays[branches[0]])])
+            for b in branches:
+                parts[b].append(arrays[b][wanted[lo:hi] - first])
+    out = {}
+    for b in branches:
+        taken = np.concatenate(parts[b]) if parts[b] else np.empty(0)
+        result = np.empty_like(taken)
+        result[order] = taken
+        out[b] = result
+    return out
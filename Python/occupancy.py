@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+occupancy.py
+
+Mapas de ocupación de las tres placas en una sola pasada sobre data.root.
+
+Reemplaza a las macros C++/histo_A1B1.C, histo_A2B2.C y histo_A3B3.C, que
+abrían data.root tres veces y recorrían un número fijo de entradas
+(desde la 1, saltándose el primer evento). Aquí se recorre el árbol
+matedata por bloques, usando su número real de entradas, y para cada
+placa k se llena:
+
+- density_k: ocupación 12×12 en (Ak, Bk), con np.bincount sobre Ak*12+Bk.
+- profile_Ak, profile_Bk: perfiles 1D por strip.
+
+Las entradas sin hit único (-1) no se cuentan. Todos los histogramas se
+escriben en un único archivo ROOT (TH2D / TH1D, con uproot).
+
+Uso:
+    python occupancy.py -i data.root -o histo_occupancy.root
+"""
+
+import argparse
+import time
+
+import numpy as np
+import uproot
+
+from matedata_io import STEP_SIZE, iter_matedata
+
+# Strips por eje
+NCH = 12
+
+# Placas
+PLATES = (1, 2, 3)
+
+
+def new_occupancy():
+    """Acumuladores vacíos: mapas 2D y perfiles A/B por placa, y entradas leídas."""
+    return {
+        "entries": 0,
+        "density": {k: np.zeros((NCH, NCH), dtype=np.int64) for k in PLATES},
+        "profile_A": {k: np.zeros(NCH, dtype=np.int64) for k in PLATES},
+        "profile_B": {k: np.zeros(NCH, dtype=np.int64) for k in PLATES},
+    }
+
+
+def fill_occupancy(occ, arrays):
+    """Suma a occ los eventos de un bloque (dict con A1..A3, B1..B3)."""
+    occ["entries"] += len(arrays["A1"])
+    for k in PLATES:
+        A = arrays[f"A{k}"].astype(np.int64)
+        B = arrays[f"B{k}"].astype(np.int64)
+        in_A = (A >= 0) & (A < NCH)
+        in_B = (B >= 0) & (B < NCH)
+        both = in_A & in_B
+        occ["density"][k] += np.bincount(A[both] * NCH + B[both],
+                                         minlength=NCH * NCH).reshape(NCH, NCH)
+        occ["profile_A"][k] += np.bincount(A[in_A], minlength=NCH)
+        occ["profile_B"][k] += np.bincount(B[in_B], minlength=NCH)
+    return occ
+
+
+def compute_occupancy(root_path, step_size=STEP_SIZE):
+    """Ocupación de las tres placas de root_path, recorriéndolo por bloques."""
+    occ = new_occupancy()
+    branches = [f"{c}{k}" for k in PLATES for c in "AB"]
+    for _, arrays in iter_matedata(root_path, branches, step_size):
+        fill_occupancy(occ, arrays)
+    return occ
+
+
+def write_occupancy(path, occ):
+    """Escribe density_k (TH2D) y profile_Ak / profile_Bk (TH1D) en path."""
+    edges = np.arange(NCH + 1, dtype=float)
+    with uproot.recreate(path) as fout:
+        for k in PLATES:
+            fout[f"density_{k}"] = (occ["density"][k].astype(float), edges, edges)
+            fout[f"profile_A{k}"] = (occ["profile_A"][k].astype(float), edges)
+            fout[f"profile_B{k}"] = (occ["profile_B"][k].astype(float), edges)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Mapas de ocupación de las tres placas")
+    p.add_argument("-i", "--input", default="data.root", help="Archivo ROOT con matedata")
+    p.add_argument("-o", "--output", default="histo_occupancy.root",
+                   help="Archivo ROOT de salida con todos los histogramas")
+    p.add_argument("--chunk-size", type=int, default=STEP_SIZE, help="Entradas por bloque")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    t0 = time.time()
+    occ = compute_occupancy(args.input, args.chunk_size)
+    write_occupancy(args.output, occ)
+
+    print(f"Entradas leídas: {occ['entries']}")
+    for k in PLATES:
+        print(f"Placa {k}: {int(occ['density'][k].sum())} eventos con (A{k}, B{k}) válidos")
+    print(f"Histogramas guardados en {args.output} ({time.time() - t0:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+plateau_detect.py
+
+Detección de "hielo fundido": plateau cerca de 0 °C y cruce sostenido
+sobre 0 °C, para todos los sensores a la vez.
+
+Reproduce el criterio de las celdas de 2)_csvGrapher.ipynb:
+
+- T suavizada con media móvil centrada de SMOOTHING_MIN minutos y
+  pendiente (°C/min) suavizada con mediana móvil centrada.
+- Plateau: |T| <= ZERO_BAND_C y |pendiente| <= SLOPE_THR_C_PER_MIN
+  durante al menos MIN_DURATION_MIN minutos, viniendo de T < 0 (mediana
+  de los PRE_LOOKBACK_MIN minutos previos). Se informa el primero; como
+  en el cuaderno, su fin es la primera muestra fuera de la máscara.
+- Cruce sostenido: primera muestra con la anterior <= 0 que supera
+  +EPS_POS y se mantiene así HOLD_MIN minutos, habiendo pasado antes por
+  debajo de -EPS_NEG.
+- Global: plateau simultáneo en al menos k = max(3, ceil(GLOBAL_K_FRACTION·N))
+  sensores y hora en que el k-ésimo sensor cruza.
+
+En lugar de recorrer cada sensor con índices de pandas, las corridas de
+la máscara (muestras, sensores) se sacan de una sola vez con una
+codificación por corridas (np.diff de la máscara con bordes en False) y
+los filtros de duración y de "venir de abajo" se aplican a todas las
+corridas juntas. detect_archive aplica lo mismo a cada día del almacén
+de thermo_store.py.
+
+Uso:
+    python plateau_detect.py -i ../Termometros/Arduino/Datalog_Filtered_log_R.csv
+    python plateau_detect.py --archive --slope-thr 0.03 --min-duration 5 -o plateaus.csv
+"""
+
+import argparse
+import csv
+import math
+import warnings
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Parámetros del cuaderno
+ZERO_BAND_C = 0.20           # banda alrededor de 0 °C (±)
+SLOPE_THR_C_PER_MIN = 0.05   # |pendiente| máxima del plateau
+MIN_DURATION_MIN = 3.0       # duración mínima del plateau
+SMOOTHING_MIN = 0.5          # ventana de suavizado de T y de la pendiente
+PRE_LOOKBACK_MIN = 1.0       # ventana previa para exigir T < 0
+REQUIRE_PRE_BELOW = True
+GLOBAL_K_FRACTION = 0.30     # fracción de sensores para el plateau global
+EPS_NEG = 0.05               # haber estado < -EPS_NEG antes del cruce
+EPS_POS = 0.15               # el cruce debe superar +EPS_POS ...
+HOLD_MIN = 3.0               # ... durante HOLD_MIN minutos
+
+# Columnas del resumen por sensor (fusion_detection_summary.csv)
+SUMMARY_COLUMNS = ("sensor", "plateau_start", "plateau_end", "plateau_duration_min",
+                   "plateau_mean_T_C", "plateau_std_T_C", "plateau_median_slope_C_per_min",
+                   "sustained_cross_ts")
+
+
+def mins_to_samples(minutes, dt_sec):
+    return max(1, int(round((minutes * 60.0) / dt_sec)))
+
+
+def infer_dt_seconds(time):
+    """Paso de muestreo (mediana de los Δt positivos), en segundos."""
+    diffs = np.diff(time.astype("datetime64[s]").astype(np.int64)).astype(float)
+    diffs = diffs[diffs > 0]
+    if len(diffs) == 0:
+        raise ValueError("No se pudo inferir Δt positivo del tiempo (¿tiempos repetidos?)")
+    return float(np.median(diffs))
+
+
+def rolling_centered(x, window, func):
+    """
+    func (np.nanmean, np.nanmedian, ...) sobre una ventana centrada de
+    window muestras a lo largo del eje 0, como rolling(window, center=True,
+    min_periods=1) de pandas: los bordes usan las muestras disponibles.
+    """
+    if window <= 1:
+        return x.astype(float, copy=True)
+    before = window // 2
+    after = window - 1 - before
+    padded = np.pad(x.astype(float), ((before, after),) + ((0, 0),) * (x.ndim - 1),
+                    constant_values=np.nan)
+    return _nan_quiet(func, sliding_window_view(padded, window, axis=0), axis=-1)
+
+
+def _nan_quiet(func, *args, **kwargs):
+    """func sin el aviso de ventanas sin datos (quedan en NaN, como en pandas)."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return func(*args, **kwargs)
+
+
+def run_lengths(mask):
+    """
+    Corridas de True de mask (muestras, columnas): arreglos (inicio, fin,
+    columna), con fin incluido, ordenados por columna y luego por inicio.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    if mask.ndim == 1:
+        mask = mask[:, None]
+    edge = np.zeros((1, mask.shape[1]), dtype=np.int8)
+    step = np.diff(np.concatenate([edge, mask.view(np.int8), edge]), axis=0)
+    # Recorrido por columnas para que inicios y finales queden emparejados
+    col_s, start = np.nonzero(step.T == 1)
+    _, stop = np.nonzero(step.T == -1)
+    return start, stop - 1, col_s
+
+
+def _notebook_runs(mask):
+    """
+    run_lengths con el fin que usa true_segments del cuaderno: la primera
+    muestra después de la corrida (o la última muestra si la corrida llega
+    al final). Duración, estadísticas y largo mínimo incluyen esa muestra.
+    """
+    start, stop, col = run_lengths(mask)
+    return start, np.minimum(stop + 1, len(mask) - 1), col
+
+
+def _came_from_below(T, start, col, lookback):
+    """
+    Para cada corrida (inicio, columna): mediana de T[inicio - lookback :
+    inicio] < 0. Una corrida que empieza en la primera muestra no cuenta.
+    """
+    idx = start[:, None] + np.arange(-lookback, 0)
+    ok = idx >= 0
+    values = np.where(ok, T[np.clip(idx, 0, None), col[:, None]], np.nan)
+    med = _nan_quiet(np.nanmedian, values, axis=1)
+    return ok.any(axis=1) & (med < 0.0)
+
+
+def _first_runs(start, stop, col, n_cols):
+    """
+    Primera corrida de cada columna (vienen ordenadas por columna e
+    inicio): (inicio, fin), -1 donde no hay.
+    """
+    first = np.full((2, n_cols), -1, dtype=np.int64)
+    cols, i = np.unique(col, return_index=True)
+    first[0, cols] = start[i]
+    first[1, cols] = stop[i]
+    return first
+
+
+def sustained_crossing(T, hold, pos_eps=EPS_POS, neg_eps=EPS_NEG):
+    """
+    Índice (fila de T) del primer cruce sostenido de cada columna, o -1.
+
+    Como en el cuaderno, cada sensor se evalúa sobre sus muestras válidas
+    (sin NaN); aquí se compactan todas las columnas a la vez ordenando los
+    NaN al final.
+    """
+    n, m = T.shape
+    order = np.argsort(np.isnan(T), axis=0, kind="stable")
+    x = np.take_along_axis(T, order, axis=0)
+    n_valid = np.isfinite(T).sum(axis=0)
+
+    above = x > pos_eps
+    below_before = np.zeros((n, m), dtype=bool)
+    below_before[1:] = np.logical_or.accumulate(x[:-1] < -neg_eps, axis=0)
+    # Las hold muestras desde i siguen sobre pos_eps
+    held = np.zeros((n, m), dtype=bool)
+    if n >= hold:
+        held[:n - hold + 1] = sliding_window_view(above, hold, axis=0).all(axis=-1)
+
+    ok = np.zeros((n, m), dtype=bool)
+    ok[1:] = (x[:-1] <= 0) & held[1:] & below_before[1:]
+    ok &= np.arange(n)[:, None] < n_valid - hold
+    has = ok.any(axis=0)
+    pos = np.argmax(ok, axis=0)
+    return np.where(has, order[pos, np.arange(m)], -1)
+
+
+def detect_plateaus(time, temps, names=None,
+                    slope_thr=SLOPE_THR_C_PER_MIN, min_duration_min=MIN_DURATION_MIN,
+                    zero_band=ZERO_BAND_C, smoothing_min=SMOOTHING_MIN,
+                    pre_lookback_min=PRE_LOOKBACK_MIN, require_pre_below=REQUIRE_PRE_BELOW,
+                    k_fraction=GLOBAL_K_FRACTION, hold_min=HOLD_MIN,
+                    eps_pos=EPS_POS, eps_neg=EPS_NEG):
+    """
+    Detecta plateau y cruce sostenido en temps (muestras, sensores) con
+    tiempos time (datetime64, ordenados). names son los nombres de las
+    columnas (por defecto S1..SN).
+
+    Devuelve (resumen, global): resumen es un dict de arreglos con
+    SUMMARY_COLUMNS (tiempos como datetime64, NaT/NaN si no hay
+    detección) y global un dict con el plateau simultáneo de k sensores y
+    la hora del cruce por mayoría.
+    """
+    time = np.asarray(time).astype("datetime64[s]")
+    temps = np.asarray(temps, dtype=float)
+    n, m = temps.shape
+    names = [f"S{k + 1}" for k in range(m)] if names is None else list(names)
+
+    dt_sec = infer_dt_seconds(time)
+    win = mins_to_samples(smoothing_min, dt_sec)
+    min_len = mins_to_samples(min_duration_min, dt_sec)
+    lookback = mins_to_samples(pre_lookback_min, dt_sec)
+    hold = mins_to_samples(hold_min, dt_sec)
+    k = max(3, int(math.ceil(k_fraction * m)))
+
+    T = rolling_centered(temps, win, np.nanmean)
+    slope = np.full_like(T, np.nan)
+    slope[1:] = np.diff(T, axis=0) / (dt_sec / 60.0)
+    slope = rolling_centered(slope, win, np.nanmedian)
+    with np.errstate(invalid="ignore"):
+        mask = (np.abs(T) <= zero_band) & (np.abs(slope) <= slope_thr)
+
+    # --- Plateaus por sensor: todas las corridas a la vez ---
+    start, stop, col = _notebook_runs(mask)
+    keep = stop - start + 1 >= min_len
+    start, stop, col = start[keep], stop[keep], col[keep]
+    if require_pre_below and len(start):
+        keep = _came_from_below(T, start, col, lookback)
+        start, stop, col = start[keep], stop[keep], col[keep]
+    first = _first_runs(start, stop, col, m)
+
+    nat = np.datetime64("NaT", "s")
+    found = first[0] >= 0
+    a = np.where(found, first[0], 0)
+    b = np.where(found, first[1], 0)
+    summary = {
+        "sensor": np.array(names),
+        "plateau_start": np.where(found, time[a], nat),
+        "plateau_end": np.where(found, time[b], nat),
+        "plateau_duration_min": np.where(
+            found, (time[b] - time[a]).astype(np.int64) / 60.0, np.nan),
+        "plateau_mean_T_C": np.full(m, np.nan),
+        "plateau_std_T_C": np.full(m, np.nan),
+        "plateau_median_slope_C_per_min": np.full(m, np.nan),
+    }
+    for j in np.flatnonzero(found):
+        # La muestra final puede ser NaN: se ignora, como hace pandas
+        seg = T[a[j]:b[j] + 1, j]
+        summary["plateau_mean_T_C"][j] = np.nanmean(seg)
+        summary["plateau_std_T_C"][j] = np.nanstd(seg)
+        summary["plateau_median_slope_C_per_min"][j] = np.nanmedian(slope[a[j]:b[j] + 1, j])
+
+    cross = sustained_crossing(T, hold, eps_pos, eps_neg)
+    summary["sustained_cross_ts"] = np.where(cross >= 0, time[np.maximum(cross, 0)], nat)
+
+    # --- Global: k sensores en plateau a la vez ---
+    g_start, g_stop, _ = _notebook_runs(mask.sum(axis=1) >= k)
+    keep = g_stop - g_start + 1 >= min_len
+    g_start, g_stop = g_start[keep], g_stop[keep]
+    if require_pre_below and len(g_start):
+        median_T = _nan_quiet(np.nanmedian, T, axis=1)[:, None]
+        keep = _came_from_below(median_T, g_start, np.zeros_like(g_start), lookback)
+        g_start, g_stop = g_start[keep], g_stop[keep]
+
+    crossed = np.sort(summary["sustained_cross_ts"][cross >= 0])
+    glob = {
+        "k_required": k,
+        "n_sensors": m,
+        "global_plateau_start": time[g_start[0]] if len(g_start) else nat,
+        "global_plateau_end": time[g_stop[0]] if len(g_start) else nat,
+        "global_plateau_duration_min": (
+            float((time[g_stop[0]] - time[g_start[0]]).astype(np.int64)) / 60.0
+            if len(g_start) else np.nan),
+        "global_sustained_cross_majority_ts": crossed[k - 1] if len(crossed) >= k else nat,
+    }
+    return summary, glob
+
+
+def _present_sensors(temps):
+    """Columnas con al menos un dato (los días con 19 sensores no tienen S20)."""
+    return np.flatnonzero(np.isfinite(temps).any(axis=0))
+
+
+def detect_archive(store_dir=None, **params):
+    """
+    Aplica detect_plateaus a cada día del almacén de temperaturas.
+    Devuelve una lista de (día, resumen, global) en orden de día.
+    """
+    from thermo_store import STORE_DIR, open_store, partition_paths
+
+    store_dir = STORE_DIR if store_dir is None else store_dir
+    manifest = open_store(store_dir)
+    out = []
+    for day in sorted(manifest["partitions"]):
+        if manifest["partitions"][day]["n"] < 2:
+            continue
+        t_path, v_path = partition_paths(store_dir, day)
+        time = np.load(t_path).astype("datetime64[s]")
+        temps = np.load(v_path)
+        cols = _present_sensors(temps)
+        summary, glob = detect_plateaus(time, temps[:, cols],
+                                        [f"S{c + 1}" for c in cols], **params)
+        out.append((day, summary, glob))
+    return out
+
+
+def read_sensor_csv(path):
+    """Lee un CSV Date,Time,[Unidad,]S1.. (merged_testR.csv, Datalog_*.csv)."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.reader(f))
+    header, rows = rows[0], [r for r in rows[1:] if r]
+    sensors = [i for i, h in enumerate(header) if h.strip().upper().startswith("S")
+               and h.strip()[1:].isdigit()]
+    time = np.array([f"{r[0].strip()}T{r[1].strip()}" for r in rows], dtype="datetime64[s]")
+    temps = np.array([[float(r[i]) if r[i].strip() else np.nan for i in sensors] for r in rows])
+    order = np.argsort(time, kind="stable")
+    return time[order], temps[order], [header[i].strip() for i in sensors]
+
+
+def _fmt(value):
+    if isinstance(value, np.datetime64):
+        return "" if np.isnat(value) else str(value).replace("T", " ")
+    if isinstance(value, (float, np.floating)):
+        return "" if np.isnan(value) else repr(float(value))
+    return str(value)
+
+
+def write_summary(path, results):
+    """Guarda [(día, resumen, global)] como CSV; día None omite la columna."""
+    with_day = any(day is not None for day, _, _ in results)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow((["day"] if with_day else []) + list(SUMMARY_COLUMNS))
+        for day, summary, _ in results:
+            for j in range(len(summary["sensor"])):
+                row = [_fmt(summary[c][j]) for c in SUMMARY_COLUMNS]
+                writer.writerow(([day] if with_day else []) + row)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Plateau de fusión (~0 °C) y cruce sostenido por sensor")
+    src = p.add_mutually_exclusive_group()
+    src.add_argument("-i", "--input", help="CSV Date,Time,S1.. (p. ej. Datalog_Filtered_log_R.csv)")
+    src.add_argument("--archive", action="store_true",
+                     help="Recorre todos los días del almacén de thermo_store.py")
+    p.add_argument("-s", "--store", help="Carpeta del almacén (modo --archive)")
+    p.add_argument("--slope-thr", type=float, default=SLOPE_THR_C_PER_MIN,
+                   help="|pendiente| máxima del plateau (°C/min)")
+    p.add_argument("--min-duration", type=float, default=MIN_DURATION_MIN,
+                   help="Duración mínima del plateau (min)")
+    p.add_argument("--zero-band", type=float, default=ZERO_BAND_C, help="Banda ±°C alrededor de 0")
+    p.add_argument("--k-fraction", type=float, default=GLOBAL_K_FRACTION,
+                   help="Fracción de sensores para el plateau global")
+    p.add_argument("-o", "--output", default="fusion_detection_summary.csv", help="CSV de salida")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    params = {"slope_thr": args.slope_thr, "min_duration_min": args.min_duration,
+              "zero_band": args.zero_band, "k_fraction": args.k_fraction}
+    if args.archive:
+        results = detect_archive(args.store, **params)
+    else:
+        if not args.input:
+            raise SystemExit("Indica un CSV con -i o usa --archive")
+        time, temps, names = read_sensor_csv(args.input)
+        summary, glob = detect_plateaus(time, temps, names, **params)
+        results = [(None, summary, glob)]
+
+    for day, summary, glob in results:
+        n_found = int((~np.isnat(summary["plateau_start"])).sum())
+        print(f"{day or args.input}: plateau en {n_found}/{glob['n_sensors']} sensores, "
+              f"global {_fmt(glob['global_plateau_start']) or '-'} → "
+              f"{_fmt(glob['global_plateau_end']) or '-'} (k={glob['k_required']}), "
+              f"cruce por mayoría {_fmt(glob['global_sustained_cross_majority_ts']) or '-'}")
+    write_summary(args.output, results)
+    print(f"Resumen guardado en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
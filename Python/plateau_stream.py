@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+plateau_stream.py
+
+Detección en línea de plateaus (~0 °C) y de sensores caídos sobre los
+registros de temperatura mientras el Arduino los escribe.
+
+OnlineDetector recibe una muestra (tiempo, S1..S20) por vez y actualiza,
+para todos los sensores a la vez, un estado de tamaño fijo: anillos de
+SMOOTHING_MIN y PRE_LOOKBACK_MIN muestras, la temperatura anterior y el
+largo, inicio y suma de la corrida en curso. Cada muestra cuesta O(1) y
+la memoria no crece con la duración de la corrida. Emite eventos:
+
+- plateau_start / plateau_end por sensor y para la mayoría de sensores
+  ("global"), con el mismo criterio que plateau_detect.py (|T| en la
+  banda, |pendiente| bajo el umbral, venir de T < 0, duración mínima).
+  plateau_start se emite cuando la corrida alcanza la duración mínima,
+  con el tiempo en que empezó.
+- dropout_start / dropout_end cuando un sensor que ya había medido pasa
+  a "?", "NA" o -127 (NaN en thermo_log) y cuando vuelve.
+- gap cuando el tiempo salta más de GAP_FACTOR pasos o retrocede; los
+  anillos y las corridas se reinician.
+
+Como no hay muestras futuras, las ventanas de suavizado son hacia atrás
+(las del análisis offline son centradas); con la ventana por defecto de
+una muestra ambos criterios coinciden.
+
+Fuentes de muestras:
+- follow_dir sigue el TXT más reciente de una carpeta (como tail -f) y
+  pasa al del día siguiente cuando aparece.
+- replay relee archivos existentes a speed veces la velocidad real
+  (0 = sin esperas), para probar el detector con Termometros/1)_Datos.
+
+Uso:
+    python plateau_stream.py --follow ../Termometros/1)_Datos
+    python plateau_stream.py --replay ../Termometros/1)_Datos/2025081*.TXT --speed 600 -o eventos.csv
+"""
+
+import argparse
+import csv
+import glob
+import math
+import os
+import sys
+import time as _time
+import warnings
+
+import numpy as np
+
+from plateau_detect import (ZERO_BAND_C, SLOPE_THR_C_PER_MIN, MIN_DURATION_MIN, SMOOTHING_MIN,
+                            PRE_LOOKBACK_MIN, GLOBAL_K_FRACTION, mins_to_samples)
+from thermo_log import N_SENSORS, parse_lines, read_log
+
+# Paso nominal del registro (s) y salto que se considera un corte
+DT_SEC = 60.0
+GAP_FACTOR = 3.0
+
+# Columnas de los eventos
+EVENT_COLUMNS = ("time", "event", "sensor", "duration_min", "mean_T_C", "detected_at")
+
+
+class _Ring:
+    """Últimas size filas de ancho width (NaN mientras no se llenan)."""
+
+    def __init__(self, size, width):
+        self.data = np.full((size, width), np.nan)
+        self.pos = 0
+
+    def push(self, row):
+        self.data[self.pos] = row
+        self.pos = (self.pos + 1) % len(self.data)
+
+    def clear(self):
+        self.data.fill(np.nan)
+        self.pos = 0
+
+    def reduce(self, func):
+        """func (np.nanmean, np.nanmedian) por columna sobre el anillo."""
+        if len(self.data) == 1:
+            return self.data[0].copy()
+        return _quiet(func, self.data)
+
+
+class _Runs:
+    """
+    Corridas en curso de una máscara por columna, con el criterio de
+    "venir de abajo" (mediana de T en las lookback muestras previas < 0)
+    y la duración mínima min_len.
+    """
+
+    def __init__(self, width, lookback, min_len):
+        self.min_len = min_len
+        self.before = _Ring(lookback, width)
+        self.length = np.zeros(width, dtype=np.int64)
+        self.start = np.zeros(width, dtype=np.int64)
+        self.last = np.zeros(width, dtype=np.int64)
+        self.sum_T = np.zeros(width)
+        self.n_T = np.zeros(width, dtype=np.int64)
+        self.from_below = np.zeros(width, dtype=bool)
+        self.open = np.zeros(width, dtype=bool)
+
+    def update(self, t, mask, T):
+        """Avanza una muestra; devuelve (columnas que empiezan, columnas que terminan)."""
+        new = mask & (self.length == 0)
+        if new.any():
+            med = self.before.reduce(np.nanmedian)
+            self.from_below[new] = (med < 0.0)[new]
+            self.start[new] = t
+            self.sum_T[new] = 0.0
+            self.n_T[new] = 0
+        ended = ~mask & self.open
+        self.length = np.where(mask, self.length + 1, 0)
+        self.last[mask] = t
+        finite = mask & np.isfinite(T)
+        self.sum_T[finite] += T[finite]
+        self.n_T[finite] += 1
+        started = mask & ~self.open & self.from_below & (self.length >= self.min_len)
+        self.open = (self.open & mask) | started
+        self.before.push(T)
+        return np.flatnonzero(started), np.flatnonzero(ended)
+
+    def flush(self):
+        """Cierra todas las corridas (fin de datos o salto de tiempo)."""
+        ended = np.flatnonzero(self.open)
+        self.open[:] = False
+        self.length[:] = 0
+        self.before.clear()
+        return ended
+
+    def mean_T(self, j):
+        return self.sum_T[j] / self.n_T[j] if self.n_T[j] else np.nan
+
+
+def _quiet(func, a):
+    """func(a, axis=0) sin avisar por columnas sin datos (quedan en NaN)."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return func(a, axis=0)
+
+
+class OnlineDetector:
+    """
+    Detector de plateaus y caídas muestra a muestra. update(t, valores)
+    devuelve la lista de eventos (dicts con EVENT_COLUMNS) que produce la
+    muestra; flush() cierra los plateaus abiertos al terminar.
+    """
+
+    def __init__(self, n_sensors=N_SENSORS, dt_sec=DT_SEC,
+                 slope_thr=SLOPE_THR_C_PER_MIN, min_duration_min=MIN_DURATION_MIN,
+                 zero_band=ZERO_BAND_C, smoothing_min=SMOOTHING_MIN,
+                 pre_lookback_min=PRE_LOOKBACK_MIN, k_fraction=GLOBAL_K_FRACTION,
+                 gap_factor=GAP_FACTOR):
+        self.names = [f"S{j + 1}" for j in range(n_sensors)]
+        self.dt_sec = dt_sec
+        self.slope_thr = slope_thr
+        self.zero_band = zero_band
+        self.k_fraction = k_fraction
+        self.max_step = gap_factor * dt_sec
+        win = mins_to_samples(smoothing_min, dt_sec)
+        lookback = mins_to_samples(pre_lookback_min, dt_sec)
+        min_len = mins_to_samples(min_duration_min, dt_sec)
+
+        self.raw = _Ring(win, n_sensors)
+        self.slopes = _Ring(win, n_sensors)
+        self.prev_T = np.full(n_sensors, np.nan)
+        self.sensors = _Runs(n_sensors, lookback, min_len)
+        self.majority = _Runs(1, lookback, min_len)
+        self.seen = np.zeros(n_sensors, dtype=bool)
+        self.missing = np.zeros(n_sensors, dtype=bool)
+        self.missing_since = np.zeros(n_sensors, dtype=np.int64)
+        self.last_t = None
+
+    def _event(self, t, event, sensor, detected_at, duration_s=None, mean_T=None):
+        return {"time": _iso(t), "event": event, "sensor": sensor,
+                "duration_min": "" if duration_s is None else duration_s / 60.0,
+                "mean_T_C": "" if mean_T is None or np.isnan(mean_T) else mean_T,
+                "detected_at": _iso(detected_at)}
+
+    def _close(self, runs, cols, t, names):
+        return [self._event(runs.last[j], "plateau_end", names[j], t,
+                            runs.last[j] - runs.start[j], runs.mean_T(j)) for j in cols]
+
+    def update(self, t, values):
+        """t en segundos (int) y values (n_sensors,) con NaN donde no hay lectura."""
+        t = int(t)
+        values = np.asarray(values, dtype=float)
+        names = self.names
+        events = []
+
+        if self.last_t is not None and not 0 < t - self.last_t <= self.max_step:
+            # Corte o retroceso del reloj: se cierra todo y se empieza de nuevo
+            events += self.flush(self.last_t)
+            events.append(self._event(self.last_t, "gap", "", t, t - self.last_t))
+            self.raw.clear()
+            self.slopes.clear()
+            self.prev_T[:] = np.nan
+        self.last_t = t
+
+        # Caídas de sensores que ya habían dado alguna lectura
+        valid = np.isfinite(values)
+        self.seen |= valid
+        for j in np.flatnonzero(self.seen & ~valid & ~self.missing):
+            self.missing_since[j] = t
+            events.append(self._event(t, "dropout_start", names[j], t))
+        for j in np.flatnonzero(valid & self.missing):
+            events.append(self._event(self.missing_since[j], "dropout_end", names[j], t,
+                                      t - self.missing_since[j]))
+        self.missing = self.seen & ~valid
+
+        # Media y pendiente suavizadas hacia atrás; la pendiente usa el paso
+        # nominal, igual que el análisis offline
+        self.raw.push(values)
+        T = self.raw.reduce(np.nanmean)
+        self.slopes.push((T - self.prev_T) / (self.dt_sec / 60.0))
+        slope = self.slopes.reduce(np.nanmedian)
+        with np.errstate(invalid="ignore"):
+            mask = (np.abs(T) <= self.zero_band) & (np.abs(slope) <= self.slope_thr)
+        self.prev_T = T
+
+        started, ended = self.sensors.update(t, mask, T)
+        events += self._close(self.sensors, ended, t, names)
+        events += [self._event(self.sensors.start[j], "plateau_start", names[j], t) for j in started]
+
+        n_active = max(int(self.seen.sum()), 1)
+        k = max(3, int(math.ceil(self.k_fraction * n_active)))
+        g_started, g_ended = self.majority.update(
+            t, np.array([mask.sum() >= k]), _quiet(np.nanmedian, T[:, None]))
+        events += self._close(self.majority, g_ended, t, ["global"])
+        events += [self._event(self.majority.start[0], "plateau_start", "global", t)
+                   for _ in g_started]
+        return events
+
+    def flush(self, t=None):
+        """Cierra los plateaus abiertos (al final de los datos o en un corte)."""
+        t = self.last_t if t is None else t
+        if t is None:
+            return []
+        events = self._close(self.sensors, self.sensors.flush(), t, self.names)
+        events += self._close(self.majority, self.majority.flush(), t, ["global"])
+        return events
+
+
+def _iso(t):
+    return str(np.datetime64(int(t), "s")).replace("T", " ")
+
+
+# ---------------------------------------------------------------------------
+# Fuentes de muestras
+# ---------------------------------------------------------------------------
+
+def samples_from_lines(lines, epoch_offset_h=0.0):
+    """(t, valores) de cada línea con tiempo reconocible."""
+    for line in lines:
+        parsed = parse_lines([line], epoch_offset_h)
+        if len(parsed["time"]):
+            yield int(parsed["time"][0].astype(np.int64)), parsed["temps"][0]
+
+
+def follow_dir(data_dir, poll_s=5.0, from_start=False, pattern="*.TXT"):
+    """
+    Genera las líneas nuevas del TXT más reciente de data_dir y pasa al
+    siguiente cuando aparece uno con nombre posterior (el día nuevo se lee
+    desde el principio). Sólo se guarda el resto de la última línea
+    incompleta.
+    """
+    def latest():
+        paths = sorted(glob.glob(os.path.join(data_dir, pattern)))
+        return paths[-1] if paths else None
+
+    path = latest()
+    while path is None:
+        _time.sleep(poll_s)
+        path = latest()
+    first = True
+    while True:
+        with open(path, "rb") as f:
+            if first and not from_start:
+                f.seek(0, os.SEEK_END)
+            first = False
+            buf = b""
+            while True:
+                chunk = f.read()
+                if chunk:
+                    buf += chunk
+                    *lines, buf = buf.split(b"\n")
+                    yield from lines
+                    continue
+                newer = latest()
+                if newer != path:
+                    if buf:
+                        yield buf
+                    path = newer
+                    break
+                _time.sleep(poll_s)
+
+
+def replay(paths, speed=0.0, epoch_offset_h=0.0):
+    """
+    (t, valores) de archivos ya escritos, en orden, esperando entre
+    muestras el tiempo real dividido por speed (0 = sin esperas).
+    """
+    last = None
+    for path in paths:
+        log = read_log(path, epoch_offset_h)
+        for t, values in zip(log["time"].astype(np.int64), log["temps"]):
+            if speed > 0 and last is not None and t > last:
+                _time.sleep((t - last) / speed)
+            last = t
+            yield int(t), values
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Plateaus y caídas de sensores en línea")
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument("--follow", metavar="CARPETA", help="Sigue el TXT más reciente de la carpeta")
+    src.add_argument("--replay", nargs="+", metavar="TXT", help="Relee estos archivos")
+    p.add_argument("--speed", type=float, default=0.0,
+                   help="Velocidad de --replay respecto del tiempo real (0 = sin esperas)")
+    p.add_argument("--from-start", action="store_true",
+                   help="Con --follow, lee también lo que el archivo ya tenía")
+    p.add_argument("--poll", type=float, default=5.0, help="Segundos entre lecturas con --follow")
+    p.add_argument("--epoch-offset", type=float, default=0.0,
+                   help="Horas que se suman a las líneas en segundos Unix")
+    p.add_argument("--slope-thr", type=float, default=SLOPE_THR_C_PER_MIN,
+                   help="|pendiente| máxima del plateau (°C/min)")
+    p.add_argument("--min-duration", type=float, default=MIN_DURATION_MIN,
+                   help="Duración mínima del plateau (min)")
+    p.add_argument("--dropouts", action="store_true", help="Muestra también las caídas de sensores")
+    p.add_argument("-o", "--output", help="Agrega los eventos a este CSV")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.follow:
+        samples = samples_from_lines(follow_dir(args.follow, args.poll, args.from_start),
+                                     args.epoch_offset)
+    else:
+        paths = sorted(p for pattern in args.replay for p in glob.glob(pattern))
+        samples = replay(paths, args.speed, args.epoch_offset)
+
+    detector = OnlineDetector(slope_thr=args.slope_thr, min_duration_min=args.min_duration)
+    out = writer = None
+    if args.output:
+        new = not os.path.exists(args.output)
+        out = open(args.output, "a", newline="", encoding="utf-8")
+        writer = csv.DictWriter(out, fieldnames=EVENT_COLUMNS)
+        if new:
+            writer.writeheader()
+
+    def emit(events):
+        for e in events:
+            if writer:
+                writer.writerow(e)
+            if args.dropouts or not e["event"].startswith("dropout"):
+                extra = f"  {e['duration_min']:.0f} min" if e["duration_min"] != "" else ""
+                print(f"{e['time']}  {e['event']:<14} {e['sensor']:<6}{extra}")
+        if out and events:
+            out.flush()
+        sys.stdout.flush()
+
+    n = 0
+    try:
+        for t, values in samples:
+            emit(detector.update(t, values))
+            n += 1
+    except KeyboardInterrupt:
+        pass
+    emit(detector.flush())
+    if out:
+        out.close()
+    print(f"{n} muestras procesadas")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,14 +6,26 @@ Lee el TTree "muons" de muons_data.root, ajusta una línea a los hits
 (Ai, Bi) en los tres planos definidos por z_positions, y calcula
 la pendiente y el ángulo de incidencia en x–z e y–z para cada evento.
 
-Salida: CSV con slope_x, slope_y, theta_x_deg, theta_y_deg.
+El árbol se recorre en bloques de --chunk-size eventos y cada bloque se
+agrega al CSV, así que la memoria no crece con la longitud del run. Los
+ajustes salen de una tabla por patrón de hits (hit_patterns.PatternTable):
+cada combinación (B1..B3, A1..A3) distinta se ajusta una sola vez.
+
+Salida: CSV con slope_x, slope_y, theta_x_deg, theta_y_deg, intercept_x,
+intercept_y, chi2 y theta_deg (ángulo cenital).
 """
 
-import uproot
 import numpy as np
 import pandas as pd
 import argparse
 
+from matedata_io import STEP_SIZE, iter_matedata
+from hit_patterns import PatternTable
+
+# Columnas del CSV de salida
+COLUMNS = ["slope_x", "slope_y", "theta_x_deg", "theta_y_deg", "intercept_x",
+           "intercept_y", "chi2", "theta_deg"]
+
 def parse_args():
     p = argparse.ArgumentParser(
         description="Reconstruye trayectorias de muones desde muons_data.root"
@@ -26,6 +38,14 @@ def parse_args():
         "-o","--output", default="tracks.csv",
         help="Nombre de archivo CSV de salida"
     )
+    p.add_argument(
+        "--chunk-size", type=int, default=STEP_SIZE,
+        help="Eventos por bloque; el archivo se procesa por bloques con memoria acotada"
+    )
+    p.add_argument(
+        "--patterns", default=None,
+        help="CSV opcional con los patrones de hits distintos y su multiplicidad"
+    )
     p.add_argument(
         "--z_positions", nargs=3, type=float,
         default=[0.0, 10.0, 20.0],
@@ -36,43 +56,51 @@ def parse_args():
 def main():
     args = parse_args()
 
-    # 1) Abre el ROOT y extrae las ramas
-    tree = uproot.open(args.input)["muons"]
-    arr = tree.arrays(["A1","B1","A2","B2","A3","B3"], library="np")
-
-    # 2) Prepara posiciones z y constantes para el ajuste
     z = np.array(args.z_positions)
-    z_mean = z.mean()
-    denom = np.sum((z - z_mean)**2)
-
-    # 3) Prealoca vectores de resultados
-    n = len(arr["A1"])
-    slopes_x = np.empty(n)
-    slopes_y = np.empty(n)
-
-    # 4) Loop sobre eventos
-    for i in range(n):
-        x = np.array([arr["B1"][i], arr["B2"][i], arr["B3"][i]])
-        y = np.array([arr["A1"][i], arr["A2"][i], arr["A3"][i]])
-        x_mean = x.mean()
-        y_mean = y.mean()
-        # pendiente = cov(z,x)/var(z)
-        slopes_x[i] = np.sum((z - z_mean) * (x - x_mean)) / denom
-        slopes_y[i] = np.sum((z - z_mean) * (y - y_mean)) / denom
-
-    # 5) Ángulos en grados
-    theta_x = np.degrees(np.arctan(slopes_x))
-    theta_y = np.degrees(np.arctan(slopes_y))
-
-    # 6) Guardar en CSV
-    df = pd.DataFrame({
-        "slope_x": slopes_x,
-        "slope_y": slopes_y,
-        "theta_x_deg": theta_x,
-        "theta_y_deg": theta_y,
-    })
-    df.to_csv(args.output, index=False)
+    n = 0
+
+    # Ajustes memoizados por patrón de hits, compartidos entre bloques
+    table = PatternTable(z)
+
+    # La cabecera se escribe antes del primer bloque: un árbol vacío o sin
+    # eventos deja igual un CSV válido para plot_muon_tracks_3D*.py
+    pd.DataFrame(columns=COLUMNS).to_csv(args.output, index=False)
+
+    # 1) Recorre el árbol por bloques de eventos
+    for _, arr in iter_matedata(args.input, ["A1","B1","A2","B2","A3","B3"],
+                                args.chunk_size, tree_name="muons"):
+
+        # 2) Hits por plano, en el mismo orden que z_positions
+        x = [arr["B1"], arr["B2"], arr["B3"]]
+        y = [arr["A1"], arr["A2"], arr["A3"]]
+
+        # 3) Ajuste lineal: sólo se ajustan los patrones (B1..A3) no vistos antes
+        fit = table.lookup(x, y)
+
+        # 4) Ángulos en grados
+        theta_x = np.degrees(fit["theta_x"])
+        theta_y = np.degrees(fit["theta_y"])
+
+        # 5) Agrega el bloque al CSV
+        df = pd.DataFrame({
+            "slope_x": fit["slope_x"],
+            "slope_y": fit["slope_y"],
+            "theta_x_deg": theta_x,
+            "theta_y_deg": theta_y,
+            "intercept_x": fit["intercept_x"],
+            "intercept_y": fit["intercept_y"],
+            "chi2": fit["chi2"],
+            "theta_deg": np.degrees(fit["theta"]),
+        }, columns=COLUMNS)
+        df.to_csv(args.output, index=False, mode="a", header=False)
+        n += len(df)
+
     print(f"Guardado {n} tracks en '{args.output}'")
 
+    # 6) Multiplicidad de cada patrón de hits
+    if args.patterns:
+        pd.DataFrame(table.multiplicities()).to_csv(args.patterns, index=False)
+        print(f"Guardado {len(table.keys)} patrones distintos en '{args.patterns}'")
+
 if __name__ == "__main__":
     main()
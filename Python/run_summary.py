@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+run_summary.py
+
+Resumen acumulado de la corrida que se actualiza de forma incremental.
+
+El estado (summary_state.json) guarda, por cada triplete de archivos
+fuente, su aporte al resumen:
+
+- occupancy: ocupación 12×12 de cada placa (3, 12, 12).
+- theta, theta_x, theta_y: histogramas de ángulo cenital y proyectados
+  de los eventos con hit único en las tres placas.
+- hour0, hours: eventos por hora (tp1 // 3600, con tp1 en segundos Unix).
+- n_events, last_evn, last_tp1, last_tp2: hasta dónde se procesó.
+- signature: firma de los archivos (tamaño, mtime y hash, como en mate_ingest).
+
+0_muon_csv_root.py pasa los bloques de cada día por fold_source: si la
+firma no cambió el día no se vuelve a sumar; si cambió (un día nuevo o
+un archivo que creció) su aporte se rehace con los mismos bloques que
+van al escritor, sin volver a leer el triplete. La firma no incluye el
+modo de lectura (--stream). Actualizar el resumen cuesta lo que cuesta
+el día nuevo, y summarize suma los aportes de todos los días (arreglos
+chicos) para obtener el total.
+
+Uso como script (muestra el resumen guardado):
+    python run_summary.py --state summary_state.json
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+from hit_patterns import PatternTable
+from mate_ingest import same_sources
+from track_fit import z_sup, z_med, z_inf, ch_width, offset
+
+# Versión del formato del estado
+SUMMARY_VERSION = 1
+
+# Estado por defecto
+SUMMARY_STATE = "summary_state.json"
+
+# Strips por eje y placas
+NCH = 12
+PLATES = (1, 2, 3)
+
+# Bordes de los histogramas de ángulo (grados)
+THETA_EDGES = np.linspace(0.0, 90.0, 91)
+THETA_XY_EDGES = np.linspace(-90.0, 90.0, 181)
+
+# Segundos por bin de la tasa
+HOUR_S = 3600
+
+
+def new_partial():
+    """Aporte vacío de un triplete."""
+    return {
+        "n_events": 0, "last_evn": None, "last_tp1": None, "last_tp2": None,
+        "occupancy": np.zeros((len(PLATES), NCH, NCH), dtype=np.int64),
+        "theta": np.zeros(len(THETA_EDGES) - 1, dtype=np.int64),
+        "theta_x": np.zeros(len(THETA_XY_EDGES) - 1, dtype=np.int64),
+        "theta_y": np.zeros(len(THETA_XY_EDGES) - 1, dtype=np.int64),
+        "hour0": None, "hours": np.zeros(0, dtype=np.int64),
+    }
+
+
+def _add_hours(partial, hour0, counts):
+    """Suma counts (horas desde hour0) a la serie por hora de partial."""
+    if not len(counts):
+        return
+    if partial["hour0"] is None:
+        partial["hour0"], partial["hours"] = hour0, np.zeros(0, dtype=np.int64)
+    lo = min(partial["hour0"], hour0)
+    hi = max(partial["hour0"] + len(partial["hours"]), hour0 + len(counts))
+    out = np.zeros(hi - lo, dtype=np.int64)
+    out[partial["hour0"] - lo:partial["hour0"] - lo + len(partial["hours"])] += partial["hours"]
+    out[hour0 - lo:hour0 - lo + len(counts)] += counts
+    partial["hour0"], partial["hours"] = lo, out
+
+
+def fold_chunk(partial, chunk, table):
+    """Suma a partial un bloque de columnas de matedata (tp1, tp2, evn, B1.., A1..)."""
+    n = len(chunk["evn"])
+    if n == 0:
+        return partial
+    for i, k in enumerate(PLATES):
+        A = chunk[f"A{k}"].astype(np.int64)
+        B = chunk[f"B{k}"].astype(np.int64)
+        ok = (A >= 0) & (A < NCH) & (B >= 0) & (B < NCH)
+        partial["occupancy"][i] += np.bincount(A[ok] * NCH + B[ok],
+                                               minlength=NCH * NCH).reshape(NCH, NCH)
+
+    # Ángulos sólo de eventos con hit único en las tres placas
+    planes = ("3", "2", "1")
+    x = [chunk["A" + k].astype(np.int64) for k in planes]
+    y = [chunk["B" + k].astype(np.int64) for k in planes]
+    full = np.logical_and.reduce([c >= 0 for c in x + y])
+    if full.any():
+        fit = table.lookup([c[full] for c in x], [c[full] for c in y])
+        for name, edges in (("theta", THETA_EDGES), ("theta_x", THETA_XY_EDGES),
+                            ("theta_y", THETA_XY_EDGES)):
+            partial[name] += np.histogram(np.degrees(fit[name]), edges)[0]
+
+    hour = np.asarray(chunk["tp1"], dtype=np.int64) // HOUR_S
+    hour0 = int(hour.min())
+    _add_hours(partial, hour0, np.bincount(hour - hour0))
+
+    partial["n_events"] += n
+    partial["last_evn"] = int(chunk["evn"][-1])
+    partial["last_tp1"] = int(chunk["tp1"][-1])
+    partial["last_tp2"] = int(chunk["tp2"][-1])
+    return partial
+
+
+def new_table():
+    """Tabla de ajustes por patrón con la geometría del telescopio."""
+    return PatternTable(np.array([z_sup, z_med, z_inf]), ch_width, offset)
+
+
+def _summary_signature(signature):
+    """Firma sin el modo de lectura: el resumen no depende de --stream."""
+    return {k: v for k, v in signature.items() if k != "stream"}
+
+
+def fold_source(state, file_prefix, signature, make_chunks, table=None):
+    """
+    Genera los bloques de un triplete (make_chunks() se llama una sola
+    vez) y, en la misma pasada que los lleva al escritor, rehace su aporte
+    en state si la firma cambió; el aporte se guarda al agotar el
+    generador.
+    """
+    sources = state.setdefault("sources", {})
+    signature = _summary_signature(signature)
+    old = sources.get(file_prefix)
+    if old and same_sources(signature, _summary_signature(old["signature"])):
+        yield from make_chunks()
+        return
+
+    if old:
+        print(f"{file_prefix} cambió: se rehace su aporte al resumen")
+    table = table or new_table()
+    partial = new_partial()
+    for chunk in make_chunks():
+        fold_chunk(partial, chunk, table)
+        yield chunk
+    sources[file_prefix] = _to_json(partial, signature)
+
+
+def _to_json(partial, signature):
+    out = {k: (v.tolist() if isinstance(v, np.ndarray) else v) for k, v in partial.items()}
+    out["signature"] = signature
+    return out
+
+
+def _from_json(entry):
+    partial = new_partial()
+    for k in partial:
+        v = entry[k]
+        partial[k] = np.asarray(v, dtype=np.int64) if isinstance(partial[k], np.ndarray) else v
+    return partial
+
+
+def load_state(path=SUMMARY_STATE):
+    if not os.path.exists(path):
+        return {"version": SUMMARY_VERSION, "sources": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    if state.get("version") != SUMMARY_VERSION:
+        return {"version": SUMMARY_VERSION, "sources": {}}
+    return state
+
+
+def save_state(state, path=SUMMARY_STATE):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def summarize(state):
+    """Resumen total: suma de los aportes de todos los tripletes del estado."""
+    total = new_partial()
+    total["n_events"] = 0
+    for entry in state.get("sources", {}).values():
+        partial = _from_json(entry)
+        total["n_events"] += partial["n_events"]
+        for k in ("occupancy", "theta", "theta_x", "theta_y"):
+            total[k] += partial[k]
+        if partial["hour0"] is not None:
+            _add_hours(total, partial["hour0"], partial["hours"])
+    return total
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Muestra el resumen acumulado de la corrida")
+    p.add_argument("--state", default=SUMMARY_STATE, help="Archivo de estado del resumen")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    state = load_state(args.state)
+    total = summarize(state)
+    print(f"Días en el resumen: {len(state['sources'])}")
+    print(f"Eventos: {total['n_events']}")
+    for i, k in enumerate(PLATES):
+        print(f"Placa {k}: {int(total['occupancy'][i].sum())} eventos con (A{k}, B{k}) válidos")
+    n_theta = int(total["theta"].sum())
+    if n_theta:
+        centers = 0.5 * (THETA_EDGES[1:] + THETA_EDGES[:-1])
+        print(f"Ángulo cenital medio: {np.dot(centers, total['theta']) / n_theta:.2f}° "
+              f"({n_theta} eventos con hit en las tres placas)")
+    if total["hour0"] is not None:
+        busy = total["hours"][total["hours"] > 0]
+        print(f"Horas con datos: {len(busy)}; tasa media {busy.mean() / HOUR_S:.3f} eventos/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+thermo_join.py
+
+Une los eventos de matedata (tp1) con las temperaturas S1..S19 de
+Termometros/1)_Datos.
+
+AsofJoiner guarda las lecturas de temperatura del intervalo de la
+corrida (unos miles de filas por día, del almacén de thermo_store.py) y
+a cada tiempo le asigna:
+
+- "nearest": la lectura más cercana,
+- "backward": la última lectura anterior o igual (merge_asof de pandas),
+- "interp": la interpolación lineal entre la lectura anterior y la
+  siguiente,
+
+o NaN si la lectura usada está a más de tolerance segundos (cortes del
+registro). Los eventos llegan en bloques de iter_matedata; como tp1 crece
+dentro de la corrida, cada bloque se busca con np.searchsorted sólo desde
+la última lectura usada por el bloque anterior, de modo que el recorrido
+de ambas series es un solo avance conjunto, como en un merge. Si un
+bloque retrocede en el tiempo se busca en toda la serie. En memoria
+quedan sólo las temperaturas y un bloque de eventos.
+
+join_events escribe un árbol "tempdata" (evn, dt_temp y S1..S19, una
+entrada por entrada de matedata y en el mismo orden, para usarlo como
+friend); join_bins agrega las temperaturas en el centro de cada bin al
+CSV de time_index.py.
+
+Los registros de temperatura están en hora local del Arduino y tp1 en
+segundos Unix: utc_offset (horas) es el desfase de la hora local
+respecto de UTC, como en time_index.py.
+
+Uso:
+    python thermo_join.py -i data.root -o data_temps.root --mode interp
+    python thermo_join.py --bins time_series.csv -o time_series_temps.csv
+"""
+
+import argparse
+import csv
+
+import numpy as np
+import uproot
+
+from matedata_io import STEP_SIZE, iter_matedata
+from thermo_store import STORE_DIR, query_range
+
+# Sensores que se unen por defecto (S20 sólo existe en algunos días)
+SENSORS = tuple(range(1, 20))
+
+# Distancia máxima (s) a la lectura usada; el registro es de una por minuto
+TOLERANCE_S = 120
+
+MODES = ("nearest", "backward", "interp")
+
+# dt_temp de los eventos sin lectura dentro de la tolerancia
+NO_READING = np.iinfo(np.int32).max
+
+# Árbol de salida por evento
+TEMP_TREE = "tempdata"
+
+
+def load_temperatures(t_start, t_stop, store_dir=STORE_DIR, utc_offset=0.0,
+                      sensors=SENSORS, margin=TOLERANCE_S):
+    """
+    Lecturas entre t_start y t_stop (segundos Unix) con margen, en tiempo
+    Unix: (t int64 ordenado, temperaturas (lecturas, len(sensors))).
+    """
+    shift = int(round(utc_offset * 3600))
+    data = query_range(store_dir, t_start - margin + shift, t_stop + margin + 1 + shift)
+    t = data["time"].astype(np.int64) - shift
+    return t, data["temps"][:, np.asarray(sensors) - 1]
+
+
+class AsofJoiner:
+    """
+    Asigna a tiempos (en bloques) la temperatura según mode; ver el
+    docstring del módulo. join devuelve (valores (n, sensores), dt) con dt
+    la distancia en segundos a la lectura usada (a la más cercana de las
+    dos en "interp").
+    """
+
+    def __init__(self, t, temps, mode="nearest", tolerance=TOLERANCE_S):
+        if mode not in MODES:
+            raise ValueError(f"Modo desconocido: {mode} (usa {', '.join(MODES)})")
+        self.t = np.asarray(t, dtype=np.int64)
+        self.temps = np.asarray(temps, dtype=float)
+        self._padded = np.vstack([self.temps, np.full((1, self.temps.shape[1]), np.nan)])
+        self.mode = mode
+        self.tolerance = tolerance
+        self._cursor = 0
+        self._last = None
+
+    def _right(self, times):
+        """Para cada tiempo, índice de la primera lectura posterior."""
+        monotonic = len(times) < 2 or not np.any(np.diff(times) < 0)
+        if monotonic and self._last is not None and times[0] >= self._last:
+            base = self._cursor
+        else:
+            base = 0
+        idx = np.searchsorted(self.t[base:], times, side="right") + base
+        if monotonic and len(times):
+            self._cursor = max(int(idx[-1]) - 1, 0)
+            self._last = times[-1]
+        else:
+            self._last = None
+        return idx
+
+    def join(self, times):
+        times = np.asarray(times, dtype=np.int64)
+        n, nt = len(times), len(self.t)
+        if n == 0 or nt == 0:
+            return np.full((n, self.temps.shape[1]), np.nan), np.full(n, NO_READING, dtype=np.int64)
+
+        right = self._right(times)
+        left = right - 1
+        big = np.iinfo(np.int64).max
+        d_l = np.where(left >= 0, times - self.t[np.maximum(left, 0)], big)
+        d_r = np.where(right < nt, self.t[np.minimum(right, nt - 1)] - times, big)
+
+        # La fila nt de _padded es NaN: los tiempos sin lectura apuntan ahí
+        if self.mode == "interp":
+            ok = (d_l == 0) | ((d_l < big) & (d_r < big) & (d_l + d_r <= self.tolerance))
+            w = np.where(ok & (d_l > 0), d_l / np.maximum(d_l + d_r, 1).astype(float), 0.0)
+            lo = self._padded[np.where(ok, left, nt)]
+            hi = self._padded[np.where(ok & (d_l > 0), right, nt)]
+            out = lo + w[:, None] * np.where(w[:, None] > 0, hi - lo, 0.0)
+            d = np.minimum(d_l, d_r)
+        else:
+            if self.mode == "backward":
+                use, d = left, d_l
+            else:
+                # En empate gana la lectura anterior
+                take_r = d_r < d_l
+                use = np.where(take_r, right, left)
+                d = np.where(take_r, d_r, d_l)
+            ok = d <= self.tolerance
+            out = self._padded[np.where(ok, use, nt)]
+        return out, np.where(ok, d, NO_READING)
+
+
+def _tp1_span(root_path, step_size):
+    """Primer y último tp1 de la corrida, leyendo sólo esa rama."""
+    lo, hi = np.iinfo(np.int64).max, np.iinfo(np.int64).min
+    for _, arr in iter_matedata(root_path, ["tp1"], step_size):
+        if len(arr["tp1"]):
+            lo = min(lo, int(arr["tp1"].min()))
+            hi = max(hi, int(arr["tp1"].max()))
+    return lo, hi
+
+
+def join_events(root_path, out_path, store_dir=STORE_DIR, mode="nearest",
+                tolerance=TOLERANCE_S, utc_offset=0.0, sensors=SENSORS,
+                step_size=STEP_SIZE):
+    """
+    Escribe en out_path el árbol TEMP_TREE con la temperatura de cada
+    evento de root_path, bloque a bloque. Devuelve (eventos, eventos con
+    temperatura en todos los sensores pedidos).
+    """
+    t0, t1 = _tp1_span(root_path, step_size)
+    t, temps = load_temperatures(t0, t1, store_dir, utc_offset, sensors, tolerance)
+    print(f"{len(t)} lecturas de temperatura para {np.datetime64(t0, 's')} → "
+          f"{np.datetime64(t1, 's')} (UTC)")
+    joiner = AsofJoiner(t, temps, mode, tolerance)
+
+    types = {"evn": np.int64, "dt_temp": np.int32}
+    types.update({f"S{k}": np.float32 for k in sensors})
+    n_total = n_full = 0
+    with uproot.recreate(out_path) as fout:
+        tree = fout.mktree(TEMP_TREE, types, title=f"temperaturas ({mode})")
+        for _, arr in iter_matedata(root_path, ["tp1", "evn"], step_size):
+            values, dt = joiner.join(arr["tp1"])
+            columns = {"evn": arr["evn"].astype(np.int64),
+                       "dt_temp": dt.astype(np.int32)}
+            columns.update({f"S{k}": values[:, j].astype(np.float32)
+                            for j, k in enumerate(sensors)})
+            tree.extend(columns)
+            n_total += len(dt)
+            n_full += int(np.isfinite(values).all(axis=1).sum())
+    return n_total, n_full
+
+
+def join_bins(series_path, out_path, store_dir=STORE_DIR, mode="interp",
+              tolerance=TOLERANCE_S, utc_offset=0.0, sensors=SENSORS):
+    """
+    Agrega a un CSV de time_index.py (columna t_start, bins regulares) la
+    temperatura de cada sensor en el centro de cada bin.
+    """
+    with open(series_path, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    header, rows = rows[0], rows[1:]
+    t_start = np.array([int(float(r[header.index("t_start")])) for r in rows], dtype=np.int64)
+    width = int(np.median(np.diff(t_start))) if len(t_start) > 1 else 0
+    centers = t_start + width // 2
+
+    t, temps = load_temperatures(int(t_start.min()), int(t_start.max()) + width,
+                                 store_dir, utc_offset, sensors, tolerance)
+    values, _ = AsofJoiner(t, temps, mode, tolerance).join(centers)
+    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header + [f"S{k}" for k in sensors])
+        for row, v in zip(rows, values):
+            writer.writerow(row + ["" if np.isnan(x) else f"{x:.3f}" for x in v])
+    return len(rows)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Temperatura de cada evento o bin de tiempo")
+    src = p.add_mutually_exclusive_group()
+    src.add_argument("-i", "--input", default="data.root", help="Archivo ROOT con matedata")
+    src.add_argument("--bins", help="CSV de time_index.py al que se agregan las temperaturas")
+    p.add_argument("-s", "--store", default=STORE_DIR, help="Carpeta del almacén de thermo_store.py")
+    p.add_argument("--mode", choices=MODES, default="nearest", help="Lectura más cercana, anterior o interpolada")
+    p.add_argument("--tolerance", type=int, default=TOLERANCE_S,
+                   help="Distancia máxima a la lectura usada (s)")
+    p.add_argument("--utc-offset", type=float, default=0.0,
+                   help="Desfase de la hora de los termómetros respecto de UTC, en horas (p. ej. -4)")
+    p.add_argument("--sensors", type=int, nargs="+", default=list(SENSORS), help="Sensores a unir")
+    p.add_argument("--chunk-size", type=int, default=STEP_SIZE, help="Eventos por bloque")
+    p.add_argument("-o", "--output", help="Salida (ROOT por evento o CSV por bin)")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.bins:
+        out = args.output or args.bins.replace(".csv", "_temps.csv")
+        n = join_bins(args.bins, out, args.store, args.mode, args.tolerance,
+                      args.utc_offset, args.sensors)
+        print(f"{n} bins con temperatura guardados en {out}")
+        return
+
+    out = args.output or "data_temps.root"
+    n, n_full = join_events(args.input, out, args.store, args.mode, args.tolerance,
+                            args.utc_offset, args.sensors, args.chunk_size)
+    print(f"{n} eventos ({n_full} con todos los sensores) guardados en {out}:{TEMP_TREE}")
+
+
+if __name__ == "__main__":
+    main()
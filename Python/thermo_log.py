@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+thermo_log.py
+
+Lectura de los registros de temperatura del Arduino (Termometros/*.TXT,
+un archivo YYYYMMDD_0800-0800.TXT por día, una línea por minuto).
+
+Formatos de línea que aparecen en los registros:
+
+    2025-08-09,08:00:01, Unidad: C°,S1: 17.69, ..., S20: 17.38.
+    2025-08-14,14:07:36, Unidad: C°,S1: 18.06, ..., S19: 18.75.
+    1757603230, Unidad: C°,S1: 11.56, ..., S19: 11.69.
+
+más la cabecera "Inicio: ...; Duracion: 1440 min" (a veces con "# "
+delante). Los valores "?", "NA" y vacíos, y la lectura -127 (sensor
+desconectado), se convierten siempre en NaN.
+
+read_log devuelve un dict con "time" (datetime64[s]) y "temps" (float64,
+forma (líneas, 20), columnas S1..S20, NaN en los sensores ausentes).
+Camino rápido: las líneas (bytes) se agrupan por formato (número de
+campos y tipo de tiempo). En cada grupo el tiempo y el campo de la unidad
+tienen largo fijo, así que los valores de todas las líneas se unen en un
+solo texto, se pasan a CSV "1, v, 2, v, ..." con replace/translate y se
+convierten de una vez con el lector en C de np.loadtxt; las etiquetas
+S1..SN salen como columnas y se comprueban en bloque. Sólo las líneas que no calzan
+con el formato fijo se leen con expresiones regulares.
+
+Los tiempos en segundos Unix se pasan a hora local sumando epoch_offset_h
+horas (por defecto 0, es decir UTC); los con fecha y hora se toman tal cual.
+"""
+
+import io
+import re
+
+import numpy as np
+
+# Sensores por registro (S1..S20)
+N_SENSORS = 20
+
+# Lectura del DS18B20 desconectado
+DISCONNECTED = -127.0
+
+# Textos que se leen como NaN
+MISSING = ("?", "NA", "")
+
+# Campo de la unidad entre el tiempo y los valores, y largo del tiempo
+# según sea fecha,hora (2 campos) o segundos Unix (1 campo)
+UNIT_FIELD = ", Unidad: C°,".encode("utf-8")
+TIME_LEN = {2: len("2025-08-09,08:00:01"), 1: len("1757603230")}
+
+# "S12: v" → "12, v": etiqueta y valor como dos columnas del CSV
+_COLON_TO_COMMA = bytes.maketrans(b":", b",")
+
+# Respaldo para líneas que no calzan con el formato fijo
+LINE_RE = re.compile(
+    r"^\s*(?:(\d{4}-\d{2}-\d{2})\s*,\s*(\d{2}:\d{2}:\d{2})|(\d{9,11}))\s*,(.*)$"
+)
+SENSOR_RE = re.compile(r"S(\d+)\s*:\s*([^,]*)")
+
+
+def to_float(text):
+    """Valor de un sensor como float; "?", "NA", vacío, -127 o basura → NaN."""
+    text = (text or "").strip().rstrip(".").strip()
+    if text in MISSING:
+        return np.nan
+    try:
+        value = float(text)
+    except ValueError:
+        return np.nan
+    return np.nan if value == DISCONNECTED else value
+
+
+def _clean_values(values):
+    """Aplica la regla de NaN a un arreglo de valores ya convertidos."""
+    values[values == DISCONNECTED] = np.nan
+    return values
+
+
+def _parse_group(lines, n_time, n_sens):
+    """
+    Camino rápido para líneas (bytes) con n_time campos de tiempo (2 =
+    fecha,hora; 1 = segundos Unix) y n_sens sensores. Devuelve (tiempos,
+    valores) o None si alguna línea no respeta el formato fijo.
+    """
+    n = len(lines)
+    head_len = TIME_LEN[n_time]
+    prefix_len = head_len + len(UNIT_FIELD)
+    if {l[head_len:prefix_len] for l in lines} != {UNIT_FIELD}:
+        return None
+
+    # "S1: v, S2: v, ..., SN: v." de todas las líneas → CSV "1, v, 2, v, ..., N, v"
+    text = b"\n".join(l[prefix_len:] for l in lines) + b"\n"
+    text = text.replace(b".\n", b"\n").replace(b"?", b"nan").replace(b"NA", b"nan")
+    text = text.translate(_COLON_TO_COMMA, b"S")
+    try:
+        pairs = np.loadtxt(io.BytesIO(text), delimiter=",", ndmin=2)
+    except ValueError:
+        return None
+    if pairs.shape != (n, 2 * n_sens):
+        return None
+    # Las etiquetas deben ser exactamente S1..SN en orden en cada línea
+    if not (pairs[:, 0::2] == np.arange(1, n_sens + 1)).all():
+        return None
+    values = pairs[:, 1::2].copy()
+
+    heads = b"\n".join(l[:head_len] for l in lines).decode("ascii", "replace")
+    try:
+        if n_time == 2:
+            times = np.array(heads.replace(",", "T").split("\n"), dtype="datetime64[s]")
+        else:
+            times = np.array(heads.split("\n"), dtype=np.int64).astype("datetime64[s]")
+    except ValueError:
+        return None
+    return times, _clean_values(values)
+
+
+def _parse_line_regex(line):
+    """Respaldo con regex para una línea; None si no tiene tiempo reconocible."""
+    m = LINE_RE.match(line.decode("utf-8", "replace"))
+    if not m:
+        return None
+    date, clock, epoch, rest = m.groups()
+    try:
+        if epoch:
+            t = np.datetime64(int(epoch), "s")
+        else:
+            t = np.datetime64(f"{date}T{clock}", "s")
+    except ValueError:
+        return None
+    row = np.full(N_SENSORS, np.nan)
+    for idx, value in SENSOR_RE.findall(rest):
+        k = int(idx)
+        if 1 <= k <= N_SENSORS:
+            row[k - 1] = to_float(value)
+    return t, row, bool(epoch)
+
+
+def _layout(is_date, n_commas):
+    """(campos de tiempo, sensores) de una línea con fecha o no y n_commas comas, o None."""
+    n_time = 2 if is_date else 1
+    n_sens = n_commas - n_time
+    if not 1 <= n_sens <= N_SENSORS:
+        return None
+    return n_time, n_sens
+
+
+def _parse_split(items, n_time, n_sens, rest):
+    """
+    Lee en bloque items [(índice, línea)]; si el bloque falla se parte en
+    mitades hasta aislar las líneas mal formadas, que se agregan a rest.
+    Devuelve [(items del trozo, (tiempos, valores))].
+    """
+    parsed = _parse_group([l for _, l in items], n_time, n_sens)
+    if parsed is not None:
+        return [(items, parsed)]
+    if len(items) == 1:
+        rest.extend(items)
+        return []
+    half = len(items) // 2
+    return (_parse_split(items[:half], n_time, n_sens, rest)
+            + _parse_split(items[half:], n_time, n_sens, rest))
+
+
+def parse_lines(lines, epoch_offset_h=0.0):
+    """
+    Convierte líneas de registro en {"time", "temps"} conservando su orden.
+    Las líneas sin tiempo reconocible (cabeceras, vacías) se descartan;
+    "n_fallback" cuenta las que hubo que leer con regex.
+    """
+    offset = np.timedelta64(int(round(epoch_offset_h * 3600)), "s")
+    lines = [l.encode("utf-8") if isinstance(l, str) else l for l in lines]
+    # Sólo cuentan las líneas que empiezan con un dígito (fecha o segundos Unix)
+    lines = [(i, l) for i, l in enumerate(map(bytes.strip, lines)) if l[:1].isdigit()]
+    shapes = {}
+    for item in lines:
+        line = item[1]
+        shapes.setdefault((line[4:5] == b"-", line.count(b",")), []).append(item)
+
+    groups, rest = {}, []
+    for key, items in shapes.items():
+        layout = _layout(*key)
+        if layout is None:
+            rest.extend(items)
+        else:
+            groups[layout] = items
+
+    order, times, temps = [], [], []
+    for (n_time, n_sens), items in groups.items():
+        for part, parsed in _parse_split(items, n_time, n_sens, rest):
+            t, v = parsed
+            if n_time == 1:
+                t = t + offset
+            block = np.full((len(part), N_SENSORS), np.nan)
+            block[:, :n_sens] = v
+            order.append(np.fromiter((i for i, _ in part), dtype=np.int64, count=len(part)))
+            times.append(t)
+            temps.append(block)
+
+    n_fallback = 0
+    fb_order, fb_times, fb_rows = [], [], []
+    for i, line in rest:
+        parsed = _parse_line_regex(line)
+        if parsed is None:
+            continue
+        t, row, is_epoch = parsed
+        fb_order.append(i)
+        fb_times.append(t + offset if is_epoch else t)
+        fb_rows.append(row)
+        n_fallback += 1
+    if fb_order:
+        order.append(np.array(fb_order, dtype=np.int64))
+        times.append(np.array(fb_times, dtype="datetime64[s]"))
+        temps.append(np.array(fb_rows))
+
+    if not order:
+        return {"time": np.empty(0, dtype="datetime64[s]"),
+                "temps": np.empty((0, N_SENSORS)), "n_fallback": 0}
+    idx = np.argsort(np.concatenate(order), kind="stable")
+    return {
+        "time": np.concatenate(times)[idx],
+        "temps": np.concatenate(temps)[idx],
+        "n_fallback": n_fallback,
+    }
+
+
+def read_log(path, epoch_offset_h=0.0):
+    """Lee un archivo de registro; ver parse_lines."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data.startswith(b"\xef\xbb\xbf"):
+        data = data[3:]
+    return parse_lines(data.splitlines(), epoch_offset_h)
+
+
+def read_logs(paths, epoch_offset_h=0.0):
+    """Lee y concatena varios archivos de registro, en el orden dado."""
+    parts = [read_log(p, epoch_offset_h) for p in paths]
+    return {
+        "time": np.concatenate([p["time"] for p in parts]) if parts
+        else np.empty(0, dtype="datetime64[s]"),
+        "temps": np.concatenate([p["temps"] for p in parts]) if parts
+        else np.empty((0, N_SENSORS)),
+        "n_fallback": sum(p["n_fallback"] for p in parts),
+    }
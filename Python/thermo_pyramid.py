@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+thermo_pyramid.py
+
+Pirámide de agregados por sensor para los heatmaps de temperatura.
+
+Para cada día del almacén de thermo_store.py se guardan, en los niveles
+LEVELS (1 min, 5 min, 15 min, 1 h y 1 día), los agregados por bin y
+sensor: número de lecturas, suma, suma de cuadrados, mínimo y máximo.
+Se calculan una sola vez por día (el nivel de 1 min desde las filas
+crudas y cada nivel siguiente desde el anterior) y se rehacen sólo si
+cambia el TXT del día.
+
+Como esos agregados se pueden sumar, los días se combinan entre sí (los
+bins que cruzan el cambio de archivo a las 08:00 quedan bien) y un bin
+más ancho se arma desde cualquier nivel cuyo ancho lo divida. query usa
+el nivel más grueso que sirve para el ancho pedido, así que
+resample("30min") se resuelve con el nivel de 15 min sin leer las filas
+crudas. Los bins están alineados a la medianoche, como resample de pandas.
+
+De los agregados salen la media (lo que dibujan los heatmaps), la
+desviación dentro de cada bin, min/max y, sobre la matriz de medias, el
+suavizado SMOOTH_WINDOW y el z-score por sensor de 2)_csvGrapher.ipynb.
+
+Uso:
+    python thermo_pyramid.py --width 30min --from "2025-08-19 15:00" --to "2025-08-20 08:00" -o heatmap.csv
+"""
+
+import argparse
+import csv
+import os
+import re
+import warnings
+
+import numpy as np
+
+from mate_ingest import load_manifest, save_manifest
+from thermo_log import N_SENSORS
+from thermo_store import STORE_DIR, open_store, parse_time, partition_paths
+
+# Niveles de la pirámide: nombre → ancho del bin (s)
+LEVELS = {"1min": 60, "5min": 300, "15min": 900, "1h": 3600, "1d": 86400}
+
+# Agregados que se guardan por bin y sensor
+FIELDS = ("count", "sum", "sum2", "min", "max")
+
+PYRAMID_VERSION = 1
+PYRAMID_DIR = "pyramid"
+
+# Vistas que se pueden pedir a query
+STATS = ("mean", "std", "min", "max", "count", "zscore")
+
+
+def parse_width(text):
+    """Ancho "15min", "1h", "30Min", "1d" o en segundos → segundos (int)."""
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*(s|min|h|d)?\s*", str(text), re.IGNORECASE)
+    if not m:
+        raise ValueError(f"Ancho no reconocido: {text!r}")
+    unit = {"s": 1, "min": 60, "h": 3600, "d": 86400}[(m.group(2) or "s").lower()]
+    return int(round(float(m.group(1)) * unit))
+
+
+def _reduce(t, agg):
+    """
+    Junta las filas con el mismo t (ya ordenado): suma count/sum/sum2,
+    mínimo de min y máximo de max. Devuelve (t único, agregados).
+    """
+    if len(t) == 0:
+        return t, agg
+    first = np.flatnonzero(np.r_[True, t[1:] != t[:-1]])
+    out = {
+        "count": np.add.reduceat(agg["count"], first, axis=0),
+        "sum": np.add.reduceat(agg["sum"], first, axis=0),
+        "sum2": np.add.reduceat(agg["sum2"], first, axis=0),
+        "min": np.fmin.reduceat(agg["min"], first, axis=0),
+        "max": np.fmax.reduceat(agg["max"], first, axis=0),
+    }
+    return t[first], out
+
+
+def aggregate_raw(t, temps, width):
+    """Agregados por bins de width segundos de lecturas crudas (t ordenado)."""
+    valid = np.isfinite(temps)
+    values = np.where(valid, temps, 0.0)
+    agg = {
+        "count": valid.astype(np.int64),
+        "sum": values,
+        "sum2": values * values,
+        # fmin/fmax ignoran NaN; un bin sin lecturas queda en NaN
+        "min": temps,
+        "max": temps,
+    }
+    return _reduce(t // width * width, agg)
+
+
+def rebin(t, agg, width):
+    """Agregados de un nivel llevados a bins de width (múltiplo del ancho de origen)."""
+    b = t // width * width
+    order = np.argsort(b, kind="stable")
+    if np.any(order != np.arange(len(order))):
+        b = b[order]
+        agg = {f: agg[f][order] for f in FIELDS}
+    return _reduce(b, agg)
+
+
+def merge(parts):
+    """Combina [(t, agregados)] de varios días en un solo conjunto ordenado."""
+    parts = [p for p in parts if len(p[0])]
+    if not parts:
+        return np.empty(0, dtype=np.int64), {f: np.empty((0, N_SENSORS)) for f in FIELDS}
+    t = np.concatenate([p[0] for p in parts])
+    agg = {f: np.concatenate([p[1][f] for p in parts]) for f in FIELDS}
+    order = np.argsort(t, kind="stable")
+    return _reduce(t[order], {f: agg[f][order] for f in FIELDS})
+
+
+def build_day(t, temps):
+    """Todos los niveles de un día: {nivel: (t, agregados)}."""
+    levels = {}
+    prev = None
+    for name, width in LEVELS.items():
+        # Cada nivel sale del anterior (todos los anchos se dividen entre sí)
+        levels[name] = aggregate_raw(t, temps, width) if prev is None else rebin(*prev, width)
+        prev = levels[name]
+    return levels
+
+
+def _day_path(store_dir, day):
+    return os.path.join(store_dir, PYRAMID_DIR, day + ".npz")
+
+
+def update_pyramid(store_dir=STORE_DIR):
+    """Calcula la pirámide de los días nuevos o modificados del almacén."""
+    store = open_store(store_dir)
+    os.makedirs(os.path.join(store_dir, PYRAMID_DIR), exist_ok=True)
+    manifest_path = os.path.join(store_dir, PYRAMID_DIR, "manifest.json")
+    manifest = load_manifest(manifest_path)
+    if manifest.get("version") != PYRAMID_VERSION or manifest.get("levels") != LEVELS:
+        manifest = {"version": PYRAMID_VERSION, "levels": LEVELS, "days": {}}
+
+    for day, info in sorted(store["partitions"].items()):
+        sha1 = info["source"]["sha1"]
+        if manifest["days"].get(day) == sha1 and os.path.exists(_day_path(store_dir, day)):
+            continue
+        t_path, v_path = partition_paths(store_dir, day)
+        levels = build_day(np.load(t_path), np.load(v_path))
+        arrays = {}
+        for name, (t, agg) in levels.items():
+            arrays[f"{name}_t"] = t
+            arrays.update({f"{name}_{f}": agg[f] for f in FIELDS})
+        tmp = _day_path(store_dir, day) + ".tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, _day_path(store_dir, day))
+        manifest["days"][day] = sha1
+        print(f"Pirámide de {day}")
+
+    for day in set(manifest["days"]) - set(store["partitions"]):
+        if os.path.exists(_day_path(store_dir, day)):
+            os.remove(_day_path(store_dir, day))
+        del manifest["days"][day]
+    save_manifest(manifest, manifest_path)
+    return manifest
+
+
+def level_for(width):
+    """Nivel más grueso cuyo ancho divide width."""
+    usable = [name for name, w in LEVELS.items() if width % w == 0]
+    if not usable:
+        raise ValueError(f"El ancho {width} s no es múltiplo de {min(LEVELS.values())} s")
+    return max(usable, key=LEVELS.get)
+
+
+def query(store_dir=STORE_DIR, width=900, t_start=None, t_stop=None):
+    """
+    Agregados en bins de width segundos que empiezan entre el bin de
+    t_start y t_stop (segundos; None = todo), en una grilla regular desde
+    el primer hasta el último bin con datos, como resample: {"time",
+    "count", "sum", ...}. Los bins son completos aunque la ventana corte
+    uno. Sólo se leen los días del almacén que tocan la ventana.
+    """
+    store = open_store(store_dir)
+    level = level_for(width)
+    # La ventana se amplía a bins completos: del que contiene t_start al
+    # final del que contiene t_stop, para que el rebin no corte el último
+    lo = -np.inf if t_start is None else t_start // width * width
+    hi = np.inf if t_stop is None else -(-t_stop // width) * width
+
+    parts = []
+    for day, info in sorted(store["partitions"].items()):
+        if not info["n"] or info["t_max"] < lo or info["t_min"] >= hi:
+            continue
+        with np.load(_day_path(store_dir, day)) as data:
+            t = data[f"{level}_t"]
+            i0, i1 = np.searchsorted(t, [lo, hi], side="left")
+            parts.append((t[i0:i1], {f: data[f"{level}_{f}"][i0:i1] for f in FIELDS}))
+
+    t, agg = merge(parts)
+    if LEVELS[level] != width:
+        t, agg = rebin(t, agg, width)
+
+    # Grilla regular (los bins vacíos quedan con count 0 y NaN)
+    if len(t):
+        grid = np.arange(t[0], t[-1] + width, width)
+        idx = ((t - t[0]) // width).astype(np.int64)
+        dense = {f: np.zeros((len(grid), N_SENSORS), dtype=agg[f].dtype)
+                 for f in ("count", "sum", "sum2")}
+        dense["min"] = np.full((len(grid), N_SENSORS), np.nan)
+        dense["max"] = np.full((len(grid), N_SENSORS), np.nan)
+        for f in FIELDS:
+            dense[f][idx] = agg[f]
+        t, agg = grid, dense
+    out = {"time": t.astype("datetime64[s]"), "width": width, "level": level}
+    out.update(agg)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Vistas para los heatmaps
+# ---------------------------------------------------------------------------
+
+def mean(agg):
+    """Media por bin y sensor (resample(...).mean())."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(agg["count"] > 0, agg["sum"] / agg["count"], np.nan)
+
+
+def std(agg, ddof=1):
+    """Desviación de las lecturas dentro de cada bin (resample(...).std())."""
+    n = agg["count"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var = (agg["sum2"] - agg["sum"] ** 2 / n) / (n - ddof)
+        # Lo que queda por debajo del redondeo de sum2 es varianza nula
+        var[var < 1e-12 * agg["sum2"] / n] = 0.0
+    return np.where(n > ddof, np.sqrt(var), np.nan)
+
+
+def smooth(values, window, width):
+    """
+    Media móvil hacia atrás de window segundos sobre una matriz (bins,
+    sensores), como rolling(SMOOTH_WINDOW, min_periods=1).mean() sobre la
+    grilla de bins: entran los bins con inicio en (t - window, t].
+    """
+    k = max(1, -(-window // width))
+    valid = np.isfinite(values)
+    csum = np.cumsum(np.where(valid, values, 0.0), axis=0)
+    ccnt = np.cumsum(valid, axis=0)
+    csum = np.vstack([np.zeros((1, values.shape[1])), csum])
+    ccnt = np.vstack([np.zeros((1, values.shape[1]), dtype=ccnt.dtype), ccnt])
+    i = np.arange(1, len(values) + 1)
+    j = np.maximum(i - k, 0)
+    s, c = csum[i] - csum[j], ccnt[i] - ccnt[j]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(c > 0, s / c, np.nan)
+
+
+def zscore(values):
+    """z-score por sensor sobre el tiempo (STANDARDIZE del cuaderno)."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mu = np.nanmean(values, axis=0)
+        sigma = np.nanstd(values, axis=0, ddof=1)
+    sigma[sigma == 0] = np.nan
+    return (values - mu) / sigma
+
+
+def view(result, stat="mean", smooth_window=None):
+    """Matriz (bins, sensores) de stat ("mean", "std", "min", "max", "count", "zscore")."""
+    if stat in ("mean", "zscore"):
+        values = mean(result)
+        if smooth_window:
+            values = smooth(values, smooth_window, result["width"])
+        return zscore(values) if stat == "zscore" else values
+    if stat == "std":
+        return std(result)
+    return result[stat]
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Pirámide de agregados de temperatura para heatmaps")
+    p.add_argument("-s", "--store", default=STORE_DIR, help="Carpeta del almacén de thermo_store.py")
+    p.add_argument("--width", default="15min", help='Ancho de los bins ("15min", "1h", ...)')
+    p.add_argument("--from", dest="t_from", help='Inicio, p. ej. "2025-08-19 15:00"')
+    p.add_argument("--to", dest="t_to", help="Fin (excluido)")
+    p.add_argument("--stat", choices=STATS, default="mean", help="Vista a exportar")
+    p.add_argument("--smooth", help='Suavizado hacia atrás, p. ej. "45min" (mean y zscore)')
+    p.add_argument("--sensors", type=int, nargs="+", help="Sensores a exportar (por defecto con datos)")
+    p.add_argument("-o", "--output", help="CSV (filas: tiempo, columnas: sensores)")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    update_pyramid(args.store)
+    if not args.output:
+        return
+
+    width = parse_width(args.width)
+    result = query(args.store, width,
+                   parse_time(args.t_from) if args.t_from else None,
+                   parse_time(args.t_to) if args.t_to else None)
+    values = view(result, args.stat, parse_width(args.smooth) if args.smooth else None)
+    sensors = args.sensors or [k + 1 for k in range(N_SENSORS) if result["count"][:, k].any()]
+    with open(args.output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["time"] + [f"S{k}" for k in sensors])
+        for t, row in zip(result["time"], values[:, np.array(sensors) - 1]):
+            writer.writerow([str(t).replace("T", " ")]
+                            + ["" if np.isnan(v) else f"{v:.6g}" for v in row])
+    print(f"{len(result['time'])} bins de {args.width} (nivel {result['level']}) "
+          f"guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+thermo_store.py
+
+Almacén en disco de los registros de temperatura (Termometros/1)_Datos).
+
+Cada archivo diario YYYYMMDD_0800-0800.TXT se lee una sola vez con
+thermo_log.read_log y se guarda como una partición: dos .npy con el
+tiempo (segundos, int64, ordenado) y las temperaturas S1..S20 (float64,
+una fila por tiempo). El manifiesto manifest.json de la carpeta guarda,
+por partición, tamaño, mtime y hash del TXT fuente y el primer y último
+tiempo.
+
+- update_store sólo vuelve a leer los TXT nuevos o modificados (el hash
+  se recalcula únicamente si cambian tamaño o mtime); las particiones de
+  los demás días no se tocan. Las particiones cuyo TXT ya no existe se
+  eliminan.
+- query_range abre (con mmap) sólo las particiones cuyo intervalo de
+  tiempo toca la ventana pedida y toma de cada una el tramo que cae
+  dentro con np.searchsorted.
+
+Los tiempos son los del registro (hora local del Arduino); las líneas en
+segundos Unix se corren epoch_offset_h horas, que queda fijado en el
+manifiesto: si cambia se reconstruye todo.
+
+Uso:
+    python thermo_store.py --from "2025-08-19 15:22:22" --to "2025-08-20 07:59:22" -o ventana.csv
+"""
+
+import argparse
+import csv
+import glob
+import os
+
+import numpy as np
+
+from mate_ingest import file_hash, load_manifest, save_manifest
+from thermo_log import N_SENSORS, read_log
+
+# Versión del formato de las particiones (invalida el almacén si cambia)
+STORE_VERSION = 1
+
+# Ubicaciones por defecto, relativas a este script
+_HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(_HERE, "..", "Termometros", "1)_Datos")
+STORE_DIR = os.path.join(_HERE, "..", "Termometros", "thermo_store")
+
+MANIFEST = "manifest.json"
+
+
+def parse_time(text):
+    """Tiempo "AAAA-MM-DD HH:MM[:SS]" del registro como segundos (int)."""
+    return int(np.datetime64(text.strip().replace(" ", "T"), "s").astype(np.int64))
+
+
+def format_time(seconds):
+    return str(np.datetime64(int(seconds), "s")).replace("T", " ")
+
+
+def partition_paths(store_dir, name):
+    """Rutas (tiempo, temperaturas) de la partición name."""
+    base = os.path.join(store_dir, name)
+    return base + ".time.npy", base + ".temps.npy"
+
+
+def _signature(path, previous=None):
+    """Tamaño, mtime y hash de un TXT; el hash se reutiliza si no cambió nada."""
+    st = os.stat(path)
+    sig = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if previous and all(previous.get(k) == sig[k] for k in ("size", "mtime_ns")):
+        sig["sha1"] = previous["sha1"]
+    else:
+        sig["sha1"] = file_hash(path)
+    return sig
+
+
+def _write_partition(store_dir, name, path, epoch_offset_h):
+    """Lee un TXT y guarda su partición ordenada por tiempo."""
+    log = read_log(path, epoch_offset_h)
+    t = log["time"].astype(np.int64)
+    order = np.argsort(t, kind="stable")
+    t, temps = t[order], log["temps"][order]
+    for out, arr in zip(partition_paths(store_dir, name), (t, temps)):
+        tmp = out + ".tmp.npy"
+        np.save(tmp, arr)
+        os.replace(tmp, out)
+    return {
+        "n": int(len(t)),
+        "t_min": int(t[0]) if len(t) else None,
+        "t_max": int(t[-1]) if len(t) else None,
+        "n_fallback": int(log["n_fallback"]),
+    }
+
+
+def update_store(data_dir=DATA_DIR, store_dir=STORE_DIR, epoch_offset_h=0.0):
+    """
+    Agrega al almacén los TXT nuevos o modificados de data_dir y devuelve
+    el manifiesto actualizado.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    manifest_path = os.path.join(store_dir, MANIFEST)
+    manifest = load_manifest(manifest_path)
+    if (manifest.get("version") != STORE_VERSION
+            or manifest.get("epoch_offset_h") != epoch_offset_h):
+        manifest = {"version": STORE_VERSION, "epoch_offset_h": epoch_offset_h,
+                    "partitions": {}}
+    parts = manifest["partitions"]
+
+    names = set()
+    for path in sorted(glob.glob(os.path.join(data_dir, "*.TXT"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        names.add(name)
+        old = parts.get(name)
+        sig = _signature(path, old and old["source"])
+        if (old and old["source"]["sha1"] == sig["sha1"]
+                and all(os.path.exists(p) for p in partition_paths(store_dir, name))):
+            old["source"] = sig
+            continue
+        info = _write_partition(store_dir, name, path, epoch_offset_h)
+        info["source"] = sig
+        parts[name] = info
+        print(f"Partición {name}: {info['n']} líneas"
+              + (f" ({info['n_fallback']} con regex)" if info["n_fallback"] else ""))
+        # El manifiesto se guarda tras cada día: si se corta, lo hecho queda
+        save_manifest(manifest, manifest_path)
+
+    # Los días que ya no están en data_dir salen del almacén
+    for name in set(parts) - names:
+        for p in partition_paths(store_dir, name):
+            if os.path.exists(p):
+                os.remove(p)
+        del parts[name]
+    save_manifest(manifest, manifest_path)
+    return manifest
+
+
+def open_store(store_dir=STORE_DIR):
+    """Manifiesto de un almacén existente."""
+    manifest = load_manifest(os.path.join(store_dir, MANIFEST))
+    if manifest.get("version") != STORE_VERSION:
+        raise FileNotFoundError(f"No hay un almacén de temperaturas en {store_dir}; "
+                                "créalo con update_store")
+    return manifest
+
+
+def query_range(store_dir=STORE_DIR, t_start=None, t_stop=None, manifest=None):
+    """
+    Registros con t_start <= tiempo < t_stop (segundos; None = sin límite),
+    ordenados por tiempo: {"time" (datetime64[s]), "temps" (n, 20)}.
+    Sólo se abren las particiones que tocan la ventana.
+    """
+    manifest = open_store(store_dir) if manifest is None else manifest
+    lo = -np.inf if t_start is None else t_start
+    hi = np.inf if t_stop is None else t_stop
+
+    times, temps = [], []
+    for name, info in sorted(manifest["partitions"].items()):
+        if not info["n"] or info["t_max"] < lo or info["t_min"] >= hi:
+            continue
+        t_path, v_path = partition_paths(store_dir, name)
+        t = np.load(t_path, mmap_mode="r")
+        i0, i1 = np.searchsorted(t, [lo, hi], side="left")
+        if i1 > i0:
+            times.append(np.array(t[i0:i1]))
+            temps.append(np.array(np.load(v_path, mmap_mode="r")[i0:i1]))
+
+    if not times:
+        return {"time": np.empty(0, dtype="datetime64[s]"), "temps": np.empty((0, N_SENSORS))}
+    t = np.concatenate(times)
+    v = np.concatenate(temps)
+    # Los días se solapan en los bordes (08:00) y algunas horas Unix caen fuera
+    if np.any(np.diff(t) < 0):
+        order = np.argsort(t, kind="stable")
+        t, v = t[order], v[order]
+    return {"time": t.astype("datetime64[s]"), "temps": v}
+
+
+def write_csv(path, data, sensors=None):
+    """CSV Date,Time,S.. con los sensores dados (por defecto los que tienen datos)."""
+    temps = data["temps"]
+    if sensors is None:
+        sensors = [k + 1 for k in range(N_SENSORS) if np.isfinite(temps[:, k]).any()]
+    cols = np.array(sensors) - 1
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Date", "Time"] + [f"S{k}" for k in sensors])
+        for t, row in zip(data["time"], temps[:, cols]):
+            date, clock = str(t).split("T")
+            writer.writerow([date, clock] + ["" if np.isnan(v) else f"{v:.2f}" for v in row])
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Almacén por día de los registros de temperatura")
+    p.add_argument("-d", "--data-dir", default=DATA_DIR, help="Carpeta con los *.TXT")
+    p.add_argument("-s", "--store", default=STORE_DIR, help="Carpeta del almacén")
+    p.add_argument("--epoch-offset", type=float, default=0.0,
+                   help="Horas que se suman a las líneas en segundos Unix")
+    p.add_argument("--from", dest="t_from", help='Inicio, p. ej. "2025-08-19 15:22:22"')
+    p.add_argument("--to", dest="t_to", help='Fin (excluido), p. ej. "2025-08-20 07:59:22"')
+    p.add_argument("--sensors", type=int, nargs="+", help="Sensores a exportar (1..20)")
+    p.add_argument("-o", "--output", help="CSV con la ventana pedida")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    manifest = update_store(args.data_dir, args.store, args.epoch_offset)
+    n = sum(info["n"] for info in manifest["partitions"].values())
+    print(f"Almacén {args.store}: {len(manifest['partitions'])} días, {n} líneas")
+    if not args.output:
+        return
+
+    t_start = parse_time(args.t_from) if args.t_from else None
+    t_stop = parse_time(args.t_to) if args.t_to else None
+    data = query_range(args.store, t_start, t_stop, manifest)
+    write_csv(args.output, data, args.sensors)
+    print(f"{len(data['time'])} registros guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
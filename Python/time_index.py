@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+time_index.py
+
+Índice tiempo → entradas y series temporales de la corrida.
+
+tp1 se interpreta como segundos Unix. El índice (data.root.tp1.npz, junto
+al ROOT) guarda tp1 de todas las entradas, leído por bloques una sola vez;
+se reconstruye si cambian el tamaño o mtime de data.root. Si tp1 no es
+monótono también guarda el orden que lo ordena. Una ventana como
+"2025-08-19 10:00" a "2025-08-19 12:00" se resuelve con dos búsquedas
+binarias (np.searchsorted) en lugar de recorrer el árbol.
+
+time_series agrupa los eventos de una ventana en bins de ancho fijo y da,
+por bin: número de eventos y tasa, ángulo cenital medio (eventos con hit
+único en las tres placas, ajustados con PatternTable) y eventos con hit
+válido en cada placa; opcionalmente los mapas 12×12 por bin.
+
+Uso:
+    python time_index.py -i data.root --width 600 --from "2025-08-19 10:00" --to "2025-08-19 12:00"
+"""
+
+import argparse
+import csv
+import os
+
+import numpy as np
+
+from hit_patterns import PatternTable
+from matedata_io import STEP_SIZE, iter_matedata
+from track_fit import z_sup, z_med, z_inf, ch_width, offset
+
+# Strips por eje y placas
+NCH = 12
+PLATES = (1, 2, 3)
+
+# Columnas del CSV de series
+SERIES_COLUMNS = ("t_start", "t_start_iso", "n_events", "rate_hz", "n_tracks",
+                  "mean_theta_deg", "n_plate1", "n_plate2", "n_plate3")
+
+
+def parse_time(text, utc_offset=0.0):
+    """
+    Segundos Unix de una fecha "AAAA-MM-DD HH:MM[:SS]" en hora local con
+    desfase utc_offset (horas) respecto de UTC.
+    """
+    t = np.datetime64(text.strip().replace(" ", "T"), "s")
+    return int(t.astype(np.int64) - round(utc_offset * 3600))
+
+
+def format_time(seconds, utc_offset=0.0):
+    """Inversa de parse_time (texto ISO)."""
+    t = np.datetime64(int(seconds + round(utc_offset * 3600)), "s")
+    return str(t).replace("T", " ")
+
+
+def index_path(root_path):
+    return root_path + ".tp1.npz"
+
+
+def _source_stamp(root_path):
+    st = os.stat(root_path)
+    return np.array([st.st_size, st.st_mtime_ns], dtype=np.int64)
+
+
+class TimeIndex:
+    """
+    tp1 de todas las entradas de root_path, para buscar ventanas de tiempo.
+
+    Si tp1 es monótono, entry_range devuelve (inicio, fin) de las entradas
+    de una ventana; si no, entries devuelve los índices (ordenados).
+    """
+
+    def __init__(self, root_path, step_size=STEP_SIZE):
+        path = index_path(root_path)
+        data = None
+        if os.path.exists(path):
+            data = dict(np.load(path))
+            if not np.array_equal(data["source"], _source_stamp(root_path)):
+                data = None
+        if data is None:
+            print(f"Construyendo índice de tiempo en {path} ...")
+            parts = [arr["tp1"] for _, arr in iter_matedata(root_path, ["tp1"], step_size)]
+            tp1 = np.concatenate(parts).astype(np.int64) if parts else np.empty(0, np.int64)
+            data = {"tp1": tp1, "source": _source_stamp(root_path)}
+            if np.any(np.diff(tp1) < 0):
+                data["order"] = np.argsort(tp1, kind="stable")
+            tmp = path + ".tmp.npz"
+            np.savez(tmp, **data)
+            os.replace(tmp, path)
+
+        self.tp1 = data["tp1"]
+        self.order = data.get("order")
+        self.sorted_tp1 = self.tp1 if self.order is None else self.tp1[self.order]
+
+    @property
+    def monotonic(self):
+        return self.order is None
+
+    def span(self):
+        """Primer y último tp1 de la corrida."""
+        return int(self.sorted_tp1[0]), int(self.sorted_tp1[-1])
+
+    def _bounds(self, t_start, t_stop):
+        return np.searchsorted(self.sorted_tp1, [t_start, t_stop], side="left")
+
+    def entry_range(self, t_start, t_stop):
+        """(inicio, fin) de las entradas con t_start <= tp1 < t_stop."""
+        if not self.monotonic:
+            raise ValueError("tp1 no es monótono: usa entries() en vez de entry_range()")
+        lo, hi = self._bounds(t_start, t_stop)
+        return int(lo), int(hi)
+
+    def entries(self, t_start, t_stop):
+        """Índices (crecientes) de las entradas con t_start <= tp1 < t_stop."""
+        lo, hi = self._bounds(t_start, t_stop)
+        if self.monotonic:
+            return np.arange(lo, hi)
+        return np.sort(self.order[lo:hi])
+
+
+def time_series(root_path, index, width_s, t_start=None, t_stop=None,
+                maps=False, step_size=STEP_SIZE):
+    """
+    Series por bins de width_s segundos entre t_start y t_stop (por defecto
+    toda la corrida). Devuelve un dict de arreglos (ver SERIES_COLUMNS) y,
+    si maps, "maps" de forma (bins, 3, 12, 12).
+    """
+    first, last = index.span()
+    t_start = first if t_start is None else t_start
+    t_stop = last + 1 if t_stop is None else t_stop
+    n_bins = max(int(-(-(t_stop - t_start) // width_s)), 0)
+
+    n_events = np.zeros(n_bins, dtype=np.int64)
+    n_tracks = np.zeros(n_bins, dtype=np.int64)
+    sum_theta = np.zeros(n_bins)
+    n_plate = np.zeros((len(PLATES), n_bins), dtype=np.int64)
+    occ = np.zeros((n_bins, len(PLATES), NCH * NCH), dtype=np.int64) if maps else None
+
+    if index.monotonic:
+        lo, hi = index.entry_range(t_start, t_stop)
+    else:
+        # Sin orden temporal se recorren todas las entradas y se filtra por tp1
+        lo, hi = 0, len(index.tp1)
+
+    table = PatternTable(np.array([z_sup, z_med, z_inf]), ch_width, offset)
+    branches = ["tp1"] + [f"{c}{k}" for k in PLATES for c in "AB"]
+    for _, arr in iter_matedata(root_path, branches, step_size, lo, hi):
+        tp1 = arr["tp1"].astype(np.int64)
+        inside = (tp1 >= t_start) & (tp1 < t_stop)
+        b = ((tp1[inside] - t_start) // width_s).astype(np.int64)
+        n_events += np.bincount(b, minlength=n_bins)
+
+        ch = {k: arr[k][inside].astype(np.int64) for k in branches[1:]}
+        valid = {}
+        for i, k in enumerate(PLATES):
+            A, B = ch[f"A{k}"], ch[f"B{k}"]
+            valid[k] = (A >= 0) & (A < NCH) & (B >= 0) & (B < NCH)
+            n_plate[i] += np.bincount(b[valid[k]], minlength=n_bins)
+            if maps:
+                cell = A[valid[k]] * NCH + B[valid[k]]
+                np.add.at(occ[:, i], (b[valid[k]], cell), 1)
+
+        full = valid[1] & valid[2] & valid[3]
+        if full.any():
+            fit = table.lookup([ch["A3"][full], ch["A2"][full], ch["A1"][full]],
+                               [ch["B3"][full], ch["B2"][full], ch["B1"][full]])
+            n_tracks += np.bincount(b[full], minlength=n_bins)
+            sum_theta += np.bincount(b[full], weights=np.degrees(fit["theta"]), minlength=n_bins)
+
+    t_bins = t_start + width_s * np.arange(n_bins)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_theta = sum_theta / n_tracks
+    out = {
+        "t_start": t_bins,
+        "n_events": n_events,
+        # El último bin puede ser más corto que width_s
+        "rate_hz": n_events / np.minimum(width_s, t_stop - t_bins),
+        "n_tracks": n_tracks,
+        "mean_theta_deg": mean_theta,
+        "n_plate1": n_plate[0],
+        "n_plate2": n_plate[1],
+        "n_plate3": n_plate[2],
+    }
+    if maps:
+        out["maps"] = occ.reshape(n_bins, len(PLATES), NCH, NCH)
+    return out
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Tasa, ángulo medio y ocupación por bins de tiempo")
+    p.add_argument("-i", "--input", default="data.root", help="Archivo ROOT con matedata")
+    p.add_argument("--width", type=float, default=3600, help="Ancho de los bins (s)")
+    p.add_argument("--from", dest="t_from", help='Inicio, p. ej. "2025-08-19 10:00"')
+    p.add_argument("--to", dest="t_to", help='Fin (excluido), p. ej. "2025-08-19 12:00"')
+    p.add_argument("--utc-offset", type=float, default=0.0,
+                   help="Desfase de las fechas respecto de UTC, en horas (p. ej. -4)")
+    p.add_argument("-o", "--output", default="time_series.csv", help="CSV de salida")
+    p.add_argument("--maps", help="Guarda también los mapas 12×12 por bin en este .npz")
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    index = TimeIndex(args.input)
+    t_start = parse_time(args.t_from, args.utc_offset) if args.t_from else None
+    t_stop = parse_time(args.t_to, args.utc_offset) if args.t_to else None
+    if t_start is not None or t_stop is not None:
+        first, last = index.span()
+        n = len(index.entries(first if t_start is None else t_start,
+                              last + 1 if t_stop is None else t_stop))
+        print(f"Entradas en la ventana: {n}")
+
+    width = int(args.width) if float(args.width).is_integer() else args.width
+    series = time_series(args.input, index, width, t_start, t_stop, maps=bool(args.maps))
+    series["t_start_iso"] = [format_time(t, args.utc_offset) for t in series["t_start"]]
+
+    with open(args.output, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(SERIES_COLUMNS)
+        for row in zip(*(series[c] for c in SERIES_COLUMNS)):
+            writer.writerow([f"{v:.6g}" if isinstance(v, float) else v for v in row])
+    print(f"{len(series['t_start'])} bins de {args.width:g} s guardados en {args.output}")
+    if args.maps:
+        np.savez(args.maps, t_start=series["t_start"], maps=series["maps"])
+        print(f"Mapas por bin guardados en {args.maps}")
+
+
+if __name__ == "__main__":
+    main()
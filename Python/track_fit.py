@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+track_fit.py
+
+Ajuste vectorizado de trayectorias rectas sobre los tres planos.
+
+Como las posiciones z de los planos son fijas, la pendiente por mínimos
+cuadrados es una combinación lineal fija de los hits:
+
+    pendiente = sum_k w_k * x_k,   w_k = (z_k - z_media) / sum_j (z_j - z_media)^2
+
+así que el ajuste de todos los eventos es un producto matriz-vector y los
+residuos, chi² y ángulos salen con unas pocas operaciones de arreglos.
+
+fit_tracks recibe los hits por plano, en forma (planos, eventos) (por
+ejemplo [arr["B1"], arr["B2"], arr["B3"]]), con el mismo orden de planos
+que z. Las reducciones se hacen entre filas de eventos, que es mucho más
+rápido que sobre un eje de largo 3.
+"""
+
+import numpy as np
+
+# --- Geometría del telescopio ---
+width_cm = 36.0            # ancho total de cada placa (cm)
+Nch = 12                   # número de canales por eje
+ch_width = width_cm / Nch  # ancho de canal (cm)
+
+# Posiciones z de las placas (cm): superior (3), media (2), inferior (1)
+z_sup, z_med, z_inf = 124.7, 62.2, 0.0
+
+# Offset para centrar canales en el medio de la placa
+offset = (Nch - 1) / 2 * ch_width
+
+
+def channel_to_cm(ch):
+    """Convierte índices de canal (0..Nch-1) en coordenadas centradas (cm)."""
+    return np.asarray(ch) * ch_width - offset
+
+
+def fit_weights(z):
+    """Pesos w de la pendiente y z media para los planos z."""
+    z = np.asarray(z, dtype=float)
+    dz = z - z.mean()
+    return dz / np.sum(dz ** 2), z.mean()
+
+
+def fit_line(hits, z):
+    """
+    Ajusta x = pendiente * z + intercepto a cada evento de hits (planos, eventos).
+
+    Devuelve (pendiente, intercepto, residuos) con residuos de forma
+    (planos, eventos).
+    """
+    hits = np.asarray(hits, dtype=float)
+    w, z_mean = fit_weights(z)
+    slope = sum(w_k * h_k for w_k, h_k in zip(w, hits))
+    intercept = sum(hits) / len(hits) - slope * z_mean
+    resid = np.stack([h_k - (slope * z_k + intercept) for h_k, z_k in zip(hits, z)])
+    return slope, intercept, resid
+
+
+def fit_tracks(x_hits, y_hits, z, sigma=None):
+    """
+    Ajuste en x–z e y–z de todos los eventos a la vez.
+
+    x_hits, y_hits: arreglos (planos, eventos) en las mismas unidades que z.
+    sigma: resolución por plano para el chi²; si es None el chi² es la suma
+    de residuos al cuadrado.
+
+    Devuelve un dict con slope_x, slope_y, intercept_x, intercept_y,
+    resid (planos, eventos: distancia en el plano xy a la recta), max_resid,
+    chi2, theta_x, theta_y y theta (cenital), con los ángulos en radianes.
+    """
+    slope_x, intercept_x, rx = fit_line(x_hits, z)
+    slope_y, intercept_y, ry = fit_line(y_hits, z)
+
+    resid2 = rx ** 2 + ry ** 2
+    resid = np.sqrt(resid2)
+    chi2 = sum(resid2)
+    if sigma is not None:
+        chi2 = chi2 / sigma ** 2
+
+    return {
+        "slope_x": slope_x,
+        "slope_y": slope_y,
+        "intercept_x": intercept_x,
+        "intercept_y": intercept_y,
+        "resid": resid,
+        "max_resid": np.maximum.reduce(resid),
+        "chi2": chi2,
+        "theta_x": np.arctan(slope_x),
+        "theta_y": np.arctan(slope_y),
+        "theta": np.arctan(np.hypot(slope_x, slope_y)),
+    }
+
+
+def kink_angle(x_hits, y_hits, z):
+    """
+    Ángulo (rad) entre segmentos consecutivos de cada evento, con hits
+    (planos, eventos) en el orden de z. Con tres planos es el ángulo entre
+    el segmento plano 0→1 y el segmento 1→2; con más planos, el máximo.
+    """
+    x = np.asarray(x_hits, dtype=float)
+    y = np.asarray(y_hits, dtype=float)
+    z = np.asarray(z, dtype=float)
+    theta = None
+    for k in range(len(z) - 2):
+        v = (x[k + 1] - x[k], y[k + 1] - y[k], z[k + 1] - z[k])
+        w = (x[k + 2] - x[k + 1], y[k + 2] - y[k + 1], z[k + 2] - z[k + 1])
+        dot = v[0] * w[0] + v[1] * w[1] + v[2] * w[2]
+        norm = np.sqrt((v[0] ** 2 + v[1] ** 2 + v[2] ** 2) * (w[0] ** 2 + w[1] ** 2 + w[2] ** 2))
+        ang = np.arccos(np.clip(dot / norm, -1, 1))
+        theta = ang if theta is None else np.maximum(theta, ang)
+    return theta
+
+
+def select_tracks(x_hits, y_hits, z, R_tol, theta_tol):
+    """
+    Selección de calidad de trayectorias para todos los eventos a la vez.
+
+    Un evento pasa si el residuo máximo del ajuste es <= R_tol y el ángulo
+    entre segmentos (kink) es <= theta_tol (rad). Devuelve (mask, fit),
+    donde fit es el dict de fit_tracks con además la clave "kink".
+    """
+    fit = fit_tracks(x_hits, y_hits, z)
+    fit["kink"] = kink_angle(x_hits, y_hits, z)
+    mask = (fit["max_resid"] <= R_tol) & (fit["kink"] <= theta_tol)
+    return mask, fit
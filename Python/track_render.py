@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+track_render.py
+
+Dibujo agregado de trayectorias en 3D.
+
+Como los hits son discretos, muchos eventos siguen exactamente el mismo
+camino. draw_paths junta los caminos idénticos (np.unique por filas) y
+los dibuja todos en un único Line3DCollection, con el ancho y la
+opacidad de cada camino escalados según cuántos eventos lo siguen. El
+tiempo de dibujo depende del número de caminos distintos y no del número
+de eventos, y la figura tiene un solo artista en vez de uno por evento.
+
+Con aggregate=False se dibuja un segmento por evento (ancho y opacidad
+fijos), también en una sola colección.
+"""
+
+import numpy as np
+from matplotlib.colors import to_rgba
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
+
+# Ancho (pt) y opacidad del camino menos y más frecuente
+MIN_WIDTH, MAX_WIDTH = 0.5, 4.0
+MIN_ALPHA, MAX_ALPHA = 0.15, 0.9
+
+
+def unique_paths(paths):
+    """
+    Caminos distintos de paths (eventos, puntos, 3) y su multiplicidad,
+    de mayor a menor: (caminos, conteos).
+    """
+    paths = np.asarray(paths, dtype=float)
+    if len(paths) == 0:
+        return paths, np.empty(0, dtype=np.int64)
+    flat = paths.reshape(len(paths), -1)
+    uniq, counts = np.unique(flat, axis=0, return_counts=True)
+    order = np.argsort(-counts, kind="stable")
+    return uniq[order].reshape((-1,) + paths.shape[1:]), counts[order]
+
+
+def line_paths(slope_x, intercept_x, slope_y, intercept_y, z_start, z_stop):
+    """Segmentos (eventos, 2, 3) de las rectas x = sx·z + bx, y = sy·z + by."""
+    z = np.array([z_start, z_stop], dtype=float)
+    sx, bx, sy, by = (np.asarray(v, dtype=float)[:, None]
+                      for v in (slope_x, intercept_x, slope_y, intercept_y))
+    zz = np.broadcast_to(z, (len(sx), 2))
+    return np.stack([sx * z + bx, sy * z + by, zz], axis=-1)
+
+
+def draw_paths(ax, paths, color="blue", aggregate=True, label=None):
+    """
+    Dibuja paths (eventos, puntos, 3) en el eje 3D ax con un solo
+    Line3DCollection. Devuelve (colección, número de caminos dibujados);
+    sin caminos no se agrega nada y la colección es None.
+    """
+    paths = np.asarray(paths, dtype=float)
+    if len(paths) == 0:
+        return None, 0
+    rgba = np.tile(to_rgba(color), (len(paths), 1))
+    if aggregate:
+        paths, counts = unique_paths(paths)
+        frac = counts / counts.max() if len(counts) else counts
+        widths = MIN_WIDTH + (MAX_WIDTH - MIN_WIDTH) * frac
+        rgba = rgba[:len(paths)]
+        rgba[:, 3] = MIN_ALPHA + (MAX_ALPHA - MIN_ALPHA) * frac
+    else:
+        widths = np.full(len(paths), 1.0)
+        rgba[:, 3] = MAX_ALPHA
+
+    lines = Line3DCollection(paths, linewidths=widths, colors=rgba, label=label)
+    ax.add_collection3d(lines)
+    return lines, len(paths)